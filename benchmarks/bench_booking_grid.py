@@ -0,0 +1,72 @@
+# Benchmarks the DOM-based booking grid extraction against the local HTML replica
+# of the booking page (tests/data/booking_800x800.html).
+#
+# Usage:
+#   python -m benchmarks.bench_booking_grid [--runs 50] [--vision]
+#
+# With --vision, the vision fallback is timed as well, on a screenshot of the
+# same replica (needs OPENAI_API_KEY).
+import argparse
+import base64
+import json
+import statistics
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+from playwright.sync_api import sync_playwright
+
+from src.booking_grid import extract_booking_grid_from_dom, extract_booking_grid_from_screenshot
+
+REPLICA_PATH = Path("tests/data/booking_800x800.html")
+EXPECTED_PATH = Path("tests/data/booking_800x800.json")
+
+
+def count_wrong_slots(grid: dict, expected: dict) -> int:
+    return sum(
+        1
+        for court, slots in expected.items()
+        for slot, status in slots.items()
+        if (grid or {}).get(court, {}).get(slot) != status
+    )
+
+
+def report(name: str, timings_ms: list[float], wrong_slots: int) -> None:
+    print(
+        f"{name:<8} runs={len(timings_ms):<4} "
+        f"median={statistics.median(timings_ms):8.1f} ms  "
+        f"max={max(timings_ms):8.1f} ms  wrong slots={wrong_slots}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--vision", action="store_true")
+    args = parser.parse_args()
+
+    expected = json.loads(EXPECTED_PATH.read_text())
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        page = browser.new_page(viewport={"width": 800, "height": 800})
+        page.goto(REPLICA_PATH.resolve().as_uri())
+
+        timings_ms = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            grid = extract_booking_grid_from_dom(page)
+            timings_ms.append((time.perf_counter() - start) * 1000)
+        report("dom", timings_ms, count_wrong_slots(grid, expected))
+        screenshot = page.screenshot(type="jpeg", full_page=True) if args.vision else None
+        browser.close()
+
+    if args.vision:
+        load_dotenv()
+        start = time.perf_counter()
+        grid = extract_booking_grid_from_screenshot(base64.b64encode(screenshot).decode("utf-8"))
+        report("vision", [(time.perf_counter() - start) * 1000], count_wrong_slots(grid, expected))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# Compares screenshots and timings of headed and headless mode on the local
+# replica of the booking page (tests/data/booking_800x800.html).
+#
+# Usage:
+#   python -m benchmarks.bench_headless_parity [--runs 5]
+#
+# Headed mode needs a display (or xvfb-run); if it cannot be launched, only the
+# headless numbers are reported.
+import argparse
+import io
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+from playwright.sync_api import Error, sync_playwright
+
+from src.browser import launch_browser
+from src.labeler import label_page
+
+REPLICA_PATH = Path("tests/data/booking_800x800.html")
+
+
+def capture(headless: bool, runs: int) -> tuple[np.ndarray, list[float]]:
+    """Launches the browser `runs` times and returns the last labeled screenshot and the timings."""
+    timings_ms = []
+    with sync_playwright() as p:
+        for _ in range(runs):
+            with tempfile.TemporaryDirectory() as user_data_dir:
+                start = time.perf_counter()
+                browser = launch_browser(
+                    p, headless=headless, width=800, height=800, user_data_dir=user_data_dir
+                )
+                page = browser.new_page()
+                page.goto(REPLICA_PATH.resolve().as_uri())
+                label_page(page)
+                screenshot = page.screenshot(type="png", scale="css")
+                timings_ms.append((time.perf_counter() - start) * 1000)
+                browser.close()
+    return np.asarray(Image.open(io.BytesIO(screenshot)).convert("RGB"), dtype=np.int16), timings_ms
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    headless_image, headless_timings = capture(headless=True, runs=args.runs)
+    print(
+        f"headless: {headless_image.shape[1]}x{headless_image.shape[0]}  "
+        f"median={statistics.median(headless_timings):.0f} ms"
+    )
+
+    try:
+        headed_image, headed_timings = capture(headless=False, runs=args.runs)
+    except Error as error:
+        print(f"headed:   could not launch ({error.message.splitlines()[0]})")
+        return
+    print(
+        f"headed:   {headed_image.shape[1]}x{headed_image.shape[0]}  "
+        f"median={statistics.median(headed_timings):.0f} ms"
+    )
+
+    if headed_image.shape != headless_image.shape:
+        print("screenshots differ in size!")
+        return
+    difference = np.abs(headed_image - headless_image)
+    print(
+        f"mean abs pixel difference: {difference.mean():.3f}, "
+        f"differing pixels: {(difference.max(axis=2) > 16).mean():.2%}"
+    )
+
+
+if __name__ == "__main__":
+    main()
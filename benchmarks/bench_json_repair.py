@@ -0,0 +1,70 @@
+# Benchmarks the local JSON extraction and repair on large model responses.
+#
+# A response is built from prose around a booking grid with 13 courts and
+# half-hour slots from 07:00 to 23:00 (about 12 kB of JSON), once valid and
+# once with the defects src/json_repair.py repairs. Reports the throughput of
+# `extract_json` next to plain `json.loads` of the bare, valid JSON.
+#
+# Usage:
+#   python -m benchmarks.bench_json_repair [--runs 200]
+import argparse
+import json
+import time
+
+from src.json_repair import extract_json
+
+
+def make_grid(n_courts: int = 13) -> dict:
+    slots = [
+        f"{h:02d}:{m:02d}-{h + (m + 30) // 60:02d}:{(m + 30) % 60:02d}"
+        for h in range(7, 23)
+        for m in (0, 30)
+    ]
+    return {
+        f"Platz {court}": {
+            slot: "free" if (court + i) % 5 == 0 else "booked" for i, slot in enumerate(slots)
+        }
+        for court in range(1, n_courts + 1)
+    }
+
+
+def make_broken(grid: dict) -> str:
+    text = json.dumps(grid, indent=2, ensure_ascii=False)
+    text = text.replace('"Platz', "Platz").replace('": {', ": {")  # unquoted keys
+    text = text.replace('"booked"\n', '"booked",\n').replace(
+        '"free"\n', '"free",\n'
+    )  # trailing commas
+    text = text.replace('"free"', "“free”")  # smart quotes
+    return text[: int(len(text) * 0.9)]  # truncated at the token limit
+
+
+def measure(name: str, func, text: str, runs: int) -> None:
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = func(text)
+    seconds = (time.perf_counter() - start) / runs
+    print(
+        f"{name:<24} {len(text) / 1000:6.1f} kB  {seconds * 1000:7.2f} ms  "
+        f"{len(text) / seconds / 1e6:7.1f} MB/s  ok={result is not None}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    grid = make_grid()
+    prose = "Here is the booking status I read from the table. " * 40
+    valid = json.dumps(grid, indent=2)
+    measure("json.loads (bare)", json.loads, valid, args.runs)
+    measure(
+        "extract_json (valid)", extract_json, f"{prose}\n```json\n{valid}\n```\n{prose}", args.runs
+    )
+    measure(
+        "extract_json (broken)", extract_json, f"{prose}\n```json\n{make_broken(grid)}", args.runs
+    )
+
+
+if __name__ == "__main__":
+    main()
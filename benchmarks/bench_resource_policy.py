@@ -0,0 +1,52 @@
+# Loads a page with and without a resource policy and compares load times and
+# transferred bytes.
+#
+# Usage:
+#   python -m benchmarks.bench_resource_policy [--runs 5] \
+#       [--url https://safo.ebusy.de/lite-module/407]
+import argparse
+import statistics
+import time
+
+from playwright.sync_api import sync_playwright
+
+from src.resource_policy import EBUSY_PROFILE, ResourcePolicy, apply_resource_policy
+
+NO_POLICY = ResourcePolicy(reduce_motion=False, disable_animations=False)
+
+
+def load(browser, url: str, policy: ResourcePolicy) -> tuple[float, dict]:
+    context = browser.new_context(viewport={"width": 760, "height": 800})
+    stats = apply_resource_policy(context, policy)
+    page = context.new_page()
+    start = time.perf_counter()
+    page.goto(url, wait_until="load")
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    report = stats.report(page)
+    context.close()
+    return elapsed_ms, report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="https://safo.ebusy.de/lite-module/407")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        for name, policy in [("no policy", NO_POLICY), ("ebusy profile", EBUSY_PROFILE)]:
+            results = [load(browser, args.url, policy) for _ in range(args.runs)]
+            timings_ms = [elapsed_ms for elapsed_ms, _ in results]
+            report = results[-1][1]
+            print(
+                f"{name:<14} goto median={statistics.median(timings_ms):7.0f} ms  "
+                f"requests={report['requests']:<4} blocked={sum(report['blocked'].values()):<4} "
+                f"loaded={report['bytes_loaded'] / 1000:7.0f} kB  "
+                f"saved~{report['estimated_bytes_saved'] / 1000:5.0f} kB"
+            )
+        browser.close()
+
+
+if __name__ == "__main__":
+    main()
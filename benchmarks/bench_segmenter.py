@@ -0,0 +1,78 @@
+# Benchmarks the segmenter backends on booking screenshots.
+#
+# For each screenshot in tests/data, every backend is timed and checked against
+# a few click targets (cell centres of "BUCHEN"/"Belegt" buttons, navigation
+# arrows): a target counts as found if the smallest box containing it is an
+# element and not a whole section of the page. `labels` is the number of boxes
+# left after src/mask_postprocessing.py.
+#
+# Usage:
+#   python -m benchmarks.bench_segmenter [--runs 10] [--backends opencv sam]
+#
+# The sam backend needs segment_anything, torch and ressources/sam_vit_h_4b8939.pth.
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+import cv2
+
+from src.mask_postprocessing import suppress_masks
+from src.segmenter import SEGMENTERS, get_segmenter
+
+SCREENSHOTS = {
+    Path("tests/data/mixed.jpeg"): [
+        (259, 471),
+        (547, 759),
+        (835, 1623),
+        (547, 655),
+        (1012, 240),
+        (131, 147),
+    ],
+    Path("tests/data/alles_vorbei.jpeg"): [(547, 759), (835, 1623), (58, 48)],
+}
+MAX_ELEMENT_AREA_RATIO = 0.02
+
+
+def count_found_targets(masks: list[dict], targets: list[tuple[int, int]], image_area: int) -> int:
+    found = 0
+    for x, y in targets:
+        areas = [
+            mask["area"]
+            for mask in masks
+            if mask["bbox"][0] <= x <= mask["bbox"][0] + mask["bbox"][2]
+            and mask["bbox"][1] <= y <= mask["bbox"][1] + mask["bbox"][3]
+        ]
+        found += bool(areas) and min(areas) < MAX_ELEMENT_AREA_RATIO * image_area
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--backends", nargs="+", default=["opencv"], choices=list(SEGMENTERS))
+    args = parser.parse_args()
+
+    for backend in args.backends:
+        segmenter = get_segmenter(backend)
+        if hasattr(segmenter, "warm_up"):
+            print(f"{backend:<7} warm-up {segmenter.warm_up():.1f} s")
+        for path, targets in SCREENSHOTS.items():
+            image = cv2.cvtColor(cv2.imread(str(path)), cv2.COLOR_BGR2RGB)
+            timings_ms = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                masks = segmenter.segment(image)
+                timings_ms.append((time.perf_counter() - start) * 1000)
+            found = count_found_targets(masks, targets, image.shape[0] * image.shape[1])
+            labels = suppress_masks(masks, image.shape)
+            print(
+                f"{backend:<7} {path.name:<18} runs={len(timings_ms):<3} "
+                f"median={statistics.median(timings_ms):9.1f} ms  "
+                f"boxes={len(masks):<4} labels={len(labels):<4} "
+                f"targets found={found}/{len(targets)}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# Benchmarks the cold-start time of the agent modules.
+#
+# Every import runs in a fresh interpreter, so nothing is cached in
+# sys.modules. For each module the benchmark reports the median wall time of
+# `python -c "import <module>"` (minus a bare interpreter start), the largest
+# imports from `python -X importtime`, and which of the heavy provider SDKs
+# and vision libraries the import pulled in. Those should only be loaded when
+# a model is called or a screenshot is segmented.
+#
+# Usage:
+#   python -m benchmarks.bench_startup [--runs 5] [--modules src.utils src.ui_integration]
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+MODULES = [
+    "src.utils",
+    "src.ui_integration",
+    "src.booking_grid",
+    "src.tools",
+    "src.segmenter",
+    "src.labeler",
+]
+HEAVY = [
+    "litellm",
+    "openai",
+    "anthropic",
+    "google.generativeai",
+    "vertexai",
+    "requests",
+    "yaml",
+    "PIL",
+    "cv2",
+    "matplotlib",
+    "torch",
+    "segment_anything",
+]
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def run(code: str, *flags: str) -> tuple[float, subprocess.CompletedProcess]:
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, *flags, "-c", code], capture_output=True, text=True)
+    return time.perf_counter() - start, result
+
+
+def cold_start(module: str, runs: int, baseline: float) -> float:
+    times = []
+    for _ in range(runs):
+        seconds, result = run(f"import {module}")
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+        times.append(seconds - baseline)
+    return statistics.median(times)
+
+
+def largest_imports(module: str, n: int = 5) -> list[tuple[str, float]]:
+    """The top-level packages with the largest cumulative import time (ms)."""
+    _, result = run(f"import {module}", "-X", "importtime")
+    cumulative = {}
+    for match in _IMPORTTIME.finditer(result.stderr):
+        level = len(match.group(3)) // 2
+        if level == 0:
+            name = match.group(4).split(".")[0]
+            cumulative[name] = cumulative.get(name, 0) + int(match.group(2)) / 1000
+    return sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:n]
+
+
+def loaded_heavy(module: str) -> list[str]:
+    _, result = run(
+        f"import sys, json, {module}; print(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))"
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    args = parser.parse_args()
+
+    baseline = statistics.median(run("pass")[0] for _ in range(args.runs))
+    print(f"{'interpreter':<20} {baseline * 1000:8.0f} ms")
+    for module in args.modules:
+        try:
+            seconds = cold_start(module, args.runs, baseline)
+        except RuntimeError as error:
+            print(f"{module:<20} {'failed':>8}     {str(error).strip().splitlines()[-1]}")
+            continue
+        largest = ", ".join(f"{name} {ms:.0f}" for name, ms in largest_imports(module))
+        heavy = ", ".join(loaded_heavy(module)) or "-"
+        print(f"{module:<20} {seconds * 1000:8.0f} ms  heavy: {heavy:<30} largest (ms): {largest}")
+
+
+if __name__ == "__main__":
+    main()
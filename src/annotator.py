@@ -0,0 +1,64 @@
+# Draws the SAM masks and their numbers onto a screenshot.
+#
+# The overlay is drawn with PIL directly onto a copy of the screenshot at its
+# native resolution and encoded to PNG in memory, so the image that is sent to
+# the model has the same pixel coordinates as the page and nothing is written
+# to disk.
+import io
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+LABEL_COLOR = (255, 0, 0)
+LABEL_OUTLINE_COLOR = (255, 255, 255)
+LABEL_FONT_SIZE = 12
+
+
+def to_png(image: Image.Image) -> bytes:
+    buffered = io.BytesIO()
+    image.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def draw_numbered_boxes(
+    canvas: Image.Image,
+    boxes: dict[int, tuple[float, float, float, float]],
+    anchors: dict[int, tuple[float, float]],
+    font_size: int = LABEL_FONT_SIZE,
+) -> None:
+    """Draws [x, y, w, h] boxes and their numbers at `anchors` onto `canvas` in place."""
+    draw = ImageDraw.Draw(canvas)
+    font = ImageFont.load_default(size=font_size)
+    for x, y, w, h in boxes.values():
+        draw.rectangle((x, y, x + w, y + h), outline=LABEL_COLOR, width=1)
+    # numbers go on top of all boxes, with an outline so they stay readable on any background
+    for number, anchor in anchors.items():
+        draw.text(
+            anchor,
+            str(number),
+            fill=LABEL_COLOR,
+            font=font,
+            anchor="mm",
+            stroke_width=2,
+            stroke_fill=LABEL_OUTLINE_COLOR,
+        )
+
+
+def draw_rectangles_and_numbers(
+    image: np.ndarray | Image.Image,
+    masks: list[dict],
+    coordinates: dict[int, dict[str, int]],
+) -> bytes:
+    """Draws the bounding box of each mask and its number at `coordinates` and returns PNG bytes.
+
+    Masks are numbered by decreasing area, starting at 1, like in `calculate_number_positions`."""
+    canvas = Image.fromarray(image) if isinstance(image, np.ndarray) else image.convert("RGB")
+    sorted_masks = sorted(masks, key=(lambda x: x["area"]), reverse=True)
+    draw_numbered_boxes(
+        canvas,
+        boxes={i: tuple(mask["bbox"]) for i, mask in enumerate(sorted_masks, 1)},
+        anchors={
+            i: (coordinates[i]["x"], coordinates[i]["y"]) for i in range(1, len(sorted_masks) + 1)
+        },
+    )
+    return to_png(canvas)
@@ -0,0 +1,113 @@
+# Answers availability questions like "which courts are free for 1 hour between
+# 17:00 and 19:00?" locally instead of letting the model reason over a table.
+#
+# The AvailabilityIndex is built from the court -> slot -> status map returned by
+# src/booking_grid.py. Per court it keeps the free slots merged into sorted,
+# non-overlapping intervals, so a query is a binary search plus a scan over the
+# few free runs that overlap the requested window.
+from bisect import bisect_right
+from dataclasses import dataclass
+
+from src.booking_grid import BookingGrid
+
+Minutes = int
+
+
+def parse_time(time: str | Minutes) -> Minutes:
+    """'17:30' -> 1050 minutes after midnight."""
+    if isinstance(time, int):
+        return time
+    hours, minutes = time.strip().split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def format_time(minutes: Minutes) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+@dataclass(frozen=True)
+class FreeRun:
+    court: str
+    start: Minutes
+    end: Minutes
+
+    @property
+    def duration(self) -> Minutes:
+        return self.end - self.start
+
+    def __str__(self):
+        return f"{self.court}: {format_time(self.start)}-{format_time(self.end)}"
+
+
+class AvailabilityIndex:
+    def __init__(self, free_intervals: dict[str, list[tuple[Minutes, Minutes]]]):
+        self.free_intervals = free_intervals
+        # start times per court, for bisecting
+        self._starts = {
+            court: [start for start, _ in intervals] for court, intervals in free_intervals.items()
+        }
+
+    @classmethod
+    def from_grid(cls, grid: BookingGrid) -> "AvailabilityIndex":
+        """Merges adjacent free slots of each court into contiguous free intervals."""
+        free_intervals = {}
+        for court, slots in grid.items():
+            free_slots = sorted(
+                tuple(parse_time(time) for time in slot.split("-"))
+                for slot, status in slots.items()
+                if status == "free"
+            )
+            merged: list[tuple[Minutes, Minutes]] = []
+            for start, end in free_slots:
+                if merged and start <= merged[-1][1]:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+                else:
+                    merged.append((start, end))
+            free_intervals[court] = merged
+        return cls(free_intervals)
+
+    @property
+    def courts(self) -> list[str]:
+        return list(self.free_intervals.keys())
+
+    def find_free_runs(
+        self,
+        duration: Minutes,
+        window_start: str | Minutes = "00:00",
+        window_end: str | Minutes = "24:00",
+        courts: list[str] | None = None,
+    ) -> list[FreeRun]:
+        """Finds all free runs of at least `duration` minutes within [window_start, window_end].
+
+        Runs are clipped to the window, so a court that is free from 16:00 to 22:00 is returned as
+        free from 17:00 to 19:00 for the window 17:00-19:00."""
+        window_start, window_end = parse_time(window_start), parse_time(window_end)
+        runs = []
+        for court in courts or self.courts:
+            intervals = self.free_intervals.get(court, [])
+            # the last interval starting before the window may still reach into it
+            i = max(bisect_right(self._starts[court], window_start) - 1, 0) if intervals else 0
+            for start, end in intervals[i:]:
+                if start >= window_end:
+                    break
+                start, end = max(start, window_start), min(end, window_end)
+                if end - start >= duration:
+                    runs.append(FreeRun(court=court, start=start, end=end))
+        return runs
+
+    def is_free(self, court: str, start: str | Minutes, end: str | Minutes) -> bool:
+        start, end = parse_time(start), parse_time(end)
+        return bool(self.find_free_runs(end - start, start, end, courts=[court]))
+
+
+def format_free_runs(runs: list[FreeRun], courts: list[str]) -> str:
+    """Formats the query result in the answer format used in the agents' system prompts."""
+    lines = []
+    for court in courts:
+        court_runs = [run for run in runs if run.court == court]
+        lines.append(f"{court}:")
+        lines += [f"- {format_time(run.start)}-{format_time(run.end)}" for run in court_runs] or [
+            "None"
+        ]
+        lines.append("")
+    return "\n".join(lines).strip()
@@ -0,0 +1,335 @@
+# Reads the court availability grid of the ebusy booking system straight from
+# the DOM instead of asking a vision model to read it off a screenshot.
+#
+# The grid is returned in the same format as `actual_bookings_800x800` in
+# tests/test_booking_visual_recognition.py:
+#   {"Platz 1": {"17:00-17:30": "booked", "17:30-18:00": "free", ...}, ...}
+import json
+import logging
+import re
+from typing import Any, Literal
+
+from playwright.sync_api import Page
+
+from src.json_repair import parse_json
+
+SlotStatus = Literal["booked", "free"]
+BookingGrid = dict[str, dict[str, SlotStatus]]
+
+DEFAULT_SLOT_MINUTES = 30
+
+logger = logging.getLogger(__name__)
+
+# Collects the raw cells of the first table that has court columns ("Platz 1", "P2", ...)
+# and time rows ("17:00" or "17:00-17:30"). rowspan/colspan are expanded, so a booking
+# spanning several slots shows up in every slot it covers. Everything happens in a single
+# `page.evaluate` round trip; interpretation of the cells is done in Python.
+BOOKING_GRID_JS = """
+() => {
+    const TIME_RE = /\\d{1,2}:\\d{2}/;
+    const COURT_RE = /^(platz|court|p)\\s*\\d+\\b/i;
+    const text = (cell) => (cell.innerText || cell.textContent || "").trim();
+
+    const expand = (table) => {
+        const grid = [];
+        Array.from(table.rows).forEach((row, r) => {
+            grid[r] = grid[r] || [];
+            let c = 0;
+            Array.from(row.cells).forEach((cell) => {
+                while (grid[r][c]) c++;
+                for (let dr = 0; dr < (cell.rowSpan || 1); dr++) {
+                    for (let dc = 0; dc < (cell.colSpan || 1); dc++) {
+                        grid[r + dr] = grid[r + dr] || [];
+                        grid[r + dr][c + dc] = cell;
+                    }
+                }
+                c += cell.colSpan || 1;
+            });
+        });
+        return grid;
+    };
+
+    for (const table of document.querySelectorAll("table")) {
+        const grid = expand(table);
+        const headerIndex = grid.findIndex(
+            (row) => row.some((cell) => cell && COURT_RE.test(text(cell)))
+        );
+        if (headerIndex < 0) continue;
+
+        const header = grid[headerIndex];
+        const courtColumns = [];
+        header.forEach((cell, c) => {
+            if (cell && COURT_RE.test(text(cell)) && header.indexOf(cell) === c) {
+                courtColumns.push(c);
+            }
+        });
+
+        const rows = [];
+        for (const row of grid.slice(headerIndex + 1)) {
+            const timeCell = row.find(
+                (cell, c) => cell && !courtColumns.includes(c) && TIME_RE.test(text(cell))
+            );
+            if (!timeCell) continue;
+            rows.push({
+                time: text(timeCell),
+                cells: courtColumns.map((c) => row[c] ? {
+                    text: text(row[c]),
+                    className: String(row[c].className || ""),
+                    title: row[c].getAttribute("title") || "",
+                } : null),
+            });
+        }
+        if (rows.length === 0) continue;
+        return {courts: courtColumns.map((c) => text(header[c])), rows: rows};
+    }
+    return null;
+}
+"""
+
+_TIME_PATTERN = re.compile(r"(\d{1,2}):(\d{2})")
+_COURT_PATTERN = re.compile(r"^(?:platz|court|p)\s*(\d+)\b", re.IGNORECASE)
+_FREE_TEXT_PATTERN = re.compile(r"\b(buchen|frei|free|book now)\b", re.IGNORECASE)
+_FREE_CLASS_PATTERN = re.compile(r"\b(free|bookable|available|frei)\b", re.IGNORECASE)
+
+
+def _to_minutes(hours: str, minutes: str) -> int:
+    return int(hours) * 60 + int(minutes)
+
+
+def _format_minutes(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def normalize_court_name(name: str) -> str:
+    """Maps 'P1', 'Platz 1' or 'Court 1' to the canonical 'Platz 1'."""
+    match = _COURT_PATTERN.match(name.strip())
+    if match is None:
+        return name.strip()
+    return f"Platz {int(match.group(1))}"
+
+
+def classify_cell(cell: dict | None) -> SlotStatus:
+    """A cell is free if it offers to book ('BUCHEN') or is marked free via its CSS class."""
+    if not cell:
+        return "booked"
+    if _FREE_TEXT_PATTERN.search(cell.get("text", "")) or _FREE_TEXT_PATTERN.search(
+        cell.get("title", "")
+    ):
+        return "free"
+    if _FREE_CLASS_PATTERN.search(cell.get("className", "").replace("-", " ")):
+        return "free"
+    return "booked"
+
+
+def _slot_labels(time_labels: list[str]) -> list[str] | None:
+    """Turns row labels like '17:00' or '17:00 - 17:30' into 'HH:MM-HH:MM' slot labels."""
+    bounds = []
+    for label in time_labels:
+        times = _TIME_PATTERN.findall(label)
+        if not times:
+            return None
+        start = _to_minutes(*times[0])
+        end = _to_minutes(*times[1]) if len(times) > 1 else None
+        bounds.append((start, end))
+
+    steps = [b[0] - a[0] for a, b in zip(bounds, bounds[1:]) if b[0] > a[0]]
+    slot_minutes = min(steps) if steps else DEFAULT_SLOT_MINUTES
+
+    labels = []
+    for i, (start, end) in enumerate(bounds):
+        if end is None:
+            end = start + slot_minutes
+        labels.append(f"{_format_minutes(start)}-{_format_minutes(end)}")
+    return labels
+
+
+def parse_booking_grid(raw: dict[str, Any] | None) -> BookingGrid | None:
+    """Converts the raw cells collected by BOOKING_GRID_JS into a court -> slot -> status map."""
+    if not raw or not raw.get("courts") or not raw.get("rows"):
+        return None
+    slot_labels = _slot_labels([row["time"] for row in raw["rows"]])
+    if slot_labels is None:
+        return None
+
+    grid: BookingGrid = {normalize_court_name(court): {} for court in raw["courts"]}
+    courts = list(grid.keys())
+    for slot, row in zip(slot_labels, raw["rows"]):
+        for court, cell in zip(courts, row["cells"]):
+            grid[court][slot] = classify_cell(cell)
+    return grid
+
+
+def extract_booking_grid_from_dom(page: Page) -> BookingGrid | None:
+    """Reads the booking grid of the current page in a single `page.evaluate` call.
+
+    Returns None if the page does not contain a recognizable booking table."""
+    return parse_booking_grid(page.evaluate(BOOKING_GRID_JS))
+
+
+SLOT_PATTERN = r"^\d{2}:\d{2}-\d{2}:\d{2}$"
+
+# JSON schemas for structured output. Providers with strict schemas do not allow free-form keys, so
+# courts are listed as items with a "court" field and converted to the court -> ... maps afterwards.
+FREE_SLOTS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "courts": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "court": {"type": "string"},
+                    "free_slots": {
+                        "type": "array",
+                        "items": {"type": "string", "pattern": SLOT_PATTERN},
+                    },
+                },
+                "required": ["court", "free_slots"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["courts"],
+    "additionalProperties": False,
+}
+BOOKING_GRID_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "courts": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "court": {"type": "string"},
+                    "slots": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "time": {"type": "string", "pattern": SLOT_PATTERN},
+                                "status": {"type": "string", "enum": ["booked", "free"]},
+                            },
+                            "required": ["time", "status"],
+                            "additionalProperties": False,
+                        },
+                    },
+                },
+                "required": ["court", "slots"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["courts"],
+    "additionalProperties": False,
+}
+
+
+def _complete_with_schema(
+    screenshot_base64: str, prompt: str, schema: dict, name: str, model: str
+) -> Any:
+    """One round trip: screenshot in, JSON that is valid against `schema` out.
+
+    Uses the provider's JSON-schema response format where litellm knows it is supported, and JSON
+    mode with the schema in the prompt otherwise. The answer is validated locally in both cases."""
+    import jsonschema
+    import litellm
+    from litellm import completion
+
+    from src.utils import create_user_message
+
+    if litellm.supports_response_schema(model=model):
+        response_format = {
+            "type": "json_schema",
+            "json_schema": {"name": name, "schema": schema, "strict": True},
+        }
+    else:
+        response_format = {"type": "json_object"}
+        prompt += f"\nThe JSON must be valid against this JSON schema:\n{json.dumps(schema)}"
+    response = completion(
+        model=model,
+        messages=[create_user_message(prompt=prompt, images_base64=[screenshot_base64])],
+        temperature=0.0,
+        response_format=response_format,
+    )
+    answer = parse_json(response.choices[0].message.content)
+    try:
+        jsonschema.validate(answer, schema)
+    except jsonschema.ValidationError as error:
+        raise ValueError(
+            f"The answer of {model} does not match the {name} schema: {error.message}"
+        ) from error
+    return answer
+
+
+def free_slots_from_answer(answer: dict) -> dict[str, list[str]]:
+    return {
+        normalize_court_name(item["court"]): sorted(item["free_slots"]) for item in answer["courts"]
+    }
+
+
+def booking_grid_from_answer(answer: dict) -> BookingGrid:
+    return {
+        normalize_court_name(item["court"]): {
+            slot["time"]: slot["status"] for slot in item["slots"]
+        }
+        for item in answer["courts"]
+    }
+
+
+def extract_free_slots_from_screenshot(
+    screenshot_base64: str, model: str = "gpt-4o"
+) -> dict[str, list[str]]:
+    """Reads the free slots per court from a screenshot of the booking table in one model call."""
+    prompt = (
+        "Here is a screenshot of a table that contains the booking status of tennis courts. "
+        "List every court in the table with all of its free and bookable time slots "
+        '(cells marked with "BUCHEN"), formatted like "17:30-18:00". '
+        "Courts without a free slot get an empty list."
+    )
+    answer = _complete_with_schema(
+        screenshot_base64, prompt, FREE_SLOTS_SCHEMA, "free_slots", model
+    )
+    return free_slots_from_answer(answer)
+
+
+def extract_booking_grid_from_screenshot(
+    screenshot_base64: str, model: str = "gpt-4o"
+) -> BookingGrid:
+    """Vision fallback: asks a multimodal model to read the booking grid from a screenshot."""
+    prompt = (
+        "Here is a screenshot of a table that contains the booking status of tennis courts. "
+        "For every court and every time slot in the table, tell whether the slot is free "
+        '(marked with "BUCHEN") or booked. Time slots are formatted like "17:30-18:00".'
+    )
+    answer = _complete_with_schema(
+        screenshot_base64, prompt, BOOKING_GRID_SCHEMA, "booking_grid", model
+    )
+    return booking_grid_from_answer(answer)
+
+
+def extract_booking_grid(
+    page: Page,
+    screenshot_base64: str | None = None,
+    model: str = "gpt-4o",
+) -> BookingGrid | None:
+    """Extracts the booking grid from the DOM and falls back to vision if the DOM is not readable.
+
+    Returns None if neither works, including when the model's answer does not match the schema."""
+    grid = extract_booking_grid_from_dom(page)
+    if grid is not None:
+        return grid
+    if screenshot_base64 is None:
+        return None
+    try:
+        return extract_booking_grid_from_screenshot(screenshot_base64, model=model)
+    except ValueError as error:
+        logger.warning("Could not read the booking grid from the screenshot: %s", error)
+        return None
+
+
+def free_slots(grid: BookingGrid) -> dict[str, list[str]]:
+    """Lists the free slots per court, like `expected_output` in the visual recognition tests."""
+    return {
+        court: [slot for slot, status in slots.items() if status == "free"]
+        for court, slots in grid.items()
+    }
@@ -0,0 +1,61 @@
+# Launches the Chromium instance used by the agent scripts.
+#
+# Since the letter hints are drawn by src/labeler.py instead of the Vimium
+# extension, the browser can run headless. Headed mode is still available for
+# debugging; both modes are configured so that screenshots look the same:
+# fixed viewport, device scale factor 1 and no scrollbars.
+import os
+
+from playwright.sync_api import BrowserContext, Playwright
+
+from src.labeler import install_labeler
+
+PLAYWRIGHT_USER_DATA_DIRECTORY = os.path.expanduser("~/playwright_user_data")
+HEADLESS = os.getenv("HEADLESS", "false").lower() in ("1", "true", "yes")
+DEVICE_SCALE_FACTOR = 1
+
+# flags shared by headed and headless mode, so that both render the same pixels
+COMMON_ARGS = [
+    f"--force-device-scale-factor={DEVICE_SCALE_FACTOR}",
+    "--hide-scrollbars",
+    "--font-render-hinting=none",
+]
+# headless mode runs on servers without a GPU; skip everything that only matters for a display
+HEADLESS_ARGS = [
+    "--disable-gpu",
+    "--disable-dev-shm-usage",
+    "--mute-audio",
+]
+
+# headed Chromium draws overlay scrollbars that headless Chromium does not have
+HIDE_SCROLLBARS_JS = """
+document.addEventListener("DOMContentLoaded", () => {
+    const style = document.createElement("style");
+    style.textContent = "::-webkit-scrollbar { display: none; } html { scrollbar-width: none; }";
+    document.head.appendChild(style);
+});
+"""
+
+
+def launch_browser(
+    p: Playwright,
+    headless: bool = HEADLESS,
+    width: int = 760,
+    height: int = 800,
+    user_data_dir: str = PLAYWRIGHT_USER_DATA_DIRECTORY,
+) -> BrowserContext:
+    """Launches a persistent Chromium context with the element labeler installed."""
+    browser = p.chromium.launch_persistent_context(
+        user_data_dir=user_data_dir,
+        headless=headless,
+        args=COMMON_ARGS + (HEADLESS_ARGS if headless else []),
+        viewport={"width": width, "height": height},
+        screen={"width": width, "height": height},
+        device_scale_factor=DEVICE_SCALE_FACTOR,
+        color_scheme="light",
+        locale="de-DE",
+        timezone_id="Europe/Berlin",
+    )
+    browser.add_init_script(HIDE_SCROLLBARS_JS)
+    install_labeler(browser)  # draws the yellow letter hints that Vimium used to draw
+    return browser
@@ -0,0 +1,162 @@
+# Crawls the availability of several days at once.
+#
+# Instead of one agent run per day that clicks through the date picker
+# ("Datum wählen"), every day is loaded directly via its URL. The page loads are
+# spread over a bounded pool of browser contexts that run concurrently, the grid
+# of each day is read from the DOM (src/booking_grid.py) and cached with a TTL,
+# and the result is merged into one court x day x slot view.
+#
+# Usage:
+#   python -m src.crawl [--days 7] [--contexts 3]
+import argparse
+import asyncio
+import json
+import logging
+from datetime import date, timedelta
+
+from cachetools import TTLCache
+from playwright.async_api import Browser, BrowserContext, Route, async_playwright
+
+from src.booking_grid import BOOKING_GRID_JS, BookingGrid, SlotStatus, parse_booking_grid
+from src.resource_policy import EBUSY_PROFILE, ResourcePolicy
+
+# ebusy selects the day of the booking grid via the currentDate query parameter
+DATE_URL_TEMPLATE = "https://safo.ebusy.de/lite-module/407?currentDate={date:%m/%d/%Y}"
+
+# court -> day (ISO format) -> slot -> status
+MultiDayGrid = dict[str, dict[str, dict[str, SlotStatus]]]
+
+# per-day grids by URL; a cancellation within a few minutes does not matter for a week overview
+DAY_CACHE: TTLCache = TTLCache(maxsize=64, ttl=300)
+
+logger = logging.getLogger(__name__)
+
+
+def merge_days(grids: dict[date, BookingGrid]) -> MultiDayGrid:
+    """Merges per-day grids into one court -> day -> slot view."""
+    merged: MultiDayGrid = {}
+    for day, grid in sorted(grids.items()):
+        for court, slots in grid.items():
+            merged.setdefault(court, {})[day.isoformat()] = slots
+    return merged
+
+
+def _cached(cache: TTLCache, url: str) -> BookingGrid | None:
+    # a single read: an entry can expire between a membership test and a read, and
+    # TTLCache.get does both
+    try:
+        return cache[url]
+    except KeyError:
+        return None
+
+
+async def _block_requests(context: BrowserContext, policy: ResourcePolicy) -> None:
+    async def handle_route(route: Route) -> None:
+        request = route.request
+        if policy.get_block_reason(request.url, request.resource_type) is None:
+            await route.continue_()
+        else:
+            await route.abort("blockedbyclient")
+
+    await context.route("**/*", handle_route)
+
+
+async def _extract_day(contexts: asyncio.Queue, url: str, cache: TTLCache) -> BookingGrid | None:
+    """Loads and reads one day. A day that fails to load (timeout, navigation or script error) is
+    logged and skipped, so it does not fail the days that loaded; a day that did load is cached
+    right away."""
+    context = await contexts.get()
+    try:
+        page = await context.new_page()
+        try:
+            await page.goto(url, wait_until="domcontentloaded")
+            grid = parse_booking_grid(await page.evaluate(BOOKING_GRID_JS))
+        finally:
+            await page.close()
+    except Exception as error:
+        logger.warning(f"could not read {url}: {error}")
+        return None
+    finally:
+        contexts.put_nowait(context)
+    if grid is not None:
+        cache[url] = grid
+    return grid
+
+
+async def _crawl(
+    browser: Browser,
+    days: list[date],
+    url_template: str,
+    max_contexts: int,
+    policy: ResourcePolicy | None,
+    cache: TTLCache,
+) -> dict[date, BookingGrid]:
+    urls = {day: url_template.format(date=day) for day in days}
+    grids = {day: grid for day in days if (grid := _cached(cache, urls[day])) is not None}
+    missing = [day for day in days if day not in grids]
+
+    contexts: asyncio.Queue = asyncio.Queue()
+    try:
+        for _ in range(min(max_contexts, len(missing))):
+            context = await browser.new_context(viewport={"width": 760, "height": 800})
+            contexts.put_nowait(context)
+            if policy is not None:
+                await _block_requests(context, policy)
+        # every day finishes (or fails on its own) before the contexts are closed under it
+        loaded = await asyncio.gather(
+            *[_extract_day(contexts, urls[day], cache) for day in missing], return_exceptions=True
+        )
+    finally:
+        while not contexts.empty():
+            await contexts.get_nowait().close()
+    for day, grid in zip(missing, loaded):
+        if isinstance(grid, dict):  # not None (no table) and not an exception
+            grids[day] = grid
+    return {day: grids[day] for day in days if day in grids}
+
+
+async def crawl_availability_async(
+    days: list[date],
+    url_template: str = DATE_URL_TEMPLATE,
+    max_contexts: int = 3,
+    policy: ResourcePolicy | None = EBUSY_PROFILE,
+    cache: TTLCache = DAY_CACHE,
+) -> MultiDayGrid:
+    """Loads the booking grid of every day in `days` with at most `max_contexts` pages in parallel.
+
+    Days that are still cached are not loaded again. Days without a readable booking table are
+    left out of the result."""
+    cached = {day: _cached(cache, url_template.format(date=day)) for day in days}
+    if all(grid is not None for grid in cached.values()):
+        return merge_days(cached)
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            grids = await _crawl(browser, days, url_template, max_contexts, policy, cache)
+        finally:
+            await browser.close()
+    return merge_days(grids)
+
+
+def crawl_availability(days: list[date], **kwargs) -> MultiDayGrid:
+    """Synchronous wrapper around `crawl_availability_async`."""
+    return asyncio.run(crawl_availability_async(days, **kwargs))
+
+
+def next_days(n: int, start: date | None = None) -> list[date]:
+    start = start or date.today()
+    return [start + timedelta(days=i) for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--contexts", type=int, default=3)
+    args = parser.parse_args()
+
+    availability = crawl_availability(next_days(args.days), max_contexts=args.contexts)
+    print(json.dumps(availability, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,436 @@
+# Long-lived agent daemon with a local task API.
+#
+# Instead of one `python -m src.tennis_lite` process per task, the daemon
+# starts once: it imports the agent (model SDKs, tool schemas) and launches
+# one browser per worker, then keeps both warm across tasks. Tasks are
+# submitted over HTTP on localhost, wait in a bounded queue and run on the
+# next free worker, so `--workers` is the number of tasks that run at the
+# same time. Each task gets a fresh page in its worker's browser.
+#
+# The API speaks JSON, and streams the step events of a task as NDJSON (one
+# JSON object per line) until the task has finished:
+#
+#     POST /tasks                {"task": "...", "url": "...", "max_steps": 5}  -> 202 the task
+#     POST /tasks?stream=1       same, but streams the events of the task
+#     GET  /tasks                all tasks
+#     GET  /tasks/<id>           one task, with its answer once it is done
+#     GET  /tasks/<id>/events    the events of the task so far, then live until it finishes
+#
+# A full queue answers 503, so clients can back off. A browser that crashes
+# or fails to start is restarted; a worker whose browser keeps failing gives
+# up, and once no worker is left, queued and new tasks fail instead of
+# waiting forever. Every task writes its screenshots to its own directory.
+#
+# Usage:
+#   python -m src.daemon [--port 8765] [--workers 1] [--max-queued 16]
+#   curl -N -d '{"task": "Which courts are free between 17:00 and 19:00?"}' \
+#       "localhost:8765/tasks?stream=1"
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, ContextManager, Iterator
+from urllib.parse import urlsplit
+
+from src.tracing import enable_tracing, span
+
+DEFAULT_PORT = 8765
+MAX_QUEUED = 16
+KEEP_FINISHED = 100  # finished tasks kept for GET /tasks/<id>
+MAX_BROWSER_FAILURES = 3  # a worker gives up after this many browser failures in a row
+BROWSER_RESTART_DELAY = 1.0  # seconds before the first restart, doubled for every further one
+SCREENSHOT_DIR = "screenshots"  # every task writes to its own subdirectory
+
+logger = logging.getLogger(__name__)
+
+
+class Unavailable(Exception):
+    """The daemon cannot take a task right now."""
+
+
+class QueueFull(Unavailable):
+    pass
+
+
+class BrowserFailed(Exception):
+    """The browser of a worker cannot open pages any more."""
+
+
+@dataclass
+class Task:
+    description: str
+    url: str | None = None
+    max_steps: int = 5
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    status: str = "queued"  # queued, running, done, failed
+    answer: str | None = None
+    error: str | None = None
+    created: float = field(default_factory=time.time)
+    started: float | None = None
+    finished: float | None = None
+    events: list[dict] = field(default_factory=list, repr=False)
+    _changed: threading.Condition = field(default_factory=threading.Condition, repr=False)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def emit(self, event: dict) -> None:
+        """Records an event of the task and wakes up everyone streaming its events."""
+        with self._changed:
+            self.events.append(
+                {
+                    "task_id": self.id,
+                    "seq": len(self.events),
+                    "time": round(time.time(), 3),
+                    **event,
+                }
+            )
+            self._changed.notify_all()
+
+    def set_status(self, status: str, **data) -> None:
+        with self._changed:
+            self.status = status
+            if status == "running":
+                self.started = time.time()
+            elif status in ("done", "failed"):
+                self.finished = time.time()
+        self.emit({"type": "status", "status": status, **data})
+
+    def stream_events(self, timeout: float | None = None) -> Iterator[dict]:
+        """Yields all events of the task, waiting for new ones until the task has finished (or
+        `timeout` seconds passed without a new event)."""
+        seq = 0
+        while True:
+            with self._changed:
+                if seq >= len(self.events) and not self.is_finished:
+                    self._changed.wait_for(
+                        lambda: seq < len(self.events) or self.is_finished, timeout
+                    )
+                new_events = self.events[seq:]
+                finished = self.is_finished
+            if not new_events and not finished:
+                return  # timed out
+            yield from new_events
+            seq += len(new_events)
+            if finished and seq >= len(self.events):
+                return
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "task": self.description,
+            "url": self.url,
+            "status": self.status,
+            "answer": self.answer,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "n_events": len(self.events),
+        }
+
+
+# runs a task on a page and returns its answer; events go to the callback
+Runner = Callable[[object, Task, Callable[[dict], None]], str | None]
+# opens the browser of worker i, kept open for as long as the worker runs
+BrowserFactory = Callable[[int], ContextManager]
+
+
+def run_tennis_lite(page, task: Task, emit: Callable[[dict], None]) -> str | None:
+    from src import tennis_lite
+
+    return tennis_lite.run_task(
+        page,
+        task.description,
+        url=task.url or tennis_lite.START_URL,
+        max_steps=task.max_steps,
+        emit=emit,
+        # screenshot numbers are only unique per directory
+        screenshot_dir=Path(SCREENSHOT_DIR) / task.id,
+    )
+
+
+@contextmanager
+def open_browser(worker: int, headless: bool = True):
+    """A persistent Chromium context for worker `worker`. Persistent contexts lock their profile
+    directory, so every worker but the first gets its own."""
+    from playwright.sync_api import sync_playwright
+
+    from src.browser import PLAYWRIGHT_USER_DATA_DIRECTORY, launch_browser
+    from src.resource_policy import EBUSY_PROFILE, apply_resource_policy
+
+    user_data_dir = (
+        PLAYWRIGHT_USER_DATA_DIRECTORY
+        if worker == 0
+        else f"{PLAYWRIGHT_USER_DATA_DIRECTORY}_{worker}"
+    )
+    with sync_playwright() as p:
+        browser = launch_browser(p, headless=headless, user_data_dir=user_data_dir)
+        apply_resource_policy(browser, EBUSY_PROFILE)
+        try:
+            yield browser
+        finally:
+            browser.close()
+
+
+class AgentDaemon:
+    """Runs submitted tasks on `workers` threads, each with its own warm browser. Playwright's sync
+    API is bound to the thread that started it, so a browser never changes threads."""
+
+    def __init__(
+        self,
+        runner: Runner = run_tennis_lite,
+        browser_factory: BrowserFactory = open_browser,
+        workers: int = 1,
+        max_queued: int = MAX_QUEUED,
+        keep_finished: int = KEEP_FINISHED,
+    ):
+        self.runner = runner
+        self.browser_factory = browser_factory
+        self.n_workers = workers
+        self.keep_finished = keep_finished
+        self._queue: queue.Queue[Task | None] = queue.Queue(maxsize=max_queued)
+        self._tasks: OrderedDict[str, Task] = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+        self._n_alive = 0
+        self._stopping = threading.Event()
+
+    def start(self) -> None:
+        self._n_alive = self.n_workers
+        for worker in range(self.n_workers):
+            thread = threading.Thread(
+                target=self._work, args=(worker,), name=f"agent-worker-{worker}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Lets the workers finish their task, then closes their browsers. Queued tasks fail."""
+        self._stopping.set()
+        self._fail_queued("daemon stopped")
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, description: str, url: str | None = None, max_steps: int = 5) -> Task:
+        """Queues a task. Raises QueueFull if `max_queued` tasks are waiting already, and
+        Unavailable if no worker has a browser any more."""
+        if self._threads and self._n_alive == 0:
+            raise Unavailable("no worker has a working browser")
+        task = Task(description=description, url=url, max_steps=max_steps)
+        task.set_status("queued")  # before a worker can pick it up, so the events stay in order
+        try:
+            self._queue.put_nowait(task)
+        except queue.Full:
+            raise QueueFull(f"{self._queue.maxsize} tasks are queued already") from None
+        with self._lock:
+            self._tasks[task.id] = task
+            self._prune()
+        if self._threads and self._n_alive == 0:  # the last worker gave up in the meantime
+            self._fail_queued("no worker has a working browser")
+        return task
+
+    def get(self, task_id: str) -> Task | None:
+        with self._lock:
+            return self._tasks.get(task_id)
+
+    def tasks(self) -> list[Task]:
+        with self._lock:
+            return list(self._tasks.values())
+
+    def _prune(self) -> None:
+        finished = [task_id for task_id, task in self._tasks.items() if task.is_finished]
+        for task_id in finished[: max(0, len(finished) - self.keep_finished)]:
+            del self._tasks[task_id]
+
+    def _fail_queued(self, error: str) -> None:
+        while True:
+            try:
+                task = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if task is not None:
+                task.error = error
+                task.set_status("failed", error=error)
+
+    def _work(self, worker: int) -> None:
+        """Runs tasks until stopped. A browser that fails to start or to open a page is restarted;
+        after MAX_BROWSER_FAILURES failures in a row the worker gives up, and when the last worker
+        gives up, the queued tasks fail instead of waiting forever."""
+        failures = 0
+        while failures < MAX_BROWSER_FAILURES and not self._stopping.is_set():
+            try:
+                with self.browser_factory(worker) as browser:
+                    while (task := self._queue.get()) is not None:
+                        self._run(task, browser, worker)
+                        failures = 0
+                return  # stopped
+            except Exception as error:
+                failures += 1
+                last_error = f"{type(error).__name__}: {error}"
+                logger.exception(
+                    f"browser of worker {worker} failed ({failures}/{MAX_BROWSER_FAILURES})"
+                )
+                self._stopping.wait(min(BROWSER_RESTART_DELAY * 2 ** (failures - 1), 30))
+        if self._stopping.is_set():
+            return
+        with self._lock:
+            self._n_alive -= 1
+            last_worker = self._n_alive == 0
+        logger.error(f"worker {worker} gave up")
+        if last_worker:
+            self._fail_queued(f"no worker has a working browser: {last_error}")
+
+    def _run(self, task: Task, browser, worker: int) -> None:
+        """Runs one task on a fresh page. Raises BrowserFailed if the browser cannot open a page;
+        the task fails either way."""
+        task.set_status("running", worker=worker)
+        page = None
+        try:
+            try:
+                page = browser.new_page()
+            except Exception as error:
+                raise BrowserFailed(f"could not open a page: {error}") from error
+            with span("task", task_id=task.id):
+                task.answer = self.runner(page, task, task.emit)
+            task.set_status("done", answer=task.answer)
+        except Exception as error:
+            logger.exception(f"task {task.id} failed")
+            task.error = f"{type(error).__name__}: {error}"
+            task.set_status("failed", error=task.error)
+            if isinstance(error, BrowserFailed):
+                raise
+        finally:
+            if page is not None:
+                try:
+                    page.close()
+                except Exception:
+                    logger.exception(f"could not close the page of task {task.id}")
+
+
+def make_handler(daemon: AgentDaemon) -> type[BaseHTTPRequestHandler]:
+    class TaskHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = urlsplit(self.path).path.strip("/").split("/")
+            if parts == ["tasks"]:
+                return self._send_json(HTTPStatus.OK, [task.summary() for task in daemon.tasks()])
+            if len(parts) in (2, 3) and parts[0] == "tasks":
+                task = daemon.get(parts[1])
+                if task is None:
+                    return self._send_json(HTTPStatus.NOT_FOUND, {"error": f"no task {parts[1]}"})
+                if len(parts) == 2:
+                    return self._send_json(HTTPStatus.OK, task.summary())
+                if parts[2] == "events":
+                    return self._stream(task)
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": f"no route {self.path}"})
+
+        def do_POST(self):
+            url = urlsplit(self.path)
+            if url.path.rstrip("/") != "/tasks":
+                return self._send_json(HTTPStatus.NOT_FOUND, {"error": f"no route {self.path}"})
+            try:
+                body = json.loads(
+                    self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}"
+                )
+                description = body["task"]
+                if not isinstance(description, str) or not description.strip():
+                    raise ValueError("'task' must be a non-empty string")
+                task = daemon.submit(
+                    description, url=body.get("url"), max_steps=int(body.get("max_steps", 5))
+                )
+            except (ValueError, KeyError, TypeError) as error:
+                return self._send_json(
+                    HTTPStatus.BAD_REQUEST, {"error": f"invalid task: {error!r}"}
+                )
+            except Unavailable as error:
+                return self._send_json(HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(error)})
+            if "stream=1" in url.query.split("&"):
+                return self._stream(task, status=HTTPStatus.ACCEPTED)
+            self._send_json(HTTPStatus.ACCEPTED, task.summary())
+
+        def _send_json(self, status: HTTPStatus, data) -> None:
+            body = json.dumps(data, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _stream(self, task: Task, status: HTTPStatus = HTTPStatus.OK) -> None:
+            # no Content-Length: the stream ends when the connection closes after the last event
+            self.send_response(status)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            try:
+                for event in task.stream_events():
+                    self.wfile.write(json.dumps(event, default=str).encode("utf-8") + b"\n")
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client went away; the task keeps running
+
+        def log_message(self, format, *args):
+            logger.info(f"{self.address_string()} {format % args}")
+
+    return TaskHandler
+
+
+def serve(
+    daemon: AgentDaemon, host: str = "127.0.0.1", port: int = DEFAULT_PORT
+) -> ThreadingHTTPServer:
+    """The HTTP server of the task API; call `serve_forever` on it."""
+    server = ThreadingHTTPServer((host, port), make_handler(daemon))
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--workers", type=int, default=1, help="browsers, i.e. tasks that run at the same time"
+    )
+    parser.add_argument("--max-queued", type=int, default=MAX_QUEUED)
+    parser.add_argument("--headed", action="store_true", help="show the browser windows")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    enable_tracing()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(threadName)s %(message)s")
+    import src.tennis_lite  # noqa: F401  the model SDKs and tool schemas load once, not per task
+
+    daemon = AgentDaemon(
+        browser_factory=lambda worker: open_browser(worker, headless=not args.headed),
+        workers=args.workers,
+        max_queued=args.max_queued,
+    )
+    daemon.start()
+    server = serve(daemon, args.host, args.port)
+    logger.info(f"listening on http://{args.host}:{args.port} with {args.workers} worker(s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.stop(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
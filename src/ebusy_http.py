@@ -0,0 +1,213 @@
+# Reads the booking grid of the ebusy lite module over plain HTTP.
+#
+# For read-only availability checks, driving Chromium is overkill: the
+# lite-module page (see tennis_lite.py) renders the booking table server-side.
+# EbusyClient downloads it through a pooled requests.Session that keeps and
+# reuses cookies, and parses the table with BeautifulSoup into the same
+# court -> slot -> status map as src/booking_grid.py. Only when the response no
+# longer looks like a booking table (ResponseShapeChanged), `get_booking_grid`
+# falls back to the browser.
+import importlib.util
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Callable
+
+import requests
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.booking_grid import BookingGrid, parse_booking_grid
+
+LITE_MODULE_URL = "https://safo.ebusy.de/lite-module/407"
+COOKIE_PATH = Path("~/.cache/ai-webbrowser-agent/ebusy_cookies.json").expanduser()
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/125.0.0.0 Safari/537.36"
+)
+# lxml is several times faster than the pure-Python parser; html.parser only
+# stays as a fallback for environments without it
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") is not None else "html.parser"
+_TIME_PATTERN = re.compile(r"\d{1,2}:\d{2}")
+_COURT_PATTERN = re.compile(r"^(platz|court|p)\s*\d+\b", re.IGNORECASE)
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseShapeChanged(Exception):
+    """The response does not contain a booking table we know how to read."""
+
+
+def _expand_table(table: Tag) -> list[list[Tag | None]]:
+    """Expands rowspan/colspan into a dense matrix of cells, like BOOKING_GRID_JS does."""
+    grid: list[list[Tag | None]] = []
+    for r, row in enumerate(table.find_all("tr")):
+        while len(grid) <= r:
+            grid.append([])
+        c = 0
+        for cell in row.find_all(["td", "th"], recursive=False):
+            while c < len(grid[r]) and grid[r][c] is not None:
+                c += 1
+            rowspan = int(cell.get("rowspan", 1) or 1)
+            colspan = int(cell.get("colspan", 1) or 1)
+            for dr in range(rowspan):
+                while len(grid) <= r + dr:
+                    grid.append([])
+                target = grid[r + dr]
+                for dc in range(colspan):
+                    while len(target) <= c + dc:
+                        target.append(None)
+                    target[c + dc] = cell
+            c += colspan
+    return grid
+
+
+def _text(cell: Tag) -> str:
+    return " ".join(cell.get_text(" ").split())
+
+
+def parse_booking_html(html: str) -> BookingGrid | None:
+    """Parses the booking table of a saved or downloaded lite-module page."""
+    soup = BeautifulSoup(html, HTML_PARSER, parse_only=SoupStrainer("table"))
+    for table in soup.find_all("table"):
+        grid = _expand_table(table)
+        header_index = next(
+            (
+                i
+                for i, row in enumerate(grid)
+                if any(cell is not None and _COURT_PATTERN.match(_text(cell)) for cell in row)
+            ),
+            None,
+        )
+        if header_index is None:
+            continue
+        header = grid[header_index]
+        court_columns = [
+            c
+            for c, cell in enumerate(header)
+            if cell is not None and _COURT_PATTERN.match(_text(cell)) and header.index(cell) == c
+        ]
+        rows = []
+        for row in grid[header_index + 1 :]:
+            time_cell = next(
+                (
+                    cell
+                    for c, cell in enumerate(row)
+                    if cell is not None
+                    and c not in court_columns
+                    and _TIME_PATTERN.search(_text(cell))
+                ),
+                None,
+            )
+            if time_cell is None:
+                continue
+            rows.append(
+                {
+                    "time": _text(time_cell),
+                    "cells": [
+                        (
+                            {
+                                "text": _text(row[c]),
+                                "className": " ".join(row[c].get("class", [])),
+                                "title": row[c].get("title", ""),
+                            }
+                            if c < len(row) and row[c] is not None
+                            else None
+                        )
+                        for c in court_columns
+                    ],
+                }
+            )
+        if rows:
+            return parse_booking_grid(
+                {"courts": [_text(header[c]) for c in court_columns], "rows": rows}
+            )
+    return None
+
+
+class EbusyClient:
+    def __init__(
+        self, cookie_path: Path | None = COOKIE_PATH, pool_size: int = 4, timeout: float = 10.0
+    ):
+        self.cookie_path = cookie_path
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": USER_AGENT, "Accept-Language": "de-DE,de;q=0.9"})
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504]),
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._load_cookies()
+
+    def _load_cookies(self) -> None:
+        if self.cookie_path is not None and self.cookie_path.exists():
+            self.session.cookies.update(json.loads(self.cookie_path.read_text()))
+
+    def _save_cookies(self) -> None:
+        if self.cookie_path is not None:
+            self.cookie_path.parent.mkdir(parents=True, exist_ok=True)
+            # the session cookies authenticate the user: readable by the owner only
+            fd = os.open(self.cookie_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            os.fchmod(fd, 0o600)
+            with os.fdopen(fd, "w") as file:
+                json.dump(self.session.cookies.get_dict(), file)
+
+    def fetch_booking_grid(self, url: str = LITE_MODULE_URL) -> BookingGrid:
+        """Downloads the lite-module page and parses its booking table.
+
+        Raises ResponseShapeChanged if the response is not an HTML page with a booking table."""
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        self._save_cookies()
+        content_type = response.headers.get("Content-Type", "")
+        if "html" not in content_type:
+            raise ResponseShapeChanged(f"Unexpected content type '{content_type}' from {url}")
+        grid = parse_booking_html(response.text)
+        if grid is None:
+            raise ResponseShapeChanged(f"No booking table found in the response from {url}")
+        return grid
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def fetch_booking_grid_with_browser(url: str) -> BookingGrid | None:
+    """The slow path: loads the page in headless Chromium and reads the grid from the DOM."""
+    from playwright.sync_api import sync_playwright
+
+    from src.booking_grid import extract_booking_grid_from_dom
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        page = browser.new_page()
+        page.goto(url)
+        grid = extract_booking_grid_from_dom(page)
+        browser.close()
+    return grid
+
+
+_default_client: EbusyClient | None = None
+
+
+def get_booking_grid(
+    url: str = LITE_MODULE_URL,
+    client: EbusyClient | None = None,
+    browser_fallback: Callable[[str], BookingGrid | None] = fetch_booking_grid_with_browser,
+) -> BookingGrid | None:
+    """Reads the booking grid over HTTP and only uses the browser if the page changed its shape."""
+    global _default_client
+    if client is None:
+        # share one session (connection pool + cookies) between calls
+        _default_client = _default_client or EbusyClient()
+        client = _default_client
+    try:
+        return client.fetch_booking_grid(url)
+    except ResponseShapeChanged as error:
+        logger.warning("%s. Falling back to the browser.", error)
+        return browser_fallback(url)
@@ -0,0 +1,137 @@
+# Runs the CPU-bound image work of the agents in worker processes.
+#
+# Segmenting a screenshot and drawing the overlay of its masks hold the GIL for
+# long enough to stall the Playwright loop, so the ImagePool runs them in a
+# process pool instead. Encoding a screenshot stays inline: it only base64s
+# the JPEG that Playwright already wrote, with no pixel work. A screenshot is
+# copied once into a shared-memory block, and the workers map that block as a
+# NumPy array, so a frame is never pickled. Only small results (masks as boxes,
+# label positions, PNG bytes) travel back. A bounded semaphore caps the number
+# of frames in flight: when the pool is saturated, `submit` blocks (or raises
+# PoolSaturated with block=False) instead of queueing frames without limit.
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import get_context, shared_memory
+from typing import Any, Callable
+
+import numpy as np
+
+
+class PoolSaturated(Exception):
+    """All slots of the image pool are taken."""
+
+
+@dataclass(frozen=True)
+class SharedFrame:
+    name: str
+    shape: tuple[int, ...]
+    dtype: str
+
+
+def _run_on_frame(func: Callable, frame: SharedFrame, args: tuple, kwargs: dict) -> Any:
+    memory = shared_memory.SharedMemory(name=frame.name)
+    try:
+        image = np.ndarray(frame.shape, dtype=frame.dtype, buffer=memory.buf)
+        image.flags.writeable = False
+        try:
+            return func(image, *args, **kwargs)
+        finally:
+            del image  # release the buffer before closing the mapping
+    finally:
+        try:
+            memory.close()
+        except BufferError:  # a traceback still references the frame; the mapping goes away with it
+            pass
+
+
+# Worker tasks. They take the frame as an RGB array and only import what they need, so a worker
+# process does not pull in the model clients.
+
+
+def segment_frame(image: np.ndarray, backend: str) -> tuple[list[dict], dict[int, dict[str, int]]]:
+    """Segments and numbers a frame like ui_integration.segment_image_with_positions, uncached."""
+    from src.mask_postprocessing import place_labels, suppress_masks
+    from src.segmenter import get_segmenter
+
+    masks = suppress_masks(get_segmenter(backend).segment(image), image.shape)
+    # the full-size boolean masks of SAM are not needed for boxes and numbers, and are
+    # expensive to send back
+    masks = [{key: value for key, value in mask.items() if key != "segmentation"} for mask in masks]
+    return masks, place_labels(masks)
+
+
+def annotate_frame(
+    image: np.ndarray, masks: list[dict], coordinates: dict[int, dict[str, int]]
+) -> bytes:
+    """Like annotator.draw_rectangles_and_numbers, for a frame: the PNG bytes of the overlay."""
+    from src.annotator import draw_rectangles_and_numbers
+
+    return draw_rectangles_and_numbers(image, masks, coordinates)
+
+
+class ImagePool:
+    def __init__(self, max_workers: int | None = None, max_pending: int | None = None):
+        self.max_workers = max_workers or max((os.cpu_count() or 2) - 1, 1)
+        self.max_pending = max_pending or 2 * self.max_workers
+        # spawn, not fork: the parent runs Playwright and other threads
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=get_context("spawn")
+        )
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    def submit(
+        self,
+        func: Callable,
+        image: np.ndarray,
+        *args,
+        block: bool = True,
+        timeout: float | None = None,
+        **kwargs,
+    ) -> Future:
+        """Runs `func(image, *args, **kwargs)` in a worker; `image` is handed over through shared
+        memory.
+
+        Waits for a free slot while `max_pending` frames are in flight, or raises PoolSaturated if
+        `block` is False or no slot frees up within `timeout` seconds."""
+        if not self._slots.acquire(blocking=block, timeout=timeout if block else None):
+            raise PoolSaturated(f"{self.max_pending} frames are already being processed")
+        memory = None
+        try:
+            image = np.ascontiguousarray(image)
+            memory = shared_memory.SharedMemory(create=True, size=max(image.nbytes, 1))
+            np.ndarray(image.shape, dtype=image.dtype, buffer=memory.buf)[...] = image
+            frame = SharedFrame(name=memory.name, shape=image.shape, dtype=image.dtype.str)
+            future = self._executor.submit(_run_on_frame, func, frame, args, kwargs)
+        except BaseException:
+            if memory is not None:  # the worker never got the frame: nobody else will unlink it
+                memory.close()
+                memory.unlink()
+            self._slots.release()
+            raise
+
+        def release(_: Future) -> None:
+            memory.close()
+            memory.unlink()
+            self._slots.release()
+
+        future.add_done_callback(release)
+        return future
+
+    def segment(self, image: np.ndarray, backend: str) -> Future:
+        return self.submit(segment_frame, image, backend)
+
+    def annotate(
+        self, image: np.ndarray, masks: list[dict], coordinates: dict[int, dict[str, int]]
+    ) -> Future:
+        return self.submit(annotate_frame, image, masks, coordinates)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def __enter__(self) -> "ImagePool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
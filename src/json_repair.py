@@ -0,0 +1,209 @@
+# Extracts JSON from model responses and repairs it locally.
+#
+# Models wrap JSON in prose and code fences, and now and then emit JSON that
+# `json.loads` rejects: unquoted keys, single or smart quotes, trailing or
+# missing commas, Python literals, comments, or a response cut off at the
+# token limit. `extract_json` finds the balanced top-level objects in a text
+# with a regex-driven scanner, parses them with the C decoder when they are
+# valid, and otherwise runs `repair_json`, a single pass over the candidate
+# that rewrites these defects and closes whatever the truncation left open.
+# Asking a model to fix the syntax is then only needed when this fails.
+import json
+import re
+from typing import Any, Iterator
+
+SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "„": '"', "‘": "'", "’": "'"})
+
+# characters the scanner has to look at; everything in between is skipped at C speed
+_STRUCTURE = re.compile(r'[{}\[\]"\\]')
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+_BARE_VALUE_END = re.compile(r"[\s,:\]}]")
+_LITERALS = {
+    "true": "true",
+    "false": "false",
+    "null": "null",
+    "True": "true",
+    "False": "false",
+    "None": "null",
+}
+_CLOSERS = {"{": "}", "[": "]"}
+
+_decoder = json.JSONDecoder()
+
+
+def iter_json_candidates(text: str, openers: str = "{") -> Iterator[str]:
+    """Yields the balanced top-level JSON-like substrings starting with one of `openers`.
+
+    A candidate that is still open at the end of the text (a truncated response) is yielded as well.
+    """
+    start, depth, in_string, skip = -1, 0, False, -1
+    for match in _STRUCTURE.finditer(text):
+        i, char = match.start(), match.group()
+        if i == skip:
+            continue
+        if char == "\\":
+            skip = i + 1
+        elif in_string:
+            in_string = char != '"'
+        elif depth == 0:
+            if char in openers:
+                start, depth = i, 1
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                yield text[start : i + 1]
+    if depth > 0:
+        yield text[start:]
+
+
+def repair_json(text: str) -> str:
+    """Rewrites common syntax defects of model-written JSON into valid JSON.
+
+    Handles unquoted keys, single and smart quotes, unquoted string values, Python literals,
+    comments, trailing and missing commas, raw newlines in strings, and truncation (open strings,
+    keys without a value, unclosed objects and arrays)."""
+    text = text.translate(SMART_QUOTES)
+    out: list[str] = []
+    stack: list[str] = []
+    expect_key = False  # the next token is a key of the innermost object
+    pending_key = False  # a key was written, but its ':' not yet
+    need_comma = False  # a value was completed; the next key or value needs a ',' first
+    i, n = 0, len(text)
+
+    def begin_token():
+        nonlocal need_comma
+        if need_comma:
+            out.append(",")
+            need_comma = False
+
+    def end_value():
+        nonlocal need_comma, expect_key
+        need_comma = bool(stack)
+        expect_key = False
+
+    while i < n:
+        char = text[i]
+        if char.isspace():
+            out.append(char)
+            i += 1
+        elif char in "\"'":
+            j, chars = i + 1, []
+            while j < n and text[j] != char:
+                if text[j] == "\\" and j + 1 < n:
+                    chars.append("'" if text[j + 1] == "'" else text[j : j + 2])
+                    j += 2
+                    continue
+                chars.append(
+                    {'"': '\\"', "\n": "\\n", "\r": "\\r", "\t": "\\t"}.get(text[j], text[j])
+                )
+                j += 1
+            begin_token()
+            out.append('"' + "".join(chars) + '"')
+            i = j + 1
+            if expect_key and stack and stack[-1] == "{":
+                expect_key, pending_key = False, True
+            else:
+                end_value()
+        elif char in "{[":
+            begin_token()
+            stack.append(char)
+            out.append(char)
+            expect_key = char == "{"
+            i += 1
+        elif char in "}]":
+            _strip_trailing_comma(out)
+            if pending_key:
+                out.append(": null")
+                pending_key = False
+            if stack:
+                out.append(_CLOSERS[stack.pop()])
+            end_value()
+            i += 1
+        elif char == ",":
+            if not need_comma and not pending_key:
+                i += 1  # a stray or doubled comma
+                continue
+            out.append(",")
+            need_comma = pending_key = False
+            expect_key = bool(stack) and stack[-1] == "{"
+            i += 1
+        elif char == ":":
+            out.append(":")
+            pending_key = need_comma = expect_key = False
+            i += 1
+        elif text.startswith("//", i):
+            i = text.find("\n", i) if "\n" in text[i:] else n
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+        elif expect_key and stack and stack[-1] == "{":
+            # unquoted key: everything up to the ':' (keys like Platz 1 may contain spaces)
+            end = i
+            while end < n and text[end] not in ":,{}[]\n":
+                end += 1
+            begin_token()
+            out.append(json.dumps(text[i:end].strip()))
+            expect_key, pending_key = False, True
+            i = end
+        else:
+            end = _BARE_VALUE_END.search(text, i)
+            end = n if end is None else end.start()
+            word = text[i:end]
+            if word in _LITERALS:
+                value = _LITERALS[word]
+            elif _NUMBER.fullmatch(word):
+                value = word
+            elif word in ("NaN", "Infinity", "-Infinity", "undefined"):
+                value = "null"
+            else:
+                value = json.dumps(word)
+            begin_token()
+            out.append(value)
+            end_value()
+            i = max(end, i + 1)
+
+    # close what a truncated response left open
+    _strip_trailing_comma(out)
+    if pending_key:
+        out.append(": null")
+    elif out and out[-1].rstrip().endswith(":"):
+        out.append(" null")
+    while stack:
+        _strip_trailing_comma(out)
+        out.append(_CLOSERS[stack.pop()])
+    return "".join(out)
+
+
+def _strip_trailing_comma(out: list[str]) -> None:
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+
+def parse_json(text: str) -> Any:
+    """json.loads, with `repair_json` as fallback. Raises json.JSONDecodeError if both fail."""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return json.loads(repair_json(text))
+
+
+def extract_json(text: str) -> dict | None:
+    """Returns the first JSON object in a model response, repairing it if necessary, or None."""
+    for candidate in iter_json_candidates(text):
+        try:
+            # valid JSON (the common case) never goes through the Python-level repair
+            value, _ = _decoder.raw_decode(candidate)
+        except json.JSONDecodeError:
+            try:
+                value = json.loads(repair_json(candidate))
+            except json.JSONDecodeError:
+                continue
+        if isinstance(value, dict):
+            return value
+    return None
@@ -0,0 +1,203 @@
+# A built-in replacement for the Vimium link hints.
+#
+# LABELER_JS is injected via `add_init_script` and draws small yellow boxes with
+# letters on top of every clickable UI element, just like Vimium does after
+# pressing "f". Unlike Vimium it works in headless browsers, needs no sleeps for
+# the overlay to appear, and returns a label -> selector/bbox map in the same
+# `evaluate` call. Clicks then go through Playwright locators, and label IDs can
+# be validated locally before acting.
+from dataclasses import dataclass, field
+
+from playwright.sync_api import BrowserContext, Page
+
+from src.tracing import traced
+
+ELEMENT_ID_ATTRIBUTE = "data-agent-id"
+
+LABELER_JS = """
+if (!window.__agentLabeler) {
+    window.__agentLabeler = (() => {
+        const ID_ATTRIBUTE = "%(id_attribute)s";
+        const OVERLAY_ID = "__agent-labeler-overlay";
+        const SELECTOR = [
+            "a[href]", "button", "input:not([type=hidden])", "select", "textarea", "summary",
+            "[role=button]", "[role=link]", "[role=checkbox]", "[role=tab]", "[role=menuitem]",
+            "[role=option]", "[onclick]", "[tabindex]:not([tabindex='-1'])",
+            "[contenteditable=true]",
+        ].join(",");
+        const IMPLICIT_ROLES = {
+            A: "link", BUTTON: "button", SELECT: "combobox", TEXTAREA: "textbox", SUMMARY: "button",
+        };
+        const INPUT_ROLES = {
+            button: "button", submit: "button", reset: "button", checkbox: "checkbox",
+            radio: "radio", range: "slider", search: "searchbox",
+        };
+        const clean = (s) => (s || "").replace(/\\s+/g, " ").trim();
+        const idFor = (i) => {
+            let id = "";
+            for (i += 1; i > 0; i = Math.floor((i - 1) / 26)) {
+                id = String.fromCharCode(97 + (i - 1) %% 26) + id;
+            }
+            return id;
+        };
+        const roleOf = (el) => {
+            if (el.getAttribute("role")) return el.getAttribute("role");
+            if (el.tagName === "INPUT") return INPUT_ROLES[el.type] || "textbox";
+            return IMPLICIT_ROLES[el.tagName] || "clickable";
+        };
+        const nameOf = (el) => {
+            const labelledBy = el.getAttribute("aria-labelledby");
+            const labelled = labelledBy && document.getElementById(labelledBy);
+            const label = el.labels && el.labels.length ? el.labels[0].innerText : "";
+            const img = el.querySelector("img[alt]");
+            return clean(
+                el.getAttribute("aria-label") || (labelled && labelled.innerText) || label ||
+                el.innerText || el.getAttribute("title") || el.getAttribute("placeholder") ||
+                el.getAttribute("alt") || (img && img.alt) || el.value || ""
+            ).slice(0, 80);
+        };
+        const isVisible = (el) => {
+            const rect = el.getBoundingClientRect();
+            if (rect.width === 0 || rect.height === 0) return false;
+            if (rect.bottom < 0 || rect.right < 0) return false;
+            if (rect.top > window.innerHeight || rect.left > window.innerWidth) return false;
+            const style = window.getComputedStyle(el);
+            return (
+                style.visibility !== "hidden" && style.display !== "none" && style.opacity !== "0"
+            );
+        };
+
+        const clear = () => {
+            const overlay = document.getElementById(OVERLAY_ID);
+            if (overlay) overlay.remove();
+        };
+
+        // tags every visible clickable element in the viewport with a letter ID
+        const collect = () => {
+            document
+                .querySelectorAll(`[${ID_ATTRIBUTE}]`)
+                .forEach((el) => el.removeAttribute(ID_ATTRIBUTE));
+            const elements = [];
+            for (const el of document.querySelectorAll(SELECTOR)) {
+                if (!isVisible(el)) continue;
+                // skip elements nested inside an already collected element,
+                // e.g. a <span> inside a link
+                if (el.parentElement && el.parentElement.closest(`[${ID_ATTRIBUTE}]`)) continue;
+                const id = idFor(elements.length);
+                const rect = el.getBoundingClientRect();
+                el.setAttribute(ID_ATTRIBUTE, id);
+                elements.push({
+                    id: id,
+                    selector: `[${ID_ATTRIBUTE}="${id}"]`,
+                    bbox: {x: rect.x, y: rect.y, width: rect.width, height: rect.height},
+                    role: roleOf(el),
+                    name: nameOf(el),
+                    href: el.getAttribute("href") || "",
+                    value: ["INPUT", "TEXTAREA", "SELECT"].includes(el.tagName)
+                        ? String(el.value || "")
+                        : "",
+                });
+            }
+            api.lastElements = elements;
+            return elements;
+        };
+
+        // draws yellow boxes with the letter IDs on top of the collected elements
+        const label = () => {
+            clear();
+            const elements = collect();
+            const overlay = document.createElement("div");
+            overlay.id = OVERLAY_ID;
+            overlay.style.cssText =
+                "position:fixed;left:0;top:0;width:0;height:0;" +
+                "z-index:2147483647;pointer-events:none;";
+            // the letters are rendered as generated content so they do not end up in innerText
+            const style = document.createElement("style");
+            style.textContent = `#${OVERLAY_ID} > div::after { content: attr(data-label); }`;
+            overlay.appendChild(style);
+            for (const element of elements) {
+                const hint = document.createElement("div");
+                hint.dataset.label = element.id.toUpperCase();
+                hint.style.cssText = [
+                    "position:fixed", `left:${Math.max(element.bbox.x, 0)}px`,
+                    `top:${Math.max(element.bbox.y, 0)}px`, "padding:0 2px",
+                    "background:linear-gradient(#fff785,#ffc542)", "border:1px solid #c38a22",
+                    "border-radius:3px", "color:#302505",
+                    "font:bold 11px Helvetica,Arial,sans-serif",
+                    "line-height:12px", "box-shadow:0 3px 7px rgba(0,0,0,0.3)",
+                ].join(";");
+                overlay.appendChild(hint);
+            }
+            (document.body || document.documentElement).appendChild(overlay);
+            return elements;
+        };
+
+        const api = {collect: collect, label: label, clear: clear, lastElements: null};
+        return api;
+    })();
+}
+""" % {
+    "id_attribute": ELEMENT_ID_ATTRIBUTE
+}
+
+
+@dataclass
+class Label:
+    id: str
+    selector: str
+    bbox: dict[str, float] = field(default_factory=dict)
+    role: str = ""
+    name: str = ""
+    href: str = ""
+    value: str = ""
+
+    def __str__(self):
+        description = f'* "{self.id}" {self.role} "{self.name}"'
+        if self.href and not self.href.startswith(("#", "javascript:")):
+            description += f" -> {self.href}"
+        if self.value:
+            description += f' (value: "{self.value}")'
+        return description
+
+
+def install_labeler(target: BrowserContext | Page) -> None:
+    """Injects the labeler into every page (and every navigation) of a browser context or page."""
+    target.add_init_script(LABELER_JS)
+
+
+def evaluate_with_labeler(page: Page, js_function: str, arg=None):
+    """Evaluates `js_function(arg)` with `window.__agentLabeler` available.
+
+    The labeler is normally present thanks to `install_labeler`; if it is not (e.g. the page
+    was opened before installing it), it is installed on the fly within the same round trip."""
+    return page.evaluate(f"(arg) => {{\n{LABELER_JS}\nreturn ({js_function})(arg);\n}}", arg)
+
+
+@traced("label_page")
+def label_page(page: Page) -> dict[str, Label]:
+    """Draws the letter hints onto the page and returns a map from letter ID to element."""
+    elements = evaluate_with_labeler(page, "() => window.__agentLabeler.label()")
+    return {element["id"]: Label(**element) for element in elements}
+
+
+def clear_labels(page: Page) -> None:
+    """Removes the letter hints from the page, e.g. before scrolling."""
+    evaluate_with_labeler(page, "() => window.__agentLabeler.clear()")
+
+
+def validate_label(label_id: str, labels: dict[str, Label]) -> Label:
+    """Looks up a letter ID chosen by the model, raising a ValueError if no such hint exists."""
+    label = labels.get(label_id.strip().lower())
+    if label is None:
+        raise ValueError(
+            f"There is no UI element with ID '{label_id}'. "
+            f"Available IDs: {', '.join(labels.keys())}"
+        )
+    return label
+
+
+def click_label(page: Page, label_id: str, labels: dict[str, Label]) -> Label:
+    """Clicks on the UI element with the given letter ID via a locator."""
+    label = validate_label(label_id, labels)
+    page.locator(label.selector).click()
+    return label
@@ -0,0 +1,136 @@
+# Shrinks the set of masks that get a number before the screenshot goes to the model.
+#
+# Segmenters return many redundant masks: the same button several times with
+# slightly different outlines, the text inside a button next to the button
+# itself, specks of a few pixels, whole page sections. Every extra number makes
+# the annotated image more cluttered and the model slower to pick a target.
+# `suppress_masks` removes them with vectorized box arithmetic: drop tiny and
+# section-sized boxes, greedy non-max suppression over the IoU matrix, then drop
+# boxes that lie inside another kept box. `place_labels` puts each number at a
+# fixed spot inside its box (a corner, or the centre for small boxes) and moves
+# it to the next candidate spot if it would overlap a number already placed.
+import numpy as np
+
+# approximate size of a number drawn by src/annotator.py (font size 12)
+LABEL_CHAR_WIDTH = 7
+LABEL_HEIGHT = 14
+LABEL_PADDING = 2
+
+
+def boxes_from_masks(masks: list[dict]) -> np.ndarray:
+    """[x, y, w, h] boxes of the masks as an (N, 4) array of [x1, y1, x2, y2]."""
+    if not masks:
+        return np.zeros((0, 4), dtype=float)
+    boxes = np.array([mask["bbox"] for mask in masks], dtype=float)
+    boxes[:, 2:] += boxes[:, :2]
+    return boxes
+
+
+def box_areas(boxes: np.ndarray) -> np.ndarray:
+    return (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+
+def intersection_areas(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """(len(a), len(b)) matrix of the intersection areas of two sets of boxes."""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    sides = np.clip(bottom_right - top_left, 0, None)
+    return sides[..., 0] * sides[..., 1]
+
+
+def pairwise_iou(boxes: np.ndarray) -> np.ndarray:
+    intersections = intersection_areas(boxes, boxes)
+    areas = box_areas(boxes)
+    unions = areas[:, None] + areas[None, :] - intersections
+    return np.divide(intersections, unions, out=np.zeros_like(intersections), where=unions > 0)
+
+
+def non_max_suppression(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """Indices of the boxes kept by greedy NMS, best score first."""
+    iou = pairwise_iou(boxes)
+    suppressed = np.zeros(len(boxes), dtype=bool)
+    keep = []
+    for i in np.argsort(-scores, kind="stable"):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        suppressed |= iou[i] > iou_threshold
+    return np.array(keep, dtype=int)
+
+
+def suppress_masks(
+    masks: list[dict],
+    image_shape: tuple[int, ...],
+    iou_threshold: float = 0.7,
+    containment_threshold: float = 0.9,
+    min_area: float = 130,
+    max_area_ratio: float = 0.05,
+) -> list[dict]:
+    """Removes tiny, section-sized, duplicate and nested masks.
+
+    A mask is a duplicate if its box overlaps a better mask with IoU above `iou_threshold` (better
+    means a higher "predicted_iou" for SAM masks, a larger area otherwise). A mask is nested if at
+    least `containment_threshold` of its box lies inside the box of a larger kept mask: clicking the
+    outer element clicks the inner one too. Returns the kept masks sorted by decreasing area."""
+    boxes = boxes_from_masks(masks)
+    areas = box_areas(boxes)
+    max_area = max_area_ratio * image_shape[0] * image_shape[1]
+    candidates = np.flatnonzero((areas >= min_area) & (areas <= max_area))
+    if len(candidates) == 0:
+        return []
+    boxes, areas = boxes[candidates], areas[candidates]
+
+    scores = np.array([masks[i].get("predicted_iou", 0.0) for i in candidates]) * max_area + areas
+    kept = non_max_suppression(boxes, scores, iou_threshold)
+    boxes, areas, candidates = boxes[kept], areas[kept], candidates[kept]
+
+    # contained[i, j]: share of box j that lies inside box i
+    contained = intersection_areas(boxes, boxes) / areas[None, :]
+    is_container = (areas[:, None] > areas[None, :]) & (contained >= containment_threshold)
+    nested = is_container.any(axis=0)
+    kept_masks = [masks[i] for i in candidates[~nested]]
+    return sorted(kept_masks, key=lambda mask: mask["area"], reverse=True)
+
+
+def _label_size(number: int) -> tuple[float, float]:
+    return LABEL_CHAR_WIDTH * len(str(number)) + 2 * LABEL_PADDING, LABEL_HEIGHT
+
+
+def place_labels(masks: list[dict]) -> dict[int, dict[str, int]]:
+    """Deterministic label anchors (centre of the number) for masks numbered by decreasing area from
+    1.
+
+    Each number goes into the top-left corner of its box; if that overlaps a number already placed,
+    the other corners and then the centre are tried. Boxes too small for a corner get the centre."""
+    sorted_masks = sorted(masks, key=(lambda x: x["area"]), reverse=True)
+    placed = np.zeros((0, 4))
+    positions = {}
+    for i, mask in enumerate(sorted_masks, 1):
+        x, y, w, h = mask["bbox"]
+        label_w, label_h = _label_size(i)
+        half_w, half_h = label_w / 2, label_h / 2
+        center = (x + w / 2, y + h / 2)
+        if w < 2 * label_w or h < 2 * label_h:
+            candidates = np.array([center])
+        else:
+            left, right = x + LABEL_PADDING + half_w, x + w - LABEL_PADDING - half_w
+            top, bottom = y + LABEL_PADDING + half_h, y + h - LABEL_PADDING - half_h
+            candidates = np.array(
+                [(left, top), (right, top), (left, bottom), (right, bottom), center]
+            )
+        candidate_boxes = np.column_stack(
+            [
+                candidates[:, 0] - half_w,
+                candidates[:, 1] - half_h,
+                candidates[:, 0] + half_w,
+                candidates[:, 1] + half_h,
+            ]
+        )
+        free = ~(intersection_areas(candidate_boxes, placed) > 0).any(axis=1)
+        choice = int(np.argmax(free)) if free.any() else 0
+        placed = np.vstack([placed, candidate_boxes[choice]])
+        positions[i] = {
+            "x": int(round(candidates[choice, 0])),
+            "y": int(round(candidates[choice, 1])),
+        }
+    return positions
@@ -0,0 +1,150 @@
+# Prompt templates that are compiled once and counted before they are sent.
+#
+# A PromptTemplate parses its text with str.format syntax a single time into
+# literal chunks and slots. Rendering only fills the slots and joins the
+# chunks; `partial` bakes the values that do not change between rounds (tool
+# listings, instructions) into a new template, so a round only substitutes
+# what actually changed. Templates from prompts.yaml are loaded through
+# `load_templates`, which compiles the file once per modification.
+#
+# `count_tokens` counts with tiktoken when the encoding is available (it is
+# downloaded on first use) and falls back to an estimate of 4 characters per
+# token otherwise. `check_prompt` raises PromptTooLong for a prompt above a
+# token budget before any request is made.
+import os
+import string
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+# budget for the text of one prompt, images excluded
+MAX_PROMPT_TOKENS = int(os.getenv("MAX_PROMPT_TOKENS", "16000"))
+CHARS_PER_TOKEN = 4  # rough average for English prose, used when tiktoken cannot be loaded
+
+_formatter = string.Formatter()
+
+
+class PromptTooLong(ValueError):
+    """A prompt exceeds its token budget."""
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    text: str
+    name: str = ""
+
+    def __post_init__(self):
+        chunks, slots = [], []
+        for literal, field, format_spec, conversion in _formatter.parse(self.text):
+            if format_spec or conversion:
+                raise ValueError(
+                    f"Template '{self.name}' uses a format spec or conversion in {{{field}}}, "
+                    "which is not supported"
+                )
+            if field is not None and not field.isidentifier():
+                raise ValueError(f"Template '{self.name}' has an invalid slot {{{field}}}")
+            chunks.append(literal)
+            slots.append(field)
+        object.__setattr__(self, "_chunks", tuple(chunks))
+        object.__setattr__(self, "_slots", tuple(slots))
+
+    @property
+    def fields(self) -> set[str]:
+        return {slot for slot in self._slots if slot is not None}
+
+    def render(self, **values) -> str:
+        missing = self.fields - values.keys()
+        if missing:
+            raise KeyError(f"Template '{self.name}' is missing values for {sorted(missing)}")
+        parts = []
+        for literal, slot in zip(self._chunks, self._slots):
+            parts.append(literal)
+            if slot is not None:
+                parts.append(str(values[slot]))
+        return "".join(parts)
+
+    def partial(self, **values) -> "PromptTemplate":
+        """A template with the slots in `values` filled in; the other slots stay open."""
+        parts = []
+        for literal, slot in zip(self._chunks, self._slots):
+            parts.append(_escape(literal))
+            if slot is not None:
+                parts.append(_escape(str(values[slot])) if slot in values else "{" + slot + "}")
+        return PromptTemplate("".join(parts), name=self.name)
+
+
+def _escape(text: str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def _flatten(data: dict, prefix: str = "") -> dict[str, str]:
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, prefix=f"{name}."))
+        elif isinstance(value, str):
+            flat[name] = value
+    return flat
+
+
+@lru_cache(maxsize=8)
+def _load_templates(path: str, mtime: float) -> dict[str, PromptTemplate]:
+    import yaml
+
+    with open(path, "r") as f:
+        data = yaml.safe_load(f) or {}
+    return {name: PromptTemplate(text, name=name) for name, text in _flatten(data).items()}
+
+
+def load_templates(path: str | Path = "prompts.yaml") -> dict[str, PromptTemplate]:
+    """The compiled templates of a YAML file by dotted name, e.g. "actor.system_prompt". Cached
+    until the file changes."""
+    path = Path(path)
+    return _load_templates(path.as_posix(), path.stat().st_mtime)
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:  # a model tiktoken does not know, e.g. Claude or Gemini
+            return tiktoken.get_encoding("o200k_base")
+    # not installed, or the encoding cannot be downloaded
+    except (ImportError, OSError, ValueError):
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def messages_text(messages: list[dict]) -> str:
+    """The text of a chat conversation: message contents, text parts and tool calls. Images are left
+    out, they are not part of the token budget."""
+    texts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            texts.append(content)
+        elif isinstance(content, list):
+            texts += [part["text"] for part in content if part.get("type") == "text"]
+        for tool_call in message.get("tool_calls") or []:
+            texts += [tool_call["function"]["name"], tool_call["function"]["arguments"]]
+    return "\n".join(texts)
+
+
+def check_prompt(text: str, max_tokens: int, model: str = "gpt-4o", name: str = "prompt") -> int:
+    """Counts the tokens of a prompt and raises PromptTooLong if it exceeds `max_tokens`."""
+    n_tokens = count_tokens(text, model=model)
+    if n_tokens > max_tokens:
+        raise PromptTooLong(
+            f"The {name} has {n_tokens} tokens, more than the budget of {max_tokens}"
+        )
+    return n_tokens
@@ -1,4 +1,7 @@
-from utils import Tool
+from functools import lru_cache
+
+from src.prompt_templates import PromptTemplate
+from src.utils import Tool
 
 answer_tool = Tool(
     name="ANSWER",
@@ -31,21 +34,18 @@ parse_table_data_tool = Tool(
     examples=['PARSE_TABLE_DATA("Extract the price information from the table that contains information about the product.")'],
 )
 
-def get_actor_prompt(
-    website_description: str,
-    task_description: str,
-    tools: list[Tool],
-) -> str: 
-    return f"""\
+ACTOR_PROMPT = PromptTemplate(
+    name="actor",
+    text="""\
 You are an assistant that helps a user to solve a task. The task provided by the user is the following:
 {task_description}
 
-You can choose from one of the following actions to progress with the task. \ 
+You can choose from one of the following actions to progress with the task. \\ 
 Here are the names and descriptions of the actions you can take:
 
-{"\n".join([str(tool) for tool in tools])}
+{tool_descriptions}
 
-As input, you are given an image of the current webpage, \
+As input, you are given {input_description}, \
 a description of the webpage, \
 a description of all clickable UI elements on the webpage, \
 potentially structured data in a text format, \
@@ -57,9 +57,36 @@ If you got any information that was parsed from structured data, make sure to us
 You need to respond in the following format:
 
 Thought: Your reasoning behind the action you are taking.
-Action: If another action is necessary, you can chose one of the following actions: {", ".join([tool.name for tool in tools])}. Only provide the action.
+Action: If another action is necessary, you can chose one of the following actions: {action_names}. Only provide the action.
 Answer: If you found the answer to the task, provide the answer in the following format: This is the answer to the task: <answer>. Else provide the reason why you could not find the answer.
-"""
+""",
+)
+
+
+@lru_cache(maxsize=None)
+def _actor_template(tools: tuple[Tool, ...], with_image: bool) -> PromptTemplate:
+    # the tool listing is the same every round; only the task and the webpage change
+    return ACTOR_PROMPT.partial(
+        tool_descriptions="\n".join([str(tool) for tool in tools]),
+        action_names=", ".join([tool.name for tool in tools]),
+        input_description=(
+            "an image of the current webpage"
+            if with_image
+            else "a text view of the current webpage"
+        ),
+    )
+
+
+def get_actor_prompt(
+    website_description: str,
+    task_description: str,
+    tools: list[Tool],
+    with_image: bool = True,
+) -> str: 
+    return _actor_template(tuple(tools), with_image).render(
+        task_description=task_description,
+        website_description=website_description,
+    )
 
 def get_observer_prompt() -> str:
     return f"""I give you a screenshot of a part of a webpage. \
@@ -0,0 +1,217 @@
+# Keeps the browser lean: fonts, trackers, large media and animations do not
+# change what the agent decides, but they slow down `page.goto` and the time
+# until the page has settled before a screenshot.
+#
+# A ResourcePolicy is applied to a browser context (or a single page) via
+# `page.route`. It blocks requests by resource type and by domain, emulates
+# `prefers-reduced-motion` and disables CSS animations/transitions. The returned
+# ResourceStats reports per page what was loaded, what was blocked and roughly
+# how many bytes and how much time that saved.
+from collections import defaultdict
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+
+from playwright.sync_api import BrowserContext, Page, Request, Route
+
+# Rough median transfer sizes per resource type (HTTP Archive, desktop). Blocked requests are never
+# downloaded, so the bytes they would have cost can only be estimated.
+ESTIMATED_BYTES_PER_TYPE = {
+    "image": 40_000,
+    "font": 30_000,
+    "media": 500_000,
+    "stylesheet": 20_000,
+    "script": 25_000,
+    "xhr": 5_000,
+    "fetch": 5_000,
+}
+DEFAULT_ESTIMATED_BYTES = 10_000
+
+DISABLE_ANIMATIONS_JS = """
+document.addEventListener("DOMContentLoaded", () => {
+    const style = document.createElement("style");
+    style.textContent = `*, *::before, *::after {
+        animation-duration: 0s !important;
+        animation-delay: 0s !important;
+        transition-duration: 0s !important;
+        transition-delay: 0s !important;
+        scroll-behavior: auto !important;
+    }`;
+    document.head.appendChild(style);
+});
+"""
+
+
+@dataclass
+class ResourcePolicy:
+    blocked_resource_types: set[str] = field(default_factory=set)
+    allowed_domains: list[str] | None = None  # if given, requests to all other domains are blocked
+    denied_domains: list[str] = field(default_factory=list)
+    # images from these domains are loaded even if images are blocked: the site's own icons, logos
+    # and image buttons are part of what the agent sees; photos and banners from CDNs and ad
+    # networks are not
+    image_domains: list[str] = field(default_factory=list)
+    reduce_motion: bool = True
+    disable_animations: bool = True
+
+    def get_block_reason(self, url: str, resource_type: str) -> str | None:
+        """Returns why a request should be blocked, or None if it may be loaded."""
+        hostname = urlparse(url).hostname
+        if hostname is None:  # data:, blob:, about:blank, ...
+            return None
+        if any(_matches_domain(hostname, domain) for domain in self.denied_domains):
+            return "denied domain"
+        if self.allowed_domains is not None and not any(
+            _matches_domain(hostname, domain) for domain in self.allowed_domains
+        ):
+            return "domain not allowed"
+        if resource_type == "image" and any(
+            _matches_domain(hostname, domain) for domain in self.image_domains
+        ):
+            return None
+        if resource_type in self.blocked_resource_types:
+            return f"type {resource_type}"
+        return None
+
+
+def _matches_domain(hostname: str, domain: str) -> bool:
+    return hostname == domain or hostname.endswith("." + domain)
+
+
+@dataclass
+class PageResourceStats:
+    requests: int = 0
+    blocked: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    bytes_loaded: int = 0
+    estimated_bytes_saved: int = 0
+
+    @property
+    def n_blocked(self) -> int:
+        return sum(self.blocked.values())
+
+
+@dataclass
+class ResourceStats:
+    pages: dict[Page | None, PageResourceStats] = field(
+        default_factory=lambda: defaultdict(PageResourceStats)
+    )
+
+    def for_request(self, request: Request) -> PageResourceStats:
+        try:
+            page = request.frame.page
+        except Exception:  # e.g. requests of service workers that belong to no page
+            page = None
+        return self.pages[page]
+
+    def report(self, page: Page) -> dict:
+        """Bytes loaded/saved and load times of the current page.
+
+        The time saved is an estimate: the saved bytes at the throughput the page was loaded with.
+        """
+        stats = self.pages.get(page, PageResourceStats())
+        timing = page.evaluate(
+            """() => {
+                const [navigation] = performance.getEntriesByType("navigation");
+                return navigation
+                    ? {
+                        domContentLoaded: navigation.domContentLoadedEventEnd,
+                        load: navigation.loadEventEnd,
+                    }
+                    : {domContentLoaded: 0, load: 0};
+            }"""
+        )
+        bytes_per_ms = stats.bytes_loaded / timing["load"] if timing["load"] else 0
+        return {
+            "url": page.url,
+            "requests": stats.requests,
+            "blocked": dict(stats.blocked),
+            "bytes_loaded": stats.bytes_loaded,
+            "estimated_bytes_saved": stats.estimated_bytes_saved,
+            "dom_content_loaded_ms": round(timing["domContentLoaded"]),
+            "load_ms": round(timing["load"]),
+            "estimated_ms_saved": (
+                round(stats.estimated_bytes_saved / bytes_per_ms) if bytes_per_ms else None
+            ),
+        }
+
+    def summary(self) -> str:
+        return "\n".join(
+            f"{page.url if page else '<no page>'}: "
+            f"{stats.requests} requests, {stats.n_blocked} blocked, "
+            f"{stats.bytes_loaded / 1000:.0f} kB loaded, "
+            f"~{stats.estimated_bytes_saved / 1000:.0f} kB saved"
+            for page, stats in self.pages.items()
+        )
+
+
+def apply_resource_policy(target: BrowserContext | Page, policy: ResourcePolicy) -> ResourceStats:
+    """Routes all requests of a browser context or page through `policy`."""
+    stats = ResourceStats()
+
+    def handle_route(route: Route) -> None:
+        request = route.request
+        page_stats = stats.for_request(request)
+        page_stats.requests += 1
+        reason = policy.get_block_reason(request.url, request.resource_type)
+        if reason is None:
+            route.continue_()
+            return
+        page_stats.blocked[reason] += 1
+        page_stats.estimated_bytes_saved += ESTIMATED_BYTES_PER_TYPE.get(
+            request.resource_type, DEFAULT_ESTIMATED_BYTES
+        )
+        route.abort("blockedbyclient")
+
+    unsized: set[Request] = set()  # responses without a content-length header (chunked, compressed)
+
+    def handle_response(response) -> None:
+        content_length = response.headers.get("content-length")
+        if content_length and content_length.isdigit():
+            stats.for_request(response.request).bytes_loaded += int(content_length)
+        else:
+            unsized.add(response.request)
+
+    def handle_request_finished(request: Request) -> None:
+        # the transferred body size is only known once the response has been read completely
+        if request not in unsized:
+            return
+        unsized.discard(request)
+        try:
+            stats.for_request(request).bytes_loaded += request.sizes()["responseBodySize"]
+        except Exception:  # e.g. the page was closed in the meantime
+            pass
+
+    target.route("**/*", handle_route)
+    target.on("response", handle_response)
+    target.on("requestfinished", handle_request_finished)
+    target.on("requestfailed", unsized.discard)
+
+    if policy.disable_animations:
+        target.add_init_script(DISABLE_ANIMATIONS_JS)
+    if policy.reduce_motion:
+        pages = target.pages if isinstance(target, BrowserContext) else [target]
+        for page in pages:
+            page.emulate_media(reduced_motion="reduce")
+        if isinstance(target, BrowserContext):
+            target.on("page", lambda page: page.emulate_media(reduced_motion="reduce"))
+    return stats
+
+
+# Profile for the ebusy booking system (safo.ebusy.de). The agent reads the booking grid from the
+# DOM and draws its own hints, so it needs the markup, styles and scripts, but no fonts, media,
+# third-party images or trackers. Cell colours come from CSS; the site's own icons, logos and
+# image buttons are still loaded, since the vision actor and the segmenters see them.
+EBUSY_PROFILE = ResourcePolicy(
+    blocked_resource_types={"image", "font", "media"},
+    image_domains=["ebusy.de"],
+    denied_domains=[
+        "google-analytics.com",
+        "googletagmanager.com",
+        "doubleclick.net",
+        "facebook.net",
+        "facebook.com",
+        "hotjar.com",
+        "matomo.cloud",
+        "youtube.com",
+        "ytimg.com",
+    ],
+)
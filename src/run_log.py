@@ -0,0 +1,211 @@
+# Structured, non-blocking run logging.
+#
+# Every model call of a run becomes one JSON line: step, stage (the agent
+# that made the call), model, a hash of the prompt, the response, timings and
+# references to the screenshots it saw. The full text of a prompt is written
+# only the first time its hash shows up in a run; inline image data
+# (base64 data URLs) is never written, only its size.
+#
+# The agent thread only puts records on a queue (QueueHandler); a
+# QueueListener thread formats them and writes them to a rotating JSONL file,
+# gzip-compressing the rotated files. So a slow disk never stalls the browser
+# loop. `setup_run_logger` is idempotent: calling it again returns the same
+# logger instead of attaching another handler.
+import atexit
+import contextvars
+import gzip
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import shutil
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+RUN_LOGGER_NAME = "run"
+MAX_LOG_BYTES = 20 * 1024 * 1024
+LOG_BACKUP_COUNT = 10
+
+_DATA_URL = re.compile(r"data:image/[\w.+-]+;base64,[A-Za-z0-9+/=]+")
+_step: contextvars.ContextVar[tuple[int, float] | None] = contextvars.ContextVar(
+    "run_step", default=None
+)
+_listeners: dict[str, logging.handlers.QueueListener] = {}
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+def strip_inline_images(text: str) -> str:
+    """Replaces base64 image data URLs with a short placeholder."""
+    return _DATA_URL.sub(lambda match: f"<inline image, {len(match.group())} bytes>", text)
+
+
+class StepFilter(logging.Filter):
+    """Stamps each record with the current step and the seconds since it started.
+
+    Runs in the thread that logs."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        step = _step.get()
+        if step is not None and not hasattr(record, "step"):
+            record.step = step[0]
+            record.elapsed_s = round(time.perf_counter() - step[1], 3)
+        return True
+
+
+class PromptOnceFilter(logging.Filter):
+    """Drops the prompt text of records whose prompt hash was written before. Runs in the listener
+    thread (once per record; the formatter may run twice, the rotating handler formats to measure
+    the size).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._seen: set[str] = set()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        digest = getattr(record, "prompt_hash", None)
+        if digest is not None:
+            if digest in self._seen:
+                record.prompt = None
+            self._seen.add(digest)
+        return True
+
+
+class JsonLinesFormatter(logging.Formatter):
+    FIELDS = (
+        "step",
+        "elapsed_s",
+        "stage",
+        "model",
+        "prompt_hash",
+        "prompt",
+        "response",
+        "duration_s",
+        "images",
+    )
+
+    def __init__(self, run_id: str):
+        super().__init__()
+        self.run_id = run_id
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "run_id": self.run_id,
+            "level": record.levelname,
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        message = record.getMessage()
+        if message:
+            entry["message"] = message
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return strip_inline_images(json.dumps(entry, ensure_ascii=False, default=str))
+
+
+class GzipRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """A RotatingFileHandler that gzip-compresses the files it rotates out."""
+
+    def __init__(self, filename: str | Path, max_bytes: int, backup_count: int):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        self.namer = lambda name: f"{name}.gz"
+        self.rotator = self._compress
+
+    @staticmethod
+    def _compress(source: str, dest: str) -> None:
+        with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(source)
+
+
+def setup_run_logger(
+    log_dir: str | Path = "logs",
+    name: str = RUN_LOGGER_NAME,
+    max_bytes: int = MAX_LOG_BYTES,
+    backup_count: int = LOG_BACKUP_COUNT,
+) -> logging.Logger:
+    """The queue-backed JSONL logger `name`, writing to `log_dir`. Set up on the first call only."""
+    logger = logging.getLogger(name)
+    if name in _listeners:
+        return logger
+
+    log_dir = Path(log_dir)
+    log_dir.mkdir(parents=True, exist_ok=True)
+    run_id = uuid.uuid4().hex[:12]
+    file_handler = GzipRotatingFileHandler(
+        log_dir / datetime.now().strftime("run_%Y%m%d_%H%M%S.jsonl"),
+        max_bytes=max_bytes,
+        backup_count=backup_count,
+    )
+    file_handler.setFormatter(JsonLinesFormatter(run_id))
+    file_handler.addFilter(PromptOnceFilter())
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(records)
+    queue_handler.addFilter(StepFilter())
+    logger.addHandler(queue_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    listener = logging.handlers.QueueListener(records, file_handler, respect_handler_level=True)
+    listener.start()
+    _listeners[name] = listener
+    atexit.register(stop_run_logger, name)
+    return logger
+
+
+def stop_run_logger(name: str = RUN_LOGGER_NAME) -> None:
+    """Writes the queued records and closes the log file."""
+    listener = _listeners.pop(name, None)
+    if listener is None:
+        return
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+    logger = logging.getLogger(name)
+    for handler in list(logger.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            logger.removeHandler(handler)
+
+
+def start_step(logger: logging.Logger, step: int) -> None:
+    """Marks the start of a step of the agent loop; the following records carry its number."""
+    _step.set((step, time.perf_counter()))
+    logger.info(f"step {step} started")
+
+
+def log_call(
+    logger: logging.Logger,
+    stage: str,
+    prompt: str,
+    response: str,
+    model: str | None = None,
+    duration_s: float | None = None,
+    images: list[str | Path] | None = None,
+) -> None:
+    """Logs one model call (or a step that stands in for one) as a structured record."""
+    logger.info(
+        "",
+        extra={
+            "stage": stage,
+            "model": model,
+            "prompt_hash": prompt_hash(prompt),
+            "prompt": prompt,
+            "response": response,
+            "duration_s": None if duration_s is None else round(duration_s, 3),
+            "images": [Path(image).as_posix() for image in images] if images else None,
+        },
+    )
@@ -0,0 +1,118 @@
+# Keeps the Segment Anything (SAM) model resident.
+#
+# Building SAM from its multi-gigabyte vit_h checkpoint takes several seconds,
+# far longer than the segmentation itself. The SamModelManager loads the model
+# lazily on first use, exactly once per process (also when several agent
+# sessions ask for it at the same time), keeps it in memory in eval mode and
+# hands out mask generators that share it. `warm_up` loads the model and runs
+# one dummy segmentation ahead of the first click; `memory_stats` shows what
+# the resident model costs.
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+
+SAM_MODEL_TYPE = "vit_h"
+SAM_CHECKPOINT_PATH = Path("ressources/sam_vit_h_4b8939.pth")
+
+
+def _load_sam(model_type: str, checkpoint: Path, device: str | None) -> Any:
+    import torch
+    from segment_anything import sam_model_registry
+
+    device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+    sam = sam_model_registry[model_type](checkpoint=str(checkpoint))
+    sam.to(device=device)
+    sam.eval()
+    sam.requires_grad_(False)
+    return sam
+
+
+class SamModelManager:
+    def __init__(
+        self,
+        model_type: str = SAM_MODEL_TYPE,
+        checkpoint: Path = SAM_CHECKPOINT_PATH,
+        device: str | None = None,
+        loader: Callable[[str, Path, str | None], Any] = _load_sam,
+    ):
+        self.model_type = model_type
+        self.checkpoint = checkpoint
+        self.device = device
+        self.loader = loader
+        self.load_seconds: float | None = None
+        self._model = None
+        self._mask_generators: dict[tuple, Any] = {}
+        self._load_lock = threading.Lock()
+        # SamPredictor keeps the embedding of the last image, so one generation at a time
+        self._generate_lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    def get_model(self) -> Any:
+        """Returns the resident model and loads it on first use."""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    self._model = self.loader(self.model_type, self.checkpoint, self.device)
+                    self.load_seconds = time.perf_counter() - start
+        return self._model
+
+    def get_mask_generator(self, **params) -> Any:
+        """A SamAutomaticMaskGenerator for `params`; generators with the same params are reused."""
+        key = tuple(sorted(params.items()))
+        if key not in self._mask_generators:
+            from segment_anything import SamAutomaticMaskGenerator
+
+            self._mask_generators[key] = SamAutomaticMaskGenerator(self.get_model(), **params)
+        return self._mask_generators[key]
+
+    def generate_masks(self, image: np.ndarray, **params) -> list[dict]:
+        """Segments an RGB image with the resident model."""
+        mask_generator = self.get_mask_generator(**params)
+        with self._generate_lock:
+            import torch
+
+            with torch.inference_mode():
+                return mask_generator.generate(image)
+
+    def warm_up(self, **params) -> float:
+        """Loads the model and segments a blank image once. Returns the seconds it took."""
+        start = time.perf_counter()
+        self.generate_masks(np.zeros((64, 64, 3), dtype=np.uint8), **params)
+        return time.perf_counter() - start
+
+    def memory_stats(self) -> dict:
+        stats = {
+            "model_type": self.model_type,
+            "loaded": self.is_loaded,
+            "load_seconds": self.load_seconds,
+            "mask_generators": len(self._mask_generators),
+        }
+        if self._model is None:
+            return stats
+        parameters = list(self._model.parameters())
+        stats["parameters"] = sum(p.numel() for p in parameters)
+        stats["parameter_bytes"] = sum(p.numel() * p.element_size() for p in parameters)
+        stats["device"] = str(parameters[0].device) if parameters else None
+        if stats["device"] and stats["device"].startswith("cuda"):
+            import torch
+
+            stats["cuda_allocated_bytes"] = torch.cuda.memory_allocated()
+            stats["cuda_reserved_bytes"] = torch.cuda.memory_reserved()
+        return stats
+
+    def unload(self) -> None:
+        with self._load_lock:
+            self._model = None
+            self._mask_generators.clear()
+            self.load_seconds = None
+
+
+# shared by all sessions of this process
+SAM_MODEL = SamModelManager()
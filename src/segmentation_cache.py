@@ -0,0 +1,195 @@
+# Caches segmentations by screenshot content.
+#
+# SamAutomaticMaskGenerator.generate takes tens of seconds on CPU, and retries
+# or coming back to the same page would otherwise segment the same screenshot
+# again. The SegmentationCache keeps the masks and the computed label positions
+# of a screenshot keyed by the SHA-256 of its pixels, in an in-memory LRU that
+# is bounded by bytes and backed by a directory on disk. Screenshots that are
+# not byte-identical but look the same (a blinking cursor, a hover effect) are
+# matched by a difference hash (dHash): if the Hamming distance to a cached
+# screenshot is at most `max_hash_distance`, its segmentation is reused.
+import hashlib
+import pickle
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+SEGMENTATION_CACHE_DIR = Path("~/.cache/ai-webbrowser-agent/segmentations").expanduser()
+
+# fixed overhead per mask dict besides its arrays (bbox, area, scores, ...)
+_MASK_OVERHEAD_BYTES = 256
+
+
+def image_digest(image: np.ndarray, variant: str = "") -> str:
+    """Hashes the pixels and the shape, so equal screenshots get the same key no matter where they
+    are stored.
+
+    `variant` separates results of the same screenshot that were computed differently (e.g. by
+    another segmenter).
+    """
+    digest = hashlib.sha256(f"{variant}{image.shape}".encode())
+    digest.update(np.ascontiguousarray(image).data)
+    return digest.hexdigest()
+
+
+def difference_hash(image: np.ndarray, hash_size: int = 8) -> int:
+    """64-bit dHash: compares neighbouring pixels of a downscaled grayscale version of the image."""
+    pixels = np.asarray(
+        Image.fromarray(image)
+        .convert("L")
+        .resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS),
+        dtype=np.int16,
+    )
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+@dataclass
+class CachedSegmentation:
+    masks: list[dict]
+    positions: dict[int, dict[str, int]]
+    image_hash: int
+    shape: tuple[int, ...]
+    variant: str = ""
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            _MASK_OVERHEAD_BYTES
+            + sum(value.nbytes for value in mask.values() if isinstance(value, np.ndarray))
+            for mask in self.masks
+        )
+
+
+class SegmentationCache:
+    def __init__(
+        self,
+        max_bytes: int = 512 * 1024**2,
+        cache_dir: Path | None = SEGMENTATION_CACHE_DIR,
+        max_hash_distance: int = 4,
+    ):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.max_hash_distance = max_hash_distance
+        self.hits = self.near_hits = self.disk_hits = self.misses = 0
+        self._entries: OrderedDict[str, CachedSegmentation] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, image: np.ndarray, variant: str = "") -> CachedSegmentation | None:
+        """Returns the segmentation of `image` or of a near-identical screenshot, or None."""
+        key = image_digest(image, variant)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        entry = self._load(key)
+        if entry is not None:
+            self.disk_hits += 1
+            self._insert(key, entry)
+            return entry
+
+        entry = self._find_near_duplicate(image, variant)
+        if entry is not None:
+            self.near_hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def put(
+        self,
+        image: np.ndarray,
+        masks: list[dict],
+        positions: dict[int, dict[str, int]],
+        variant: str = "",
+    ) -> CachedSegmentation:
+        key = image_digest(image, variant)
+        entry = CachedSegmentation(
+            masks=masks,
+            positions=positions,
+            image_hash=difference_hash(image),
+            shape=image.shape,
+            variant=variant,
+        )
+        self._insert(key, entry)
+        self._store(key, entry)
+        return entry
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
+
+    def _insert(self, key: str, entry: CachedSegmentation) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key).nbytes
+            self._entries[key] = entry
+            self._bytes += entry.nbytes
+            # evict least recently used entries; they stay available in the disk tier
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def _find_near_duplicate(self, image: np.ndarray, variant: str) -> CachedSegmentation | None:
+        if self.max_hash_distance <= 0:
+            return None
+        image_hash = difference_hash(image)
+        with self._lock:
+            candidates = [
+                (hamming_distance(image_hash, entry.image_hash), key)
+                for key, entry in self._entries.items()
+                if entry.shape == image.shape and entry.variant == variant
+            ]
+            if not candidates:
+                return None
+            distance, key = min(candidates)
+            if distance > self.max_hash_distance:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pkl"
+
+    def _load(self, key: str) -> CachedSegmentation | None:
+        if self.cache_dir is None or not self._path(key).exists():
+            return None
+        try:
+            return pickle.loads(self._path(key).read_bytes())
+        except (pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+
+    def _store(self, key: str, entry: CachedSegmentation) -> None:
+        if self.cache_dir is None:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # write to a temporary file first, so a crash never leaves a truncated entry behind
+        tmp_path = self._path(key).with_suffix(".tmp")
+        tmp_path.write_bytes(pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL))
+        tmp_path.replace(self._path(key))
+
+
+SEGMENTATION_CACHE = SegmentationCache()
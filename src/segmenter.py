@@ -0,0 +1,132 @@
+# Segmenter backends for clicking on UI elements without a label.
+#
+# A segmenter turns an RGB screenshot into candidate UI elements in the mask
+# format of SamAutomaticMaskGenerator (a dict with at least "bbox" as
+# [x, y, w, h] and "area"), which is what the number placement and the
+# annotator consume.
+#
+# - "opencv": buttons, table cells and inputs on web pages are mostly
+#   axis-aligned rectangles, so edges/contours, words (glyph edges smeared
+#   together) and connected regions of saturated colour find them on CPU in
+#   milliseconds.
+# - "sam": Segment Anything (src/sam_model.py). Finds more, also irregular
+#   elements, but needs seconds to minutes on CPU and a large checkpoint.
+#
+# The backend is picked with the SEGMENTER_BACKEND environment variable. Like
+# torch for SAM, OpenCV is only imported once a screenshot is segmented.
+import os
+from dataclasses import dataclass, field
+from typing import Protocol
+
+import numpy as np
+
+from src.sam_model import SAM_MODEL, SamModelManager
+
+SEGMENTER_BACKEND = os.getenv("SEGMENTER_BACKEND", "opencv")
+
+SAM_MASK_GENERATOR_PARAMS = dict(
+    # Higher: more detail but slower; Lower: faster but may miss small objects
+    points_per_side=15,
+    # Higher: better quality masks but fewer; Lower: more masks but lower quality
+    pred_iou_thresh=0.8,
+    # Higher: more stable masks but fewer; Lower: more masks but less stable
+    stability_score_thresh=0.5,
+    # More layers help with large images; 0 for no cropping
+    crop_n_layers=0,
+    # Higher: faster for crops but less detail; Lower: more detailed crops
+    crop_n_points_downscale_factor=10,
+    # Higher: removes small segments; Lower: keeps small details but may add noise
+    min_mask_region_area=130,
+)
+
+
+class Segmenter(Protocol):
+    name: str
+
+    def segment(self, image: np.ndarray) -> list[dict]:
+        """Finds candidate UI elements in an RGB screenshot."""
+        ...
+
+
+@dataclass
+class OpenCVSegmenter:
+    name: str = "opencv"
+    min_area: int = 130
+    # boxes larger than this share of the screenshot are page sections, not elements
+    max_area_ratio: float = 0.5
+    min_side: int = 6
+    canny_thresholds: tuple[int, int] = (30, 100)
+    min_saturation: int = 60
+    # (height, width) of the dilation that joins glyphs into words
+    word_kernel: tuple[int, int] = (5, 15)
+
+    def _edge_boxes(self, gray: np.ndarray) -> list[tuple[int, int, int, int]]:
+        import cv2
+
+        edges = cv2.Canny(gray, *self.canny_thresholds)
+        # close small gaps in the outlines, e.g. of rounded corners
+        edges = cv2.dilate(edges, np.ones((3, 3), np.uint8))
+        contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+        return [cv2.boundingRect(contour) for contour in contours]
+
+    def _word_boxes(self, gray: np.ndarray) -> list[tuple[int, int, int, int]]:
+        import cv2
+
+        # smear the edges of neighbouring glyphs into one blob, so that a text gets one box
+        edges = cv2.Canny(gray, *self.canny_thresholds)
+        words = cv2.dilate(edges, np.ones(self.word_kernel, np.uint8))
+        contours, _ = cv2.findContours(words, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        return [cv2.boundingRect(contour) for contour in contours]
+
+    def _colour_boxes(self, image: np.ndarray) -> list[tuple[int, int, int, int]]:
+        import cv2
+
+        saturation = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)[..., 1]
+        coloured = (saturation >= self.min_saturation).astype(np.uint8)
+        # merge the background of a coloured button with the (white) text on it
+        coloured = cv2.morphologyEx(coloured, cv2.MORPH_CLOSE, np.ones((7, 7), np.uint8))
+        n, _, stats, _ = cv2.connectedComponentsWithStats(coloured, connectivity=4)
+        return [tuple(int(v) for v in stats[i, :4]) for i in range(1, n)]
+
+    def segment(self, image: np.ndarray) -> list[dict]:
+        import cv2
+
+        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        max_area = self.max_area_ratio * image.shape[0] * image.shape[1]
+        boxes = (
+            set(self._edge_boxes(gray))
+            | set(self._word_boxes(gray))
+            | set(self._colour_boxes(image))
+        )
+        return [
+            {"bbox": [x, y, w, h], "area": w * h}
+            for x, y, w, h in sorted(boxes)
+            if w >= self.min_side and h >= self.min_side and self.min_area <= w * h <= max_area
+        ]
+
+
+@dataclass
+class SamSegmenter:
+    name: str = "sam"
+    manager: SamModelManager = SAM_MODEL
+    params: dict = field(default_factory=lambda: dict(SAM_MASK_GENERATOR_PARAMS))
+
+    def segment(self, image: np.ndarray) -> list[dict]:
+        return self.manager.generate_masks(image, **self.params)
+
+    def warm_up(self) -> float:
+        return self.manager.warm_up(**self.params)
+
+
+SEGMENTERS: dict[str, Segmenter] = {
+    "opencv": OpenCVSegmenter(),
+    "sam": SamSegmenter(),
+}
+
+
+def get_segmenter(name: str = SEGMENTER_BACKEND) -> Segmenter:
+    if name not in SEGMENTERS:
+        raise ValueError(
+            f"Unknown segmenter backend '{name}'. Available backends: {', '.join(SEGMENTERS)}"
+        )
+    return SEGMENTERS[name]
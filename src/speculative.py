@@ -0,0 +1,75 @@
+# Segments screenshots in the background while the model is still thinking.
+#
+# Segmentation is only needed if the model chooses a click without a label,
+# but waiting for that decision puts the segmenter in series with the model
+# call. SpeculativeSegmentation starts segmenting every new screenshot on a
+# background thread as soon as it is captured. A coordinate click then picks up
+# the result (or waits for the rest of it). When the page moves on before
+# anyone asked for it, a job that has not started yet is cancelled; a running
+# one finishes into the segmentation cache, so nothing is computed twice.
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Callable
+
+import numpy as np
+
+# image, masks, label positions
+Segmentation = tuple[np.ndarray, list[dict], dict[int, dict[str, int]]]
+
+
+class SpeculativeSegmentation:
+    def __init__(
+        self,
+        load_image: Callable[[str], np.ndarray],
+        segment: Callable[[np.ndarray], tuple[list[dict], dict[int, dict[str, int]]]],
+        max_workers: int = 1,
+    ):
+        self.load_image = load_image
+        self.segment = segment
+        self.hits = self.misses = self.cancelled = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="speculative-segmenter"
+        )
+        self._futures: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _run(self, image_path: str) -> Segmentation:
+        image = self.load_image(image_path)
+        masks, positions = self.segment(image)
+        return image, masks, positions
+
+    def submit(self, image_path: str) -> Future:
+        """Starts segmenting a new screenshot and cancels unstarted jobs of older screenshots."""
+        with self._lock:
+            for path, future in list(self._futures.items()):
+                if path == image_path:
+                    continue
+                if future.cancel():
+                    self.cancelled += 1
+                    del self._futures[path]
+                elif future.done():  # its result is in the segmentation cache
+                    del self._futures[path]
+            if image_path not in self._futures:
+                self._futures[image_path] = self._executor.submit(self._run, image_path)
+            return self._futures[image_path]
+
+    def result(self, image_path: str, timeout: float | None = None) -> Segmentation:
+        """The segmentation of `image_path`: the speculative one if submitted, else computed now."""
+        with self._lock:
+            future = self._futures.get(image_path)
+        if future is not None:
+            try:
+                segmentation = future.result(timeout=timeout)
+                self.hits += 1
+                return segmentation
+            except CancelledError:
+                pass
+        self.misses += 1
+        return self._run(image_path)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -9,14 +9,27 @@ from dotenv import load_dotenv
 
 ## models
 from openai import OpenAI
-import vertexai
-from vertexai.generative_models import GenerativeModel, Part
-import google.generativeai as genai
 
 
-from prompts import get_gemini_observer_prompt, get_observer_prompt, get_actor_prompt, answer_tool, click_tool, input_tool, scroll_tool, parse_table_data_tool
-from utils import * 
-import history
+from src.prompts import (
+    get_gemini_observer_prompt,
+    get_observer_prompt,
+    get_actor_prompt,
+    answer_tool,
+    click_tool,
+    input_tool,
+    scroll_tool,
+    parse_table_data_tool,
+)
+from src.utils import * 
+from src.booking_grid import extract_booking_grid_from_dom
+from src.browser import launch_browser
+from src.labeler import clear_labels, click_label, label_page
+from src.resource_policy import EBUSY_PROFILE, apply_resource_policy
+from src.run_log import start_step
+from src.text_observer import get_text_observation
+from src.tracing import enable_tracing, span
+from src import history
 
 logger = setup_logger()
 DEBUG_OBSERVER = False 
@@ -24,19 +37,14 @@ DEBUG_ACTOR = False
 
 # general setup
 SCREENSHOT_DIR = "screenshots"
-PLAYWRIGHT_USER_DATA_DIRECTORY = os.path.expanduser("~/playwright_user_data")
-VIMIUM_PATH = "vimium" # vimium must be downloaded via google-extension-downloader and unzipped into this project's directory
 
 # OpenAI
 load_dotenv()
+enable_tracing()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 client = OpenAI(api_key=OPENAI_API_KEY)
 
-# Google Gemini
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-PROJECT_ID = os.getenv("PROJECT_ID")
-genai.configure(api_key=GOOGLE_API_KEY)
-vertexai.init(project=PROJECT_ID, location="europe-central2")
+# Google Gemini: configured on first use, see utils.get_gemini_client
 
 # user task
 task_description = """Find and name outside tennis courts that are free for 1 hour today between 17:00 and 19:00. The process is described as follows:
@@ -47,6 +55,8 @@ The video demonstrates the online booking process for a tennis court at the Spor
 3. **Select a time slot:** The user scrolls down to view the available time slots and clicks on the desired time slot, which is 18:00-18:30 on Court P1. 
 """
 default_observer = "gpt"
+# "text": DOM-based text view, screenshots only if needed; "vision": always describe screenshots
+OBSERVER_BACKEND = "text"
 
 # tools for the actor
 actor_tools = [
@@ -59,40 +69,51 @@ actor_tools = [
 
 ## MAIN APP LOOP
 with sync_playwright() as p:
-    browser = p.chromium.launch_persistent_context(
-        user_data_dir=PLAYWRIGHT_USER_DATA_DIRECTORY,
-        headless=False,
-        args=[
-            f"--disable-extensions-except={VIMIUM_PATH}",
-            f"--load-extension={VIMIUM_PATH}"
-        ],
-        viewport={"width": 700, "height": 800},
-        screen={"width": 700, "height": 800},
-    )
+    browser = launch_browser(p, width=700, height=800)
+    resource_stats = apply_resource_policy(browser, EBUSY_PROFILE)
 
     # navigate to booking site 
     page = browser.new_page()
     page.goto("https://safo.ebusy.de")
     time.sleep(1)
     
-    logger.info("########## ROUND 1 ##########")
+    start_step(logger, 1)
     print("########## ROUND 1 ##########")
 
     last_observer = "gpt"
+    action_error = None  # why the last action failed, reported to the next actor
 
     # make a screenshot
-    page.keyboard.press("f")
-    time.sleep(1)
+    labels = label_page(page)
     image_path = make_screenshot(page=page, screenshot_dir=SCREENSHOT_DIR)
+    actor_image_path = image_path
     scroll_info = get_scroll_info(page=page)
 
     #### OBSERVER
     # pass the screenshot over to the observer LLM, who describes what he sees
     if not last_observer == "gemini": 
         if not DEBUG_OBSERVER:
-            prompt = get_observer_prompt()
-            response_text = get_gpt_observer_response(prompt=prompt, image_path=image_path)
-            log_response(logger, agent_type="GPT OBSERVER", prompt=prompt, response_text=response_text)
+            observation = get_text_observation(page) if OBSERVER_BACKEND == "text" else None
+            if observation is not None and observation.is_sufficient():
+                # the text view is enough, the actor does not need the screenshot
+                response_text = str(observation)
+                actor_image_path = None
+                log_response(
+                    logger, agent_type="TEXT OBSERVER", prompt="", response_text=response_text
+                )
+            else:
+                prompt = get_observer_prompt()
+                started = time.perf_counter()
+                response_text = get_gpt_observer_response(prompt=prompt, image_path=image_path)
+                log_response(
+                    logger,
+                    agent_type="GPT OBSERVER",
+                    prompt=prompt,
+                    response_text=response_text,
+                    model="gpt-4o",
+                    duration_s=time.perf_counter() - started,
+                    image_path=image_path,
+                )
             last_observer = "gpt"
         if DEBUG_OBSERVER:
             response_text = history.observer_response_text_2
@@ -102,14 +123,27 @@ with sync_playwright() as p:
     #### ACTOR
     # pass the screenshot and the observer's observations to the actor LLM
     response_text += f"""\n\nWebsite view:\nThe screenshot of the website does not show the full website. More information might be contained on the webpage when you scroll down or scroll up. You can scroll down by {scroll_info["scroll_amount_px"]} pixels."""
+    if action_error is not None:
+        response_text += f"\n\n{action_error}"
+        action_error = None
     actor_prompt = get_actor_prompt(
         website_description=response_text,
         task_description=task_description,
         tools=actor_tools,
+        with_image=actor_image_path is not None,
     )
     if not DEBUG_ACTOR:
-        response_text = get_gpt_actor_response(prompt=actor_prompt, image_path=image_path)
-        log_response(logger, agent_type="GPT ACTOR", prompt=actor_prompt, response_text=response_text)
+        started = time.perf_counter()
+        response_text = get_gpt_actor_response(prompt=actor_prompt, image_path=actor_image_path)
+        log_response(
+            logger,
+            agent_type="GPT ACTOR",
+            prompt=actor_prompt,
+            response_text=response_text,
+            model="gpt-4o",
+            duration_s=time.perf_counter() - started,
+            image_path=actor_image_path,
+        )
     if DEBUG_ACTOR: 
         response_text = history.actor_response_text_1
         log_response(logger, agent_type="SIMULATED ACTOR", prompt=actor_prompt, response_text=response_text)
@@ -123,9 +157,15 @@ with sync_playwright() as p:
         print(f"ANSWER: {action}")
         browser.close()
     if action_type == click_tool.name:
-        page.keyboard.press(action)
+        try:
+            click_label(page, action, labels)
+        except ValueError as error:
+            action_error = f"Your last action (click '{action}') failed: {error}"
+            log_response(
+                logger, agent_type="ACTION ERROR", prompt=action, response_text=action_error
+            )
     if action_type == scroll_tool.name:
-        page.keyboard.press("Escape") # untoggle vimium
+        clear_labels(page)
         if action == "down": 
             page.evaluate("window.scrollBy(0, 600)")
         if action == "up": 
@@ -133,28 +173,63 @@ with sync_playwright() as p:
     if action_type == input_tool.name:
         page.keyboard.type(action)
     if action_type == parse_table_data_tool.name:
-        prompt = get_gemini_observer_prompt(instructions=action)
-        response_text = get_gemini_observer_response(prompt=prompt, image_path=image_path)
-        log_response(logger, agent_type="GEMINI OBSERVER", prompt=prompt, response_text=response_text)
+        grid = extract_booking_grid_from_dom(page)
+        if grid is not None:
+            response_text = f"This is the parsed data in text format:\n{json.dumps(grid, indent=2)}"
+            log_response(
+                logger, agent_type="DOM TABLE PARSER", prompt=action, response_text=response_text
+            )
+        else:
+            prompt = get_gemini_observer_prompt(instructions=action)
+            started = time.perf_counter()
+            response_text = get_gemini_observer_response(prompt=prompt, image_path=image_path)
+            log_response(
+                logger,
+                agent_type="GEMINI OBSERVER",
+                prompt=prompt,
+                response_text=response_text,
+                model="gemini-1.5-flash",
+                duration_s=time.perf_counter() - started,
+                image_path=image_path,
+            )
         last_observer = "gemini"
-    time.sleep(3) 
+    with span("page_settle"):
+        time.sleep(3)
 
-    logger.info("########## ROUND 2 ##########")
+    start_step(logger, 2)
     print("########## ROUND 2 ##########")
 
     # make a screenshot
-    page.keyboard.press("f")
-    time.sleep(1)
+    labels = label_page(page)
     image_path = make_screenshot(page=page, screenshot_dir=SCREENSHOT_DIR)
+    actor_image_path = image_path
     scroll_info = get_scroll_info(page=page)
 
     #### OBSERVER
     # pass the screenshot over to the observer LLM, who describes what he sees
     if not last_observer == "gemini": 
         if not DEBUG_OBSERVER:
-            prompt = get_observer_prompt()
-            response_text = get_gpt_observer_response(prompt=prompt, image_path=image_path)
-            log_response(logger, agent_type="GPT OBSERVER", prompt=prompt, response_text=response_text)
+            observation = get_text_observation(page) if OBSERVER_BACKEND == "text" else None
+            if observation is not None and observation.is_sufficient():
+                # the text view is enough, the actor does not need the screenshot
+                response_text = str(observation)
+                actor_image_path = None
+                log_response(
+                    logger, agent_type="TEXT OBSERVER", prompt="", response_text=response_text
+                )
+            else:
+                prompt = get_observer_prompt()
+                started = time.perf_counter()
+                response_text = get_gpt_observer_response(prompt=prompt, image_path=image_path)
+                log_response(
+                    logger,
+                    agent_type="GPT OBSERVER",
+                    prompt=prompt,
+                    response_text=response_text,
+                    model="gpt-4o",
+                    duration_s=time.perf_counter() - started,
+                    image_path=image_path,
+                )
             last_observer = "gpt"
         if DEBUG_OBSERVER:
             response_text = history.observer_response_text_2
@@ -164,14 +239,27 @@ with sync_playwright() as p:
     #### ACTOR
     # pass the screenshot and the observer's observations to the actor LLM
     response_text += f"""\n\nWebsite view:\nThe screenshot of the website does not show the full website. More information might be contained on the webpage when you scroll down or scroll up. You can scroll down by {scroll_info["scroll_amount_px"]} pixels."""
+    if action_error is not None:
+        response_text += f"\n\n{action_error}"
+        action_error = None
     actor_prompt = get_actor_prompt(
         website_description=response_text,
         task_description=task_description,
         tools=actor_tools,
+        with_image=actor_image_path is not None,
     )
     if not DEBUG_ACTOR:
-        response_text = get_gpt_actor_response(prompt=actor_prompt, image_path=image_path)
-        log_response(logger, agent_type="GPT ACTOR", prompt=actor_prompt, response_text=response_text)
+        started = time.perf_counter()
+        response_text = get_gpt_actor_response(prompt=actor_prompt, image_path=actor_image_path)
+        log_response(
+            logger,
+            agent_type="GPT ACTOR",
+            prompt=actor_prompt,
+            response_text=response_text,
+            model="gpt-4o",
+            duration_s=time.perf_counter() - started,
+            image_path=actor_image_path,
+        )
     if DEBUG_ACTOR: 
         response_text = history.actor_response_text_1
         log_response(logger, agent_type="SIMULATED ACTOR", prompt=actor_prompt, response_text=response_text)
@@ -185,9 +273,15 @@ with sync_playwright() as p:
         print(f"ANSWER: {action}")
         browser.close()
     if action_type == click_tool.name:
-        page.keyboard.press(action)
+        try:
+            click_label(page, action, labels)
+        except ValueError as error:
+            action_error = f"Your last action (click '{action}') failed: {error}"
+            log_response(
+                logger, agent_type="ACTION ERROR", prompt=action, response_text=action_error
+            )
     if action_type == scroll_tool.name:
-        page.keyboard.press("Escape") # untoggle vimium
+        clear_labels(page)
         if action == "down": 
             page.evaluate("window.scrollBy(0, 600)")
         if action == "up": 
@@ -195,29 +289,64 @@ with sync_playwright() as p:
     if action_type == input_tool.name:
         page.keyboard.type(action)
     if action_type == parse_table_data_tool.name:
-        prompt = get_gemini_observer_prompt(instructions=action)
-        response_text = get_gemini_observer_response(prompt=prompt, image_path=image_path)
-        log_response(logger, agent_type="GEMINI OBSERVER", prompt=prompt, response_text=response_text)
+        grid = extract_booking_grid_from_dom(page)
+        if grid is not None:
+            response_text = f"This is the parsed data in text format:\n{json.dumps(grid, indent=2)}"
+            log_response(
+                logger, agent_type="DOM TABLE PARSER", prompt=action, response_text=response_text
+            )
+        else:
+            prompt = get_gemini_observer_prompt(instructions=action)
+            started = time.perf_counter()
+            response_text = get_gemini_observer_response(prompt=prompt, image_path=image_path)
+            log_response(
+                logger,
+                agent_type="GEMINI OBSERVER",
+                prompt=prompt,
+                response_text=response_text,
+                model="gemini-1.5-flash",
+                duration_s=time.perf_counter() - started,
+                image_path=image_path,
+            )
         last_observer = "gemini"
-    time.sleep(3)  
+    with span("page_settle"):
+        time.sleep(3)
 
 
-    logger.info("########## ROUND 3 ##########")
+    start_step(logger, 3)
     print("########## ROUND 3 ##########")
 
     # make a screenshot
-    page.keyboard.press("f")
-    time.sleep(1)
+    labels = label_page(page)
     image_path = make_screenshot(page=page, screenshot_dir=SCREENSHOT_DIR)
+    actor_image_path = image_path
     scroll_info = get_scroll_info(page=page)
 
     #### OBSERVER
     # pass the screenshot over to the observer LLM, who describes what he sees
     if not last_observer == "gemini": 
         if not DEBUG_OBSERVER:
-            prompt = get_observer_prompt()
-            response_text = get_gpt_observer_response(prompt=prompt, image_path=image_path)
-            log_response(logger, agent_type="GPT OBSERVER", prompt=prompt, response_text=response_text)
+            observation = get_text_observation(page) if OBSERVER_BACKEND == "text" else None
+            if observation is not None and observation.is_sufficient():
+                # the text view is enough, the actor does not need the screenshot
+                response_text = str(observation)
+                actor_image_path = None
+                log_response(
+                    logger, agent_type="TEXT OBSERVER", prompt="", response_text=response_text
+                )
+            else:
+                prompt = get_observer_prompt()
+                started = time.perf_counter()
+                response_text = get_gpt_observer_response(prompt=prompt, image_path=image_path)
+                log_response(
+                    logger,
+                    agent_type="GPT OBSERVER",
+                    prompt=prompt,
+                    response_text=response_text,
+                    model="gpt-4o",
+                    duration_s=time.perf_counter() - started,
+                    image_path=image_path,
+                )
             last_observer = "gpt"
         if DEBUG_OBSERVER:
             response_text = history.observer_response_text_2
@@ -227,14 +356,27 @@ with sync_playwright() as p:
     #### ACTOR
     # pass the screenshot and the observer's observations to the actor LLM
     response_text += f"""\n\nWebsite view:\nThe screenshot of the website does not show the full website. More information might be contained on the webpage when you scroll down or scroll up. You can scroll down by {scroll_info["scroll_amount_px"]} pixels. Only scroll if you have not all infromation that you need to complete the task."""
+    if action_error is not None:
+        response_text += f"\n\n{action_error}"
+        action_error = None
     actor_prompt = get_actor_prompt(
         website_description=response_text,
         task_description=task_description,
         tools=actor_tools,
+        with_image=actor_image_path is not None,
     )
     if not DEBUG_ACTOR:
-        response_text = get_gpt_actor_response(prompt=actor_prompt, image_path=image_path)
-        log_response(logger, agent_type="GPT ACTOR", prompt=actor_prompt, response_text=response_text)
+        started = time.perf_counter()
+        response_text = get_gpt_actor_response(prompt=actor_prompt, image_path=actor_image_path)
+        log_response(
+            logger,
+            agent_type="GPT ACTOR",
+            prompt=actor_prompt,
+            response_text=response_text,
+            model="gpt-4o",
+            duration_s=time.perf_counter() - started,
+            image_path=actor_image_path,
+        )
     if DEBUG_ACTOR: 
         response_text = history.actor_response_text_1
         log_response(logger, agent_type="SIMULATED ACTOR", prompt=actor_prompt, response_text=response_text)
@@ -248,9 +390,15 @@ with sync_playwright() as p:
         print(f"ANSWER: {action}")
         browser.close()
     if action_type == click_tool.name:
-        page.keyboard.press(action)
+        try:
+            click_label(page, action, labels)
+        except ValueError as error:
+            action_error = f"Your last action (click '{action}') failed: {error}"
+            log_response(
+                logger, agent_type="ACTION ERROR", prompt=action, response_text=action_error
+            )
     if action_type == scroll_tool.name:
-        page.keyboard.press("Escape") # untoggle vimium
+        clear_labels(page)
         if action == "down": 
             page.evaluate("window.scrollBy(0, 600)")
         if action == "up": 
@@ -258,28 +406,63 @@ with sync_playwright() as p:
     if action_type == input_tool.name:
         page.keyboard.type(action)
     if action_type == parse_table_data_tool.name:
-        prompt = get_gemini_observer_prompt(instructions=action)
-        response_text = get_gemini_observer_response(prompt=prompt, image_path=image_path)
-        log_response(logger, agent_type="GEMINI OBSERVER", prompt=prompt, response_text=response_text)
+        grid = extract_booking_grid_from_dom(page)
+        if grid is not None:
+            response_text = f"This is the parsed data in text format:\n{json.dumps(grid, indent=2)}"
+            log_response(
+                logger, agent_type="DOM TABLE PARSER", prompt=action, response_text=response_text
+            )
+        else:
+            prompt = get_gemini_observer_prompt(instructions=action)
+            started = time.perf_counter()
+            response_text = get_gemini_observer_response(prompt=prompt, image_path=image_path)
+            log_response(
+                logger,
+                agent_type="GEMINI OBSERVER",
+                prompt=prompt,
+                response_text=response_text,
+                model="gemini-1.5-flash",
+                duration_s=time.perf_counter() - started,
+                image_path=image_path,
+            )
         last_observer = "gemini"
-    time.sleep(3)  
+    with span("page_settle"):
+        time.sleep(3)
 
-    logger.info("########## ROUND 4 ##########")
+    start_step(logger, 4)
     print("########## ROUND 4 ##########")
 
     # make a screenshot
-    page.keyboard.press("f")
-    time.sleep(1)
+    labels = label_page(page)
     image_path = make_screenshot(page=page, screenshot_dir=SCREENSHOT_DIR)
+    actor_image_path = image_path
     scroll_info = get_scroll_info(page=page)
 
     #### OBSERVER
     # pass the screenshot over to the observer LLM, who describes what he sees
     if not last_observer == "gemini": 
         if not DEBUG_OBSERVER:
-            prompt = get_observer_prompt()
-            response_text = get_gpt_observer_response(prompt=prompt, image_path=image_path)
-            log_response(logger, agent_type="GPT OBSERVER", prompt=prompt, response_text=response_text)
+            observation = get_text_observation(page) if OBSERVER_BACKEND == "text" else None
+            if observation is not None and observation.is_sufficient():
+                # the text view is enough, the actor does not need the screenshot
+                response_text = str(observation)
+                actor_image_path = None
+                log_response(
+                    logger, agent_type="TEXT OBSERVER", prompt="", response_text=response_text
+                )
+            else:
+                prompt = get_observer_prompt()
+                started = time.perf_counter()
+                response_text = get_gpt_observer_response(prompt=prompt, image_path=image_path)
+                log_response(
+                    logger,
+                    agent_type="GPT OBSERVER",
+                    prompt=prompt,
+                    response_text=response_text,
+                    model="gpt-4o",
+                    duration_s=time.perf_counter() - started,
+                    image_path=image_path,
+                )
             last_observer = "gpt"
         if DEBUG_OBSERVER:
             response_text = history.observer_response_text_2
@@ -289,14 +472,27 @@ with sync_playwright() as p:
     #### ACTOR
     # pass the screenshot and the observer's observations to the actor LLM
     response_text += f"""\n\nWebsite view:\nThe screenshot of the website does not show the full website. More information might be contained on the webpage when you scroll down or scroll up. You can scroll down by {scroll_info["scroll_amount_px"]} pixels."""
+    if action_error is not None:
+        response_text += f"\n\n{action_error}"
+        action_error = None
     actor_prompt = get_actor_prompt(
         website_description=response_text,
         task_description=task_description,
         tools=actor_tools,
+        with_image=actor_image_path is not None,
     )
     if not DEBUG_ACTOR:
-        response_text = get_gpt_actor_response(prompt=actor_prompt, image_path=image_path)
-        log_response(logger, agent_type="GPT ACTOR", prompt=actor_prompt, response_text=response_text)
+        started = time.perf_counter()
+        response_text = get_gpt_actor_response(prompt=actor_prompt, image_path=actor_image_path)
+        log_response(
+            logger,
+            agent_type="GPT ACTOR",
+            prompt=actor_prompt,
+            response_text=response_text,
+            model="gpt-4o",
+            duration_s=time.perf_counter() - started,
+            image_path=actor_image_path,
+        )
     if DEBUG_ACTOR: 
         response_text = history.actor_response_text_1
         log_response(logger, agent_type="SIMULATED ACTOR", prompt=actor_prompt, response_text=response_text)
@@ -310,9 +506,15 @@ with sync_playwright() as p:
         print(f"ANSWER: {action}")
         browser.close()
     if action_type == click_tool.name:
-        page.keyboard.press(action)
+        try:
+            click_label(page, action, labels)
+        except ValueError as error:
+            action_error = f"Your last action (click '{action}') failed: {error}"
+            log_response(
+                logger, agent_type="ACTION ERROR", prompt=action, response_text=action_error
+            )
     if action_type == scroll_tool.name:
-        page.keyboard.press("Escape") # untoggle vimium
+        clear_labels(page)
         if action == "down": 
             page.evaluate("window.scrollBy(0, 600)")
         if action == "up": 
@@ -320,29 +522,64 @@ with sync_playwright() as p:
     if action_type == input_tool.name:
         page.keyboard.type(action)
     if action_type == parse_table_data_tool.name:
-        prompt = get_gemini_observer_prompt(instructions=action)
-        response_text = get_gemini_observer_response(prompt=prompt, image_path=image_path)
-        log_response(logger, agent_type="GEMINI OBSERVER", prompt=prompt, response_text=response_text)
+        grid = extract_booking_grid_from_dom(page)
+        if grid is not None:
+            response_text = f"This is the parsed data in text format:\n{json.dumps(grid, indent=2)}"
+            log_response(
+                logger, agent_type="DOM TABLE PARSER", prompt=action, response_text=response_text
+            )
+        else:
+            prompt = get_gemini_observer_prompt(instructions=action)
+            started = time.perf_counter()
+            response_text = get_gemini_observer_response(prompt=prompt, image_path=image_path)
+            log_response(
+                logger,
+                agent_type="GEMINI OBSERVER",
+                prompt=prompt,
+                response_text=response_text,
+                model="gemini-1.5-flash",
+                duration_s=time.perf_counter() - started,
+                image_path=image_path,
+            )
         last_observer = "gemini"
-    time.sleep(3)  
+    with span("page_settle"):
+        time.sleep(3)
 
 
-    logger.info("########## ROUND 5 ##########")
+    start_step(logger, 5)
     print("########## ROUND 5 ##########")
 
     # make a screenshot
-    page.keyboard.press("f")
-    time.sleep(1)
+    labels = label_page(page)
     image_path = make_screenshot(page=page, screenshot_dir=SCREENSHOT_DIR)
+    actor_image_path = image_path
     scroll_info = get_scroll_info(page=page)
 
     #### OBSERVER
     # pass the screenshot over to the observer LLM, who describes what he sees
     if not last_observer == "gemini": 
         if not DEBUG_OBSERVER:
-            prompt = get_observer_prompt()
-            response_text = get_gpt_observer_response(prompt=prompt, image_path=image_path)
-            log_response(logger, agent_type="GPT OBSERVER", prompt=prompt, response_text=response_text)
+            observation = get_text_observation(page) if OBSERVER_BACKEND == "text" else None
+            if observation is not None and observation.is_sufficient():
+                # the text view is enough, the actor does not need the screenshot
+                response_text = str(observation)
+                actor_image_path = None
+                log_response(
+                    logger, agent_type="TEXT OBSERVER", prompt="", response_text=response_text
+                )
+            else:
+                prompt = get_observer_prompt()
+                started = time.perf_counter()
+                response_text = get_gpt_observer_response(prompt=prompt, image_path=image_path)
+                log_response(
+                    logger,
+                    agent_type="GPT OBSERVER",
+                    prompt=prompt,
+                    response_text=response_text,
+                    model="gpt-4o",
+                    duration_s=time.perf_counter() - started,
+                    image_path=image_path,
+                )
             last_observer = "gpt"
         if DEBUG_OBSERVER:
             response_text = history.observer_response_text_2
@@ -352,14 +589,27 @@ with sync_playwright() as p:
     #### ACTOR
     # pass the screenshot and the observer's observations to the actor LLM
     response_text += f"""\n\nWebsite view:\nThe screenshot of the website does not show the full website. More information might be contained on the webpage when you scroll down or scroll up. You can scroll down by {scroll_info["scroll_amount_px"]} pixels."""
+    if action_error is not None:
+        response_text += f"\n\n{action_error}"
+        action_error = None
     actor_prompt = get_actor_prompt(
         website_description=response_text,
         task_description=task_description,
         tools=actor_tools,
+        with_image=actor_image_path is not None,
     )
     if not DEBUG_ACTOR:
-        response_text = get_gpt_actor_response(prompt=actor_prompt, image_path=image_path)
-        log_response(logger, agent_type="GPT ACTOR", prompt=actor_prompt, response_text=response_text)
+        started = time.perf_counter()
+        response_text = get_gpt_actor_response(prompt=actor_prompt, image_path=actor_image_path)
+        log_response(
+            logger,
+            agent_type="GPT ACTOR",
+            prompt=actor_prompt,
+            response_text=response_text,
+            model="gpt-4o",
+            duration_s=time.perf_counter() - started,
+            image_path=actor_image_path,
+        )
     if DEBUG_ACTOR: 
         response_text = history.actor_response_text_1
         log_response(logger, agent_type="SIMULATED ACTOR", prompt=actor_prompt, response_text=response_text)
@@ -373,9 +623,15 @@ with sync_playwright() as p:
         print(f"ANSWER: {action}")
         browser.close()
     if action_type == click_tool.name:
-        page.keyboard.press(action)
+        try:
+            click_label(page, action, labels)
+        except ValueError as error:
+            action_error = f"Your last action (click '{action}') failed: {error}"
+            log_response(
+                logger, agent_type="ACTION ERROR", prompt=action, response_text=action_error
+            )
     if action_type == scroll_tool.name:
-        page.keyboard.press("Escape") # untoggle vimium
+        clear_labels(page)
         if action == "down": 
             page.evaluate("window.scrollBy(0, 600)")
         if action == "up": 
@@ -383,11 +639,29 @@ with sync_playwright() as p:
     if action_type == input_tool.name:
         page.keyboard.type(action)
     if action_type == parse_table_data_tool.name:
-        prompt = get_gemini_observer_prompt(instructions=action)
-        response_text = get_gemini_observer_response(prompt=prompt, image_path=image_path)
-        log_response(logger, agent_type="GEMINI OBSERVER", prompt=prompt, response_text=response_text)
+        grid = extract_booking_grid_from_dom(page)
+        if grid is not None:
+            response_text = f"This is the parsed data in text format:\n{json.dumps(grid, indent=2)}"
+            log_response(
+                logger, agent_type="DOM TABLE PARSER", prompt=action, response_text=response_text
+            )
+        else:
+            prompt = get_gemini_observer_prompt(instructions=action)
+            started = time.perf_counter()
+            response_text = get_gemini_observer_response(prompt=prompt, image_path=image_path)
+            log_response(
+                logger,
+                agent_type="GEMINI OBSERVER",
+                prompt=prompt,
+                response_text=response_text,
+                model="gemini-1.5-flash",
+                duration_s=time.perf_counter() - started,
+                image_path=image_path,
+            )
         last_observer = "gemini"
-    time.sleep(3)  
+    with span("page_settle"):
+        time.sleep(3)
 
+    print(colored(f"\n<< resources >>\n{resource_stats.summary()}", color="light_grey"))
     input()
     browser.close()
\ No newline at end of file
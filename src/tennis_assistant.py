@@ -4,18 +4,19 @@ import time
 from pathlib import Path
 from typing import Callable, Literal
 
-import google.generativeai as genai
-import vertexai
-from annotated_docs.json_schema import as_json_schema
 from dotenv import load_dotenv
 
 ## models
 from openai import OpenAI
 from playwright.sync_api import Page, sync_playwright
 from termcolor import colored
-from vertexai.generative_models import GenerativeModel, Part
 
-from utils import *
+from src.browser import launch_browser
+from src.labeler import Label, click_label, label_page
+from src.resource_policy import EBUSY_PROFILE, apply_resource_policy
+from src.tools import ToolRegistry
+from src.tracing import enable_tracing, span
+from src.utils import *
 
 logger = setup_logger()
 DEBUG_OBSERVER = False
@@ -23,19 +24,14 @@ DEBUG_ACTOR = False
 
 # general setup
 SCREENSHOT_DIR = "screenshots"
-PLAYWRIGHT_USER_DATA_DIRECTORY = os.path.expanduser("~/playwright_user_data")
-VIMIUM_PATH = "vimium"  # vimium must be downloaded via google-extension-downloader and unzipped into this project's directory
 
 # OpenAI
 load_dotenv()
+enable_tracing()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 client = OpenAI()
 
-# Google Gemini
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-PROJECT_ID = os.getenv("PROJECT_ID")
-genai.configure(api_key=GOOGLE_API_KEY)
-vertexai.init(project=PROJECT_ID, location="europe-central2")
+# Google Gemini: configured on first use, see utils.get_gemini_client
 
 
 ################################################################
@@ -80,7 +76,7 @@ def get_screenshot_description_from_gemini(screenshot_path: str | Path) -> str:
 # Agent Tools
 def scroll(page: Annotated[Page, "IGNORE"], scroll_direction: Literal["up", "down"]):
     """Use this function to scroll up or down a webpage."""
-    page.keyboard.press("PageDown" if tool_args["direction"] == "down" else "PageUp")
+    page.keyboard.press("PageDown" if scroll_direction == "down" else "PageUp")
     return f"Scrolled {scroll_direction} on the webpage. Waiting for the website to respond, which can take a while..."
 
 
@@ -89,9 +85,13 @@ def click(
     ui_element_id: Annotated[
         str, "The unique identifier of a UI element consisting of 1-2 letters"
     ],
+    labels: Annotated[dict[str, Label], "IGNORE"],
 ):
     """Use this function to click on an UI element on a webpage. UI elements that can be clicked are marked by small yellow boxes with letters inside. The letters uniquely identify a UI element."""
-    page.keyboard.press(ui_element_id)
+    try:
+        click_label(page, ui_element_id, labels)
+    except ValueError as error:
+        return str(error)
     return f"Clicked on the UI element with ID '{ui_element_id}'. Waiting for the website to respond, which can take a while..."
 
 
@@ -106,32 +106,12 @@ def extract_data_from_table(
     response_text = get_gemini_observer_response(prompt=prompt, image_path=screenshot_path)
     return response_text
 
-def scroll(scroll_direction: Literal["up", "down"]):
-    """Use this tool to scroll DOWN or UP the website."""
-    return f"Scrolled {scroll_direction} on the webpage. Waiting for the website to respond, which can take a while..."
-
-def click(ui_element_id: Annotated[str, "The ID that consists of 1-2 letters which uniquely identifies a UI element."]):
-    """Use this tool to click on an UI element."""
-    return f"Clicked on the UI element with ID '{ui_element_id}'. Waiting for the website to respond, which can take a while..."
-
-def scroll(direction: Literal["up", "down"]):
-    """Use this to scroll up or down a webpage."""
-    pass
-
-def click(ui_element_id: str):
-    """Use this to click on an UI element on a webpage. UI elements that can be clicked are marked by small yellow boxes with letters inside. The letters uniquely identify a UI element."""
-    pass
-
-name_to_function_map: dict[str, Callable] = {
-    scroll.__name__: scroll,
-    click.__name__: click,
-    # extract_data_from_table.__name__: extract_data_from_table,
-}
-openai_formatted_tools = [
-    # {"function": convert_function_to_openai_tool_json_format(func), "type": "function"}
-    {"function": as_json_schema(func), "type": "function"}
-    for func in name_to_function_map.values()
-]
+tool_registry = ToolRegistry([
+    scroll,
+    click,
+    # extract_data_from_table,
+])
+openai_formatted_tools = tool_registry.schemas("openai")
 print(openai_formatted_tools)
 
 # Initialize assistant
@@ -164,16 +144,8 @@ thread = client.beta.threads.create()
 
 # Main Loop
 with sync_playwright() as p:
-    browser = p.chromium.launch_persistent_context(
-        user_data_dir=PLAYWRIGHT_USER_DATA_DIRECTORY,
-        headless=False,
-        args=[
-            f"--disable-extensions-except={VIMIUM_PATH}",
-            f"--load-extension={VIMIUM_PATH}",
-        ],
-        viewport={"width": 700, "height": 800},
-        screen={"width": 700, "height": 800},
-    )
+    browser = launch_browser(p, width=700, height=800)
+    resource_stats = apply_resource_policy(browser, EBUSY_PROFILE)
 
     # navigate to booking site
     page = browser.new_page()
@@ -184,7 +156,7 @@ with sync_playwright() as p:
     num_recursions = 5
     for i in range(num_recursions):
         # make a screenshot
-        page.keyboard.press("f")
+        labels = label_page(page)
         screenshot_path = make_screenshot(page=page, screenshot_dir=SCREENSHOT_DIR)
         screenshot_file = client.files.create(file=open(screenshot_path, "rb"), purpose="vision")
 
@@ -194,13 +166,21 @@ with sync_playwright() as p:
         )
 
         # Ask GPT to navigate or answer, given the task description, the website description, and the screenshot
+        user_text = (
+            "I want to find out whether there are any tennis courts free between 17:00 and 19:00. "
+            "I provide you a screenshot of the webpage I am currently seeing. "
+            f"I see the following in it:\n\n{screenshot_description}"
+        )
+        # the thread lives on OpenAI's side, so the budget applies to the instructions and each new
+        # message
+        report_prompt_tokens(f"{instructions}\n{user_text}", name="assistant message")
         message = client.beta.threads.messages.create(
             thread_id=thread.id,
             role="user",
             content=[
                 {
                     "type": "text",
-                    "text": f"I want to find out whether there are any tennis courts free between 17:00 and 19:00. I provide you a screenshot of the webpage I am currently seeing. I see the following in it:\n\n{screenshot_description}",
+                    "text": user_text,
                 },
                 {"type": "image_file", "image_file": {"file_id": screenshot_file.id}},
             ],
@@ -221,21 +201,15 @@ with sync_playwright() as p:
                 # get tool information
                 tool_name: str = tool.function.name
                 tool_args: dict = json.loads(tool.function.arguments)
-                tool_func: Callable = name_to_function_map[tool_name]
-
-                # execute tool
-                if tool_name == "click":
-                    tool_output = click(page=page, ui_element_id=tool_args["ui_element_id"])
-                elif tool_name == "scroll":
-                    tool_output = scroll(page=page, scroll_direction=tool_args["scroll_direction"])
-                elif tool_name == "extract_data_from_table":
-                    tool_output = extract_data_from_table(
-                        screenshot_path=screenshot_description,
-                        table_description=tool_args["table_description"],
-                    )
-                else:
-                    raise ValueError(
-                        f"Unknown tool name: {tool_name}. Available tools: {name_to_function_map.keys()}"
+
+                # execute tool; the registry passes each tool the runtime arguments it declares
+                with span(f"tool.{tool_name}"):
+                    tool_output = tool_registry.call(
+                        tool_name,
+                        tool_args,
+                        page=page,
+                        labels=labels,
+                        screenshot_path=screenshot_path,
                     )
 
                 # pass the LLM-friendly formatted tool output back to the LLM
@@ -262,4 +236,5 @@ with sync_playwright() as p:
     # screenshot of the final webpage view
     make_screenshot(page=page, screenshot_dir=SCREENSHOT_DIR)
 
+    print(colored(f"\n<< resources >>\n{resource_stats.summary()}", color="light_grey"))
     browser.close()
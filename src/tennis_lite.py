@@ -10,15 +10,19 @@ from dotenv import load_dotenv
 from playwright.sync_api import Page, sync_playwright
 from termcolor import colored
 
-from src.utils import convert_function_to_openai_tool, create_user_message, encode_image, make_screenshot
-
-## set ENV variables
-load_dotenv()
+from src.availability import AvailabilityIndex, format_free_runs
+from src.booking_grid import extract_booking_grid
+from src.browser import launch_browser
+from src.labeler import Label, click_label, label_page
+from src.prompt_templates import MAX_PROMPT_TOKENS, check_prompt, messages_text
+from src.resource_policy import EBUSY_PROFILE, apply_resource_policy
+from src.tools import ToolRegistry
+from src.tracing import enable_tracing, span
+from src.utils import create_user_message, encode_image, make_screenshot
 
 # general setup
 SCREENSHOT_DIR = "screenshots"
-PLAYWRIGHT_USER_DATA_DIRECTORY = os.path.expanduser("~/playwright_user_data")
-VIMIUM_PATH = "vimium"  # vimium must be downloaded via google-extension-downloader and unzipped into this project's directory
+START_URL = "https://safo.ebusy.de/lite-module/407"
 
 # custom typing hints
 LLMAnswer = str
@@ -54,11 +58,15 @@ def click(
     ui_element_id: Annotated[
         str, "The unique identifier of a UI element consisting of 1-2 letters"
     ],
+    labels: Annotated[dict[str, Label], "IGNORE"],
 ) -> str:
     """Use this function to click on an UI element on a webpage. UI elements \
 that can be clicked are marked by small yellow boxes with letters inside. \
 The letters uniquely identify a UI element."""
-    page.keyboard.press(ui_element_id)
+    try:
+        click_label(page, ui_element_id, labels)
+    except ValueError as error:
+        return str(error)
     return (
         f"Clicked on the UI element with ID '{ui_element_id}'. "
         "Waiting for the website to respond, which can take a while..."
@@ -88,44 +96,50 @@ The letters uniquely identify a UI element."""
 #     response_text = response.choices[0].message.content
 #     return response_text
 
-name_to_function_map: dict[str, Callable] = {
-    scroll.__name__: scroll,
-    click.__name__: click,
-    # extract_information_from_table.__name__: extract_information_from_table,
-}
-tools = [
-    {"function": convert_function_to_openai_tool(func), "type": "function"}
-    for func in name_to_function_map.values()
-]
-print(colored(f"\nAVAILABLE TOOLS:{"".join(["\n* " + func_name for func_name in name_to_function_map.keys()])}", color="green"))
-
-with sync_playwright() as p:
-    browser = p.chromium.launch_persistent_context(
-        user_data_dir=PLAYWRIGHT_USER_DATA_DIRECTORY,
-        headless=False,
-        args=[
-            f"--disable-extensions-except={VIMIUM_PATH}",
-            f"--load-extension={VIMIUM_PATH}",
-        ],
-        viewport={"width": 760, "height": 800},
-        screen={"width": 760, "height": 800},
+def read_booking_table(
+    page: Annotated[Page, "IGNORE"],
+    screenshot: Annotated[Base64Img, "IGNORE"],
+) -> str:
+    """Use this function to read the booking table of the current webpage. \
+It returns for every court and every time slot whether the slot is free or booked."""
+    grid = extract_booking_grid(page=page, screenshot_base64=screenshot, model=LLM.GPT_4o)
+    if grid is None:
+        return "Could not find a booking table on the current webpage."
+    return f"This is the booking status of each court and time slot:\n{json.dumps(grid, indent=2)}"
+
+def find_free_courts(
+    page: Annotated[Page, "IGNORE"],
+    screenshot: Annotated[Base64Img, "IGNORE"],
+    duration_minutes: Annotated[
+        int, "For how many minutes in a row a court needs to be free, e.g. 60"
+    ],
+    window_start: Annotated[str, "Start of the time window in the format HH:MM, e.g. 17:00"],
+    window_end: Annotated[str, "End of the time window in the format HH:MM, e.g. 19:00"],
+) -> str:
+    """Use this function to find the courts that are free for a given duration within a time \
+window, e.g. 'free for 1 hour between 17:00 and 19:00'. It reads the booking table of the \
+current webpage and computes the answer exactly, so prefer it over reading the table yourself."""
+    grid = extract_booking_grid(page=page, screenshot_base64=screenshot, model=LLM.GPT_4o)
+    if grid is None:
+        return "Could not find a booking table on the current webpage."
+    index = AvailabilityIndex.from_grid(grid)
+    runs = index.find_free_runs(duration_minutes, window_start, window_end)
+    return (
+        f"Courts that are free for at least {duration_minutes} minutes "
+        f"between {window_start} and {window_end}:\n"
+        f"{format_free_runs(runs, index.courts)}"
     )
 
-    # navigate to booking site
-    page = browser.new_page()
-    # page.goto("https://safo.ebusy.de")
-    page.goto("https://safo.ebusy.de/lite-module/407")
-    time.sleep(2)
+tool_registry = ToolRegistry([
+    scroll,
+    click,
+    # extract_information_from_table,
+    read_booking_table,
+    find_free_courts,
+])
+tools = tool_registry.schemas("openai")
 
-    # make a screenshot
-    page.keyboard.press("Escape")
-    page.keyboard.press("f")
-    screenshot_path = make_screenshot(page=page, screenshot_dir=SCREENSHOT_DIR)
-    screenshot_base64 = encode_image(screenshot_path)
-
-    messages = []
-
-    system_msg = """\
+SYSTEM_PROMPT = """\
 You are an assistant that helps the user check the availability of bookable tennis courts on a website. 
 
 The user will ask you to check for available tennis courts at certain time slots. \
@@ -144,6 +158,8 @@ every court. As the user only provides you a small part of the website, you migh
 need to scroll up or down to see all time slots. \
 
 In the booking table, courts that are bookable are marked as "BUCHEN". All other courts are NOT bookable. \
+Once you are on the booking page, use the find_free_courts tool to find courts that are free \
+for a certain duration within a time window instead of working it out from the table yourself. \
 If you find any courts that are bookable, provide the court number along with the bookable time slots in the following format:
 
 <ANSWER>
@@ -179,71 +195,118 @@ Make sure that if you see 3 courts, you provide the information for all 3 courts
 # When you think you can provide an answer based on the information gathered, 
 # give your final answer to the user by writing it inside <ANSWER></ANSWER> tags."""
 
-    messages.append({"role": "system", "content": system_msg})
-    print(colored(f"\nSystem:\n{system_msg}", color="red"))
-
-    task_description = """\
+TASK_DESCRIPTION = """\
 I'm on the website where I can book tennis courts. Which outside tennis courts \
 are free for 1 hour between 17:00 and 19:00?"""
 
-    print(colored(f"\nHuman:\n{task_description}", color="cyan"))
-    messages.append(
-        {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": task_description},
-                {"type": "image_url", "image_url": {"url": "data:image/jpeg;base64," + screenshot_base64}},
-            ]
-        }
-    )
+# console label and color of each event type
+EVENT_STYLES = {
+    "system": ("System", "red"),
+    "user": ("Human", "cyan"),
+    "assistant": ("AI", "magenta"),
+    "tool_result": ("Tool", None),
+    "answer": ("FINAL ANSWER", "green"),
+}
+
+
+def print_event(event: dict) -> None:
+    """Prints an event of `run_task` to the console."""
+    if event["type"] in EVENT_STYLES:
+        label, color = EVENT_STYLES[event["type"]]
+        print(colored(f"\n{label}:\n{event['text']}", color=color))
+    elif event["type"] == "tool_call":
+        print(colored(f"\n<< {event['name']}: {event['arguments']} >>", color="yellow"))
+    elif event["type"] == "step":
+        print(colored(f"\n<< step {event['step']} >>", color="light_grey"))
 
-    max_recursions = 5
-    for i in range(max_recursions):
-        response = completion(
-            model=LLM.CLAUDE_3_5_SONNET,
-            messages=messages,
-            tools=tools,
-            tool_choice="auto"
+
+def user_message(text: str, screenshot_base64: Base64Img) -> dict:
+    return {
+        "role": "user",
+        "content": [
+            {"type": "text", "text": text},
+            {
+                "type": "image_url",
+                "image_url": {"url": "data:image/jpeg;base64," + screenshot_base64},
+            },
+        ],
+    }
+
+
+def run_task(
+    page: Page,
+    task_description: str = TASK_DESCRIPTION,
+    url: str | None = START_URL,
+    max_steps: int = 5,
+    model: str = LLM.CLAUDE_3_5_SONNET,
+    emit: Callable[[dict], None] = print_event,
+    screenshot_dir: str | Path = SCREENSHOT_DIR,
+) -> str | None:
+    """Solves one task on `page` and returns the final answer, or None after `max_steps`.
+
+    Navigates to `url` first, unless it is None. Each step of the loop is reported to `emit` as an
+    event dict with a "type" (system, user, step, assistant, tool_call, tool_result, answer) and its
+    data. Tasks that run at the same time need their own `screenshot_dir`, since screenshots are
+    numbered per directory."""
+    Path(screenshot_dir).mkdir(parents=True, exist_ok=True)
+    if url is not None:
+        page.goto(url)
+        time.sleep(2)
+
+    # make a screenshot
+    labels = label_page(page)
+    screenshot_path = make_screenshot(page=page, screenshot_dir=screenshot_dir)
+    screenshot_base64 = encode_image(screenshot_path)
+
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    emit({"type": "system", "text": SYSTEM_PROMPT})
+    messages.append(user_message(task_description, screenshot_base64))
+    emit({"type": "user", "text": task_description, "screenshot": screenshot_path})
+
+    def ask_actor():
+        # the text of the whole conversation must fit the budget; raises PromptTooLong otherwise
+        n_tokens = check_prompt(
+            messages_text(messages), MAX_PROMPT_TOKENS, model=model, name="actor conversation"
         )
+        with span("actor", model=model):
+            response = completion(model=model, messages=messages, tools=tools, tool_choice="auto")
+        emit({
+            "type": "assistant",
+            "text": response.choices[0].message.content,
+            "finish_reason": response.choices[0].finish_reason,
+            "prompt_tokens": n_tokens,
+        })
+        return response
+
+    for step in range(1, max_steps + 1):
+        emit({"type": "step", "step": step})
+        response = ask_actor()
         response_text = response.choices[0].message.content
-        print(colored(f"\nAI:\n{response_text}", color="magenta"))
-
-        # check if the LLM has called tools. If so, we need to invoke them
-        print(f"\n<< finish_reason: {response.choices[0].finish_reason} >>")
-        print(f"\n<< tool_calls: {response.choices[0].message.tool_calls} >>")
-        assert isinstance(response.choices[0].message.tool_calls[0].function.name, str)
-        assert isinstance(response.choices[0].message.tool_calls[0].function.arguments, str)
         messages.append(response.choices[0].message.model_dump())  # Add assistant tool invokes
 
-        if response['choices'][0]['finish_reason'] == "tool_calls":
+        # check if the LLM has called tools. If so, we need to invoke them
+        if response.choices[0].finish_reason == "tool_calls":
             tool_calls = response.choices[0].message.tool_calls
-            print(colored(f"\nTool Calls:\n{tool_calls}", color="yellow"))
             assert len(tool_calls) == 1, "More than one tool_calls. Currently not implemented."
             for tool_call in tool_calls:
                 # get tool information
                 tool_name: str = tool_call.function.name
                 tool_args: dict = json.loads(tool_call.function.arguments)
-                tool_func: Callable = name_to_function_map[tool_name]
-
-                # execute tool
-                if tool_name == "click":
-                    tool_output = click(page=page, ui_element_id=tool_args["ui_element_id"])
-                    print(f"\n<< key press: {tool_args['ui_element_id']} >>")
-                elif tool_name == "scroll":
-                    tool_output = scroll(page=page, scroll_direction=tool_args["scroll_direction"])
-                    print(f"\n<< scroll {tool_args['scroll_direction']} >>")
-                elif tool_name == "extract_information_from_table":
-                    tool_output = extract_information_from_table(
+                emit({"type": "tool_call", "name": tool_name, "arguments": tool_args})
+
+                # execute tool; the registry passes each tool the runtime arguments it declares
+                with span(f"tool.{tool_name}"):
+                    tool_output = tool_registry.call(
+                        tool_name,
+                        tool_args,
+                        page=page,
+                        labels=labels,
                         screenshot=screenshot_base64,
                         task_description=task_description,
-                        model=LLM.CLAUDE_3_5_SONNET,
+                        model=model,
                         temperature=0.3,
                     )
-                    print(f"\n<< extract information from table >>\n")
-                    print(tool_output)
-                    print(f"\n<< extract information from table >>\n")
-                else:
-                    raise ValueError(f"Unknown tool name: {tool_name}. Available tools: {name_to_function_map.keys()}")
+                emit({"type": "tool_result", "name": tool_name, "text": tool_output})
 
                 # add tool output to messages
                 messages.append({
@@ -254,44 +317,39 @@ are free for 1 hour between 17:00 and 19:00?"""
                 })
 
             # Let the LLM finish his answer after the tool call
-            response = completion(
-                model=LLM.CLAUDE_3_5_SONNET,
-                messages=messages,
-                tools=tools,
-                tool_choice="auto",
-            )
+            response = ask_actor()
             response_text = response.choices[0].message.content
-            print(colored(f"\nAI:\n{response_text}", color="magenta"))
 
         # check if the LLM has finished
         if response_text is not None:
-            if "<ANSWER>" in response_text and "</ANSWER>" in response_text:
-                print(colored(f"<< ANSWER PROVIDED >>", color="green"))
-                pattern = r'<ANSWER>([\s\S]*?)</ANSWER>'
-                match = re.search(pattern, response_text)
+            match = re.search(r'<ANSWER>([\s\S]*?)</ANSWER>', response_text)
+            if match:
                 answer = match.group(1)
-                print(colored(f"\nFINAL ANSWER:\n{answer}", color="green"))
-                break
+                emit({"type": "answer", "text": answer})
+                return answer
 
         # create the next screenshot after navigating
-        time.sleep(3)
-        page.keyboard.press("Escape")
-        page.keyboard.press("f")
-        screenshot_path = make_screenshot(page=page, screenshot_dir=SCREENSHOT_DIR)
+        with span("page_settle"):
+            time.sleep(3)
+        labels = label_page(page)
+        screenshot_path = make_screenshot(page=page, screenshot_dir=screenshot_dir)
         screenshot_base64 = encode_image(screenshot_path)
 
         # give the LLM the next screenshot
-        messages.append(
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": "Here is the next screenshot."},
-                    {"type": "image_url", "image_url": {"url": "data:image/jpeg;base64," + screenshot_base64}},
-                ]
-            }
-        )
-
-
-            
-
-
+        messages.append(user_message("Here is the next screenshot.", screenshot_base64))
+    return None
+
+
+if __name__ == "__main__":
+    ## set ENV variables
+    load_dotenv()
+    enable_tracing()
+    tool_list = "".join(["\n* " + tool_name for tool_name in tool_registry.names()])
+    print(colored(f"\nAVAILABLE TOOLS:{tool_list}", color="green"))
+
+    with sync_playwright() as p:
+        browser = launch_browser(p, width=760, height=800)
+        resource_stats = apply_resource_policy(browser, EBUSY_PROFILE)
+        page = browser.new_page()
+        run_task(page)
+        print(colored(f"\n<< resources >>\n{resource_stats.summary()}", color="light_grey"))
@@ -0,0 +1,85 @@
+# A text-only observer: instead of sending a screenshot to a vision model and
+# asking it to describe the page and every Vimium hint, we build a compact text
+# view of the page from the DOM. Every interactive element in the viewport gets
+# a letter ID (the same IDs that src/labeler.py draws onto the page), its
+# accessible role and its label.
+#
+# The actor can work with this text view alone for most steps; a screenshot is
+# only needed when the text view is insufficient (see `is_sufficient`).
+from dataclasses import dataclass, field
+
+from playwright.sync_api import Page
+
+from src.labeler import Label, evaluate_with_labeler
+
+# Summarizes the page and reuses the elements that were just labeled (or labels them now), so the
+# letter IDs in the text view are the same ones drawn on the screenshot.
+TEXT_OBSERVATION_JS = """
+(maxTextChars) => {
+    const clean = (s) => (s || "").replace(/\\s+/g, " ").trim();
+    const isVisible = (el) => {
+        const rect = el.getBoundingClientRect();
+        return (
+            rect.width > 0 && rect.height > 0 && rect.bottom > 0 && rect.top < window.innerHeight
+        );
+    };
+    return {
+        title: document.title,
+        url: location.href,
+        text: clean(document.body ? document.body.innerText : "").slice(0, maxTextChars),
+        n_images: Array.from(document.images).filter(isVisible).length,
+        n_canvases: Array.from(document.querySelectorAll("canvas, svg")).filter(isVisible).length,
+        elements: window.__agentLabeler.lastElements || window.__agentLabeler.collect(),
+    };
+}
+"""
+
+
+@dataclass
+class TextObservation:
+    title: str
+    url: str
+    text: str
+    elements: list[Label] = field(default_factory=list)
+    n_images: int = 0
+    n_canvases: int = 0
+
+    def __str__(self):
+        return (
+            f"Description of the webpage:\n"
+            f"Title: {self.title} ({self.url})\n"
+            f"Visible text: {self.text}\n\n"
+            f"Description of clickable UI elements:\n"
+            + "\n".join(str(element) for element in self.elements)
+        )
+
+    def is_sufficient(self, max_unnamed_ratio: float = 0.3) -> bool:
+        """Whether the actor can decide on the text view alone or also needs a screenshot.
+
+        The text view is not enough if there is nothing to interact with, if many elements have
+        no label (icon buttons), or if the page mostly renders its content into canvas/svg."""
+        if not self.elements:
+            return False
+        unnamed = sum(1 for element in self.elements if not element.name)
+        if unnamed / len(self.elements) > max_unnamed_ratio:
+            return False
+        if self.n_canvases > len(self.elements):
+            return False
+        return True
+
+    @property
+    def labels(self) -> dict[str, Label]:
+        return {element.id: element for element in self.elements}
+
+
+def get_text_observation(page: Page, max_text_chars: int = 3000) -> TextObservation:
+    """Builds a compact text view of the current viewport in a single `page.evaluate` call."""
+    raw = evaluate_with_labeler(page, TEXT_OBSERVATION_JS, max_text_chars)
+    return TextObservation(
+        title=raw["title"],
+        url=raw["url"],
+        text=raw["text"],
+        elements=[Label(**element) for element in raw["elements"]],
+        n_images=raw["n_images"],
+        n_canvases=raw["n_canvases"],
+    )
@@ -0,0 +1,176 @@
+# Agent tools: schemas compiled once, calls dispatched through a table.
+#
+# A tool is a plain function whose parameters are type-hinted. Parameters
+# annotated with Annotated[..., "IGNORE"] are runtime arguments (page,
+# labels, screenshot, ...) that the model never sees; the others make up the
+# JSON schema of the tool. `compile_tool` reads the type hints once and keeps
+# a minimal schema (collapsed docstring, no empty fields); ToolRegistry caches
+# its variants for OpenAI, Anthropic and Gemini and calls a tool by name with
+# the arguments of the model plus whatever runtime arguments it declares.
+import inspect
+import re
+import types
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Annotated, Any, Callable, Literal, Union, get_args, get_origin, get_type_hints
+
+from src.json_repair import parse_json
+
+IGNORE = "IGNORE"
+
+JSON_TYPES = {
+    str: "string",
+    int: "integer",
+    float: "number",
+    bool: "boolean",
+    list: "array",
+    dict: "object",
+    type(None): "null",
+}
+PROVIDERS = ("openai", "anthropic", "gemini")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass(frozen=True)
+class Tool:
+    name: str
+    func: Callable
+    description: str
+    parameters: dict  # JSON schema of the arguments the model provides
+    runtime_args: tuple[str, ...]  # the IGNORE-annotated arguments, injected at call time
+    # model arguments that may be left out; passed as None if they have no default
+    optional_args: tuple[str, ...]
+
+    def __call__(self, arguments: dict, context: dict) -> Any:
+        missing = [name for name in self.runtime_args if name not in context]
+        if missing:
+            raise ValueError(f"Tool '{self.name}' needs the runtime arguments {missing}")
+        kwargs = {name: context[name] for name in self.runtime_args}
+        kwargs.update({name: None for name in self.optional_args})
+        kwargs.update(
+            {
+                name: value
+                for name, value in arguments.items()
+                if name in self.parameters["properties"]
+            }
+        )
+        return self.func(**kwargs)
+
+
+def _collapse(text: str | None) -> str:
+    return _WHITESPACE.sub(" ", text or "").strip()
+
+
+def _parameter_schema(name: str, type_hint: Any) -> tuple[dict, bool]:
+    """The JSON schema of one parameter, and whether it is optional."""
+    optional = False
+    if get_origin(type_hint) in (Union, types.UnionType):
+        args = [arg for arg in get_args(type_hint) if arg is not type(None)]
+        if len(args) != 1:
+            raise TypeError(
+                f"Parameter '{name}' has a union type, which is not supported: {type_hint}"
+            )
+        type_hint, optional = args[0], True
+    if get_origin(type_hint) is Literal:
+        values = get_args(type_hint)
+        if not all(isinstance(value, type(values[0])) for value in values):
+            raise TypeError(
+                f"Not all values of the Literal are of the same type, but must be: {values}"
+            )
+        return {"type": JSON_TYPES[type(values[0])], "enum": list(values)}, optional
+    base = get_origin(type_hint) or type_hint
+    if base not in JSON_TYPES:
+        raise TypeError(
+            f"Data type '{type_hint}' of parameter '{name}' is not a supported JSON schema type!"
+        )
+    return {"type": JSON_TYPES[base]}, optional
+
+
+@lru_cache(maxsize=None)
+def compile_tool(func: Callable) -> Tool:
+    """Reads the type hints of `func` into a Tool. Compiled once per function."""
+    signature = inspect.signature(func)
+    type_hints = get_type_hints(func, include_extras=True)
+    properties, required, runtime_args, optional_args = {}, [], [], []
+    for name, parameter in signature.parameters.items():
+        type_hint = type_hints.get(name, str)
+        description = None
+        if get_origin(type_hint) is Annotated:
+            type_hint, description = get_args(type_hint)[0], type_hint.__metadata__[0]
+            if description == IGNORE:
+                runtime_args.append(name)
+                continue
+        schema, optional = _parameter_schema(name, type_hint)
+        if description:
+            schema["description"] = _collapse(description)
+        properties[name] = schema
+        if parameter.default is not inspect.Parameter.empty:
+            continue
+        (optional_args if optional else required).append(name)
+    parameters = {"type": "object", "properties": properties}
+    if required:
+        parameters["required"] = required
+    return Tool(
+        name=func.__name__,
+        func=func,
+        description=_collapse(func.__doc__),
+        parameters=parameters,
+        runtime_args=tuple(runtime_args),
+        optional_args=tuple(optional_args),
+    )
+
+
+def provider_schema(tool: Tool, provider: str) -> dict:
+    if provider == "openai":
+        return {
+            "type": "function",
+            "function": {
+                "name": tool.name,
+                "description": tool.description,
+                "parameters": tool.parameters,
+            },
+        }
+    if provider == "anthropic":
+        return {"name": tool.name, "description": tool.description, "input_schema": tool.parameters}
+    if provider == "gemini":
+        # Gemini rejects an object schema without properties
+        schema = {"name": tool.name, "description": tool.description}
+        if tool.parameters["properties"]:
+            schema["parameters"] = tool.parameters
+        return schema
+    raise ValueError(f"Unknown provider '{provider}'. Available providers: {', '.join(PROVIDERS)}")
+
+
+class ToolRegistry:
+    def __init__(self, funcs: list[Callable]):
+        self.tools: dict[str, Tool] = {}
+        for func in funcs:
+            tool = compile_tool(func)
+            self.tools[tool.name] = tool
+        self._schemas: dict[str, list[dict]] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.tools
+
+    def names(self) -> list[str]:
+        return list(self.tools)
+
+    def schemas(self, provider: str = "openai") -> list[dict]:
+        """The tool list for `provider`, built on first use.
+
+        litellm takes the "openai" variant for every model."""
+        if provider not in self._schemas:
+            self._schemas[provider] = [
+                provider_schema(tool, provider) for tool in self.tools.values()
+            ]
+        return self._schemas[provider]
+
+    def call(self, name: str, arguments: str | dict | None, **context) -> Any:
+        """Calls the tool `name` with the (JSON) arguments of the model. `context` holds the runtime
+        arguments; each tool gets only the ones it declares."""
+        if name not in self.tools:
+            raise ValueError(f"Unknown tool name: {name}. Available tools: {self.names()}")
+        if isinstance(arguments, str):
+            arguments = parse_json(arguments) if arguments.strip() else {}
+        return self.tools[name](arguments or {}, context)
@@ -0,0 +1,188 @@
+# Span-level latency tracing of the agent loops.
+#
+# `span("observer")` times a stage of the loop (screenshot, labeling, model
+# calls, segmentation, page settle, tool calls); `traced` does the same for a
+# whole function. Both are no-ops until a script calls `enable_tracing`. Then
+# spans are kept in memory as Chrome trace events ("complete" events in
+# microseconds) and written at exit to TRACE_DIR as trace_<time>_<pid>.json,
+# which chrome://tracing and Perfetto open directly.
+# Nested spans show up nested, since they share a thread and overlap in time.
+#
+# The summary CLI reads any number of trace files and prints the latency
+# percentiles of each stage across all runs:
+#
+#     python -m src.tracing traces/
+import argparse
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator
+
+TRACE_DIR = os.getenv("TRACE_DIR", "traces")  # empty to disable tracing
+MAX_EVENTS = 100_000
+
+
+class Tracer:
+    def __init__(self, enabled: bool = True, max_events: int = MAX_EVENTS):
+        self.enabled = enabled
+        self.max_events = max_events
+        self.events: list[dict] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **args) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        start_ns = time.time_ns()
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            event = {
+                "name": name,
+                "cat": "agent",
+                "ph": "X",
+                "ts": start_ns // 1000,
+                "dur": (time.perf_counter_ns() - start) // 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+            }
+            if args:
+                event["args"] = {
+                    key: value if isinstance(value, (int, float, bool)) else str(value)
+                    for key, value in args.items()
+                }
+            with self._lock:
+                if len(self.events) < self.max_events:
+                    self.events.append(event)
+
+    def export(self, path: str | Path) -> Path:
+        """Writes the spans recorded so far as a Chrome trace file."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            events = list(self.events)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return path
+
+
+TRACER = Tracer(enabled=False)
+
+
+def span(name: str, **args):
+    """Times the enclosed block as the stage `name` on the global tracer."""
+    return TRACER.span(name, **args)
+
+
+def traced(name: str) -> Callable:
+    """Decorator: times every call of the function as the stage `name`."""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with TRACER.span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def enable_tracing(trace_dir: str | Path = TRACE_DIR) -> None:
+    """Starts recording spans; they are written to `trace_dir` when the process exits. An empty
+    `trace_dir` keeps tracing off."""
+    if not trace_dir or TRACER.enabled:
+        return
+    TRACER.enabled = True
+
+    def export() -> None:
+        if TRACER.events:
+            TRACER.export(
+                Path(trace_dir) / datetime.now().strftime(f"trace_%Y%m%d_%H%M%S_{os.getpid()}.json")
+            )
+
+    atexit.register(export)
+
+
+def load_spans(paths: list[str | Path]) -> dict[str, list[float]]:
+    """Durations in milliseconds by stage, from trace files or directories of them."""
+    files = []
+    for path in map(Path, paths):
+        files += sorted(path.glob("*.json")) if path.is_dir() else [path]
+    durations = defaultdict(list)
+    for file in files:
+        with open(file) as f:
+            data = json.load(f)
+        for event in data["traceEvents"] if isinstance(data, dict) else data:
+            if event.get("ph") == "X":
+                durations[event["name"]].append(event["dur"] / 1000)
+    return dict(durations)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """The q-th percentile, interpolated linearly between the closest ranks like numpy does."""
+    values = sorted(values)
+    rank = (len(values) - 1) * q / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+
+def summarize(durations: dict[str, list[float]]) -> list[dict]:
+    """Count, p50, p95, p99, max and total (ms) of every stage, most total time first."""
+    rows = [
+        {
+            "stage": stage,
+            "count": len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": max(values),
+            "total": sum(values),
+        }
+        for stage, values in durations.items()
+    ]
+    return sorted(rows, key=lambda row: row["total"], reverse=True)
+
+
+def format_summary(rows: list[dict]) -> str:
+    width = max([len("stage")] + [len(row["stage"]) for row in rows])
+    lines = [
+        f"{'stage':<{width}} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+        f"{'max ms':>9} {'total s':>9}"
+    ]
+    for row in rows:
+        lines.append(
+            f"{row['stage']:<{width}} {row['count']:>6} {row['p50']:>9.1f} {row['p95']:>9.1f} "
+            f"{row['p99']:>9.1f} {row['max']:>9.1f} {row['total'] / 1000:>9.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Latency percentiles per stage across trace files")
+    parser.add_argument(
+        "paths", nargs="*", default=[TRACE_DIR or "traces"], help="trace files or directories"
+    )
+    args = parser.parse_args()
+    missing = [path for path in args.paths if not Path(path).exists()]
+    if missing:
+        parser.error(f"no such file or directory: {', '.join(missing)}")
+    durations = load_spans(args.paths)
+    if not durations:
+        print("No spans found.")
+        return
+    print(format_summary(summarize(durations)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,39 @@
 import base64
-from datetime import datetime
+import functools
 import io
 import os
 import re
 from PIL import Image
-import anthropic
 import base64
 import io
-import cv2
 import numpy as np
-import matplotlib.pyplot as plt
-import random
 
-from matplotlib import pyplot as plt
-from matplotlib.patches import Rectangle
-from segment_anything import SamAutomaticMaskGenerator, sam_model_registry
 import json
 from pathlib import Path
 import pdb
 import re
 import time
 from typing import Annotated, Any, Callable, Literal
-from litellm import completion
 import os
 from dotenv import load_dotenv
 from playwright.sync_api import Page, sync_playwright
 from termcolor import colored
 
-from src.utils import convert_function_to_openai_tool, create_user_message, encode_image, make_screenshot
+from src.annotator import draw_rectangles_and_numbers
+from src.image_pool import ImagePool
+from src.mask_postprocessing import place_labels, suppress_masks
+from src.segmenter import Segmenter, get_segmenter
+from src.segmentation_cache import SEGMENTATION_CACHE
+from src.speculative import SpeculativeSegmentation
+from src.tracing import span, traced
+from src.zoom import Region, RenderedRegion, draw_grid, draw_labels, labels_in_region, render_region
 
-# Replace with your actual API key
-client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+@functools.lru_cache(maxsize=None)
+def get_anthropic_client():
+    # created on first use: importing this module must not load the SDK or need an API key
+    import anthropic
+
+    return anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
 
 def extract_description(text):
     match = re.search(r'DESCRIPTION:\s*(.*)', text)
@@ -40,17 +43,25 @@ def extract_result(text):
     match = re.search(r'(?<=RESULT: )\d+', text)
     return int(match.group()) if match else None
 
+@traced("target_model")
 def prompt_claude_with_images(images, prompt, max_tokens=250):
     print(f"""Prompt: 
           {prompt}
           """)
+    import anthropic
+
     try:
         image_contents = []
         for image in images:
-            # Convert the image to base64
-            buffered = io.BytesIO()
-            image.save(buffered, format="PNG")
-            img_str = base64.b64encode(buffered.getvalue()).decode()
+            # Convert the image to base64; PNG bytes (e.g. from draw_rectangles_and_numbers) are
+            # sent as they are
+            if isinstance(image, bytes):
+                png_bytes = image
+            else:
+                buffered = io.BytesIO()
+                image.save(buffered, format="PNG")
+                png_bytes = buffered.getvalue()
+            img_str = base64.b64encode(png_bytes).decode()
 
             image_contents.append({
                 "type": "image",
@@ -61,7 +72,7 @@ def prompt_claude_with_images(images, prompt, max_tokens=250):
                 }
             })
 
-        message = client.messages.create(
+        message = get_anthropic_client().messages.create(
             model="claude-3-5-sonnet-20240620",
             max_tokens=max_tokens,
             messages=[
@@ -87,47 +98,13 @@ def prompt_claude_with_images(images, prompt, max_tokens=250):
     print(f"Response content: {message.content[0].text}")
     return message.content[0].text
 
-def add_rectangles_and_numbers_to_image(masks, coordinates):
-    if len(masks) == 0:
-        return
-    
-    sorted_masks = sorted(masks, key=(lambda x: x['area']), reverse=True)
-    ax = plt.gca()
-    ax.set_autoscale_on(False)
-
-    for i, mask in enumerate(sorted_masks, 1):
-        bbox = mask['bbox']
-        rect = Rectangle((bbox[0], bbox[1]), bbox[2], bbox[3], 
-                         fill=False, edgecolor='red', linewidth=0.2)
-        ax.add_patch(rect)
-        
-        # Add number using pre-calculated positions
-        cx, cy = coordinates[i]['x'], coordinates[i]['y']
-        ax.text(cx, cy, str(i), color='red', fontsize=10, 
-                ha='center', va='center')
-
-def draw_rectangles_and_save_image(image_path, masks, coordinates):
-    image = Image.open(image_path)
-
-    plt.figure(figsize=(10,10))
-    plt.imshow(image)
-    add_rectangles_and_numbers_to_image(masks, coordinates)
-    plt.axis('off')
-
-    current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f'ressources/output/segmented_image_boxes_{current_time}.png'
-    plt.savefig(filename, bbox_inches='tight', pad_inches=0, dpi=300)
-    return filename
-
-
-def ask_for_target_coordinates_for_segmented_image(segmented_image_path, task, coordinates):
+def ask_for_target_coordinates_for_segmented_image(segmented_image, task, coordinates):
     start_prompt = f"""Describe the image in a few short sentences. Your goal is to solve the following task: {task}. 
     Where do you have to click next to solve the task? Explain your reasoning. 
     Return a description of the location you have to click next. End with: DESCRIPTION: <description>."""
 
     print("Start iterations:")
-    start_image = Image.open(segmented_image_path)
-    start_message = prompt_claude_with_images([start_image], start_prompt, max_tokens=600)
+    start_message = prompt_claude_with_images([segmented_image], start_prompt, max_tokens=600)
     print(start_message)
     target_location_description = extract_description(start_message)
 
@@ -139,57 +116,140 @@ def ask_for_target_coordinates_for_segmented_image(segmented_image_path, task, c
     at the end of your reasoning in the format: RESULT: <number>. 
     If you are not sure, return the number 0."""
 
-    first_message = prompt_claude_with_images([start_image], prompt)
+    first_message = prompt_claude_with_images([segmented_image], prompt)
     first_result = extract_result(first_message)
     print(first_result)
-    start_image.show()
-    return coordinates[first_result]
+    # None for 0 (not sure) or a number that is not on the image
+    return coordinates.get(first_result)
 
-def segment_image(image_path):
-    sam = sam_model_registry["vit_h"](checkpoint="ressources/sam_vit_h_4b8939.pth")
+ZOOM_GRID_ROWS, ZOOM_GRID_COLS = 3, 3
+ZOOM_COARSE_SIDE = 512  # longer side of the downscaled screenshot in the first pass
+ZOOM_FINE_SIDE = 768  # longer side of the cropped, upscaled region in later passes
+# a chosen cell is grown by this share, so elements on a cell border are not cut off
+ZOOM_MARGIN = 0.15
+ZOOM_MAX_LABELS = 20  # zoom in further while more labels than this are in the region
+ZOOM_MAX_PASSES = 3
 
-    image = cv2.imread(image_path)
-    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-
-    # Initialize SAM
-    mask_generator = SamAutomaticMaskGenerator(
-        sam,
-        points_per_side=15,  # Higher: more detail but slower; Lower: faster but may miss small objects
-        pred_iou_thresh=0.8,  # Higher: better quality masks but fewer; Lower: more masks but lower quality
-        stability_score_thresh=0.5,  # Higher: more stable masks but fewer; Lower: more masks but less stable
-        crop_n_layers=0,  # More layers help with large images; 0 for no cropping
-        crop_n_points_downscale_factor=10,  # Higher: faster for crops but less detail; Lower: more detailed crops
-        min_mask_region_area=130,  # Higher: removes small segments; Lower: keeps small details but may add noise
+def ask_for_grid_cell(rendered: RenderedRegion, task, zoomed_in):
+    prompt = f"""Your goal is to solve the following task: {task}.
+    The image shows {"a zoomed-in part of " if zoomed_in else ""}a webpage, overlayed with a blue grid of numbered cells.
+    Briefly describe where you have to click next to solve the task and which grid cell contains that location.
+    Return the number of that grid cell at the end of your reasoning in the format: RESULT: <number>.
+    If you are not sure, return the number 0."""
+    message = prompt_claude_with_images(
+        [draw_grid(rendered, ZOOM_GRID_ROWS, ZOOM_GRID_COLS)], prompt
     )
-    masks = mask_generator.generate(image)
-    return masks
+    return extract_result(message or "")
+
+def ask_for_label(rendered: RenderedRegion, task, masks, coordinates, numbers):
+    prompt = f"""Your goal is to solve the following task: {task}.
+    The image shows a zoomed-in part of a webpage. UI elements are marked with red boxes and red numbers.
+    Briefly explain which UI element you have to click next to solve the task.
+    Return its number at the end of your reasoning in the format: RESULT: <number>.
+    If none of the UI elements fits, return the number 0."""
+    message = prompt_claude_with_images(
+        [draw_labels(rendered, masks, coordinates, numbers)], prompt
+    )
+    return extract_result(message or "")
+
+@traced("zoom")
+def zoom_to_target(image, task, masks, coordinates):
+    """Coarse-to-fine targeting (see src/zoom.py): returns the page coordinates to click, or None.
+
+    The first pass picks a grid cell on a downscaled screenshot. Further passes zoom into the chosen
+    cell until it contains at most ZOOM_MAX_LABELS labels, then the model picks one of them. If the
+    model answers 0 (not sure) or a number it was not offered, there is no target and None is
+    returned; only a region without any labels is clicked in its centre."""
+    bounds = Region.of_image(image)
+    region = bounds
+    for zoom_pass in range(ZOOM_MAX_PASSES):
+        numbers = labels_in_region(coordinates, region)
+        if zoom_pass > 0 and len(numbers) <= ZOOM_MAX_LABELS:
+            break
+        rendered = render_region(
+            image, region, ZOOM_COARSE_SIDE if zoom_pass == 0 else ZOOM_FINE_SIDE
+        )
+        cell = ask_for_grid_cell(rendered, task, zoomed_in=zoom_pass > 0)
+        print(f"Zoom pass {zoom_pass + 1}: grid cell {cell}")
+        if not cell or cell > ZOOM_GRID_ROWS * ZOOM_GRID_COLS:
+            return None  # the model does not see the target
+        region = region.cell(cell, ZOOM_GRID_ROWS, ZOOM_GRID_COLS).expand(ZOOM_MARGIN, bounds)
+
+    numbers = labels_in_region(coordinates, region)
+    if numbers:
+        number = ask_for_label(
+            render_region(image, region, ZOOM_FINE_SIDE), task, masks, coordinates, numbers
+        )
+        print(f"Zoomed-in label: {number}")
+        return coordinates[number] if number in numbers else None
+    return dict(zip("xy", region.center))
+
+def load_rgb_image(image_path):
+    import cv2
+
+    image = cv2.imread(image_path)
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+def segment_image(image_path, segmenter: Segmenter | None = None):
+    image = load_rgb_image(image_path)
+    return (segmenter or get_segmenter()).segment(image)
 
 def calculate_number_positions(anns):
-    if len(anns) == 0:
-        return {}
-    
-    sorted_anns = sorted(anns, key=(lambda x: x['area']), reverse=True)
-    positions = {}
-    
-    for i, ann in enumerate(sorted_anns, 1):
-        bbox = ann['bbox']
-        random_divisor_x = random.uniform(1, 6)
-        random_divisor_y = random.uniform(3, 6)
-        cx = int(bbox[0] + bbox[2] / random_divisor_x)
-        cy = int(bbox[1] + bbox[3] / random_divisor_y)
-        positions[i] = {'x': cx, 'y': cy}
-    
-    return positions
+    # numbers go to fixed spots inside their boxes, without overlapping each other
+    # (see src/mask_postprocessing.py)
+    return place_labels(anns)
+
+@traced("segmentation")
+def segment_image_with_positions(
+    image, segmenter: Segmenter | None = None, pool: ImagePool | None = None
+):
+    """Masks and number positions of an RGB screenshot, reused from SEGMENTATION_CACHE for
+    (nearly) identical screenshots.
+
+    With a `pool`, the segmentation runs in one of its worker processes."""
+    segmenter = segmenter or get_segmenter()
+    cached = SEGMENTATION_CACHE.get(image, variant=segmenter.name)
+    if cached is not None:
+        print("Reusing the segmentation of an identical screenshot...")
+        return cached.masks, cached.positions
+
+    print(f"Segmenting image with the {segmenter.name} segmenter...")
+    if pool is not None:
+        masks, coordinates = pool.segment(image, segmenter.name).result()
+    else:
+        masks = suppress_masks(segmenter.segment(image), image.shape)
+        coordinates = calculate_number_positions(masks)
+    SEGMENTATION_CACHE.put(image, masks, coordinates, variant=segmenter.name)
+    return masks, coordinates
 
-def find_target_coordinates_for_image(image_path, task):
-    print("Segmenting image (this may take a while)...")
-    masks = segment_image(image_path)
+@traced("find_target")
+def find_target_coordinates_for_image(
+    image_path,
+    task,
+    segmenter: Segmenter | None = None,
+    zoom: bool = True,
+    speculative: SpeculativeSegmentation | None = None,
+    pool: ImagePool | None = None,
+):
+    """With a `pool`, segmenting and drawing the overlay run in its worker processes."""
+    if speculative is not None:
+        # usually already segmented in the background while the model was choosing the click
+        with span("segmentation_wait"):
+            image, masks, coordinates = speculative.result(image_path)
+    else:
+        image = load_rgb_image(image_path)
+        masks, coordinates = segment_image_with_positions(image, segmenter, pool=pool)
+    if zoom:
+        print("Zooming in on the target...")
+        return zoom_to_target(image, task, masks, coordinates)
     print("Drawing segments and numbers...")
-    coordinates = calculate_number_positions(masks)
-    segmented_image_path = draw_rectangles_and_save_image(image_path, masks, coordinates)
+    with span("annotate"):
+        if pool is not None:
+            segmented_image = pool.annotate(image, masks, coordinates).result()
+        else:
+            segmented_image = draw_rectangles_and_numbers(image, masks, coordinates)
     print("Asking for target coordinates...")
-    task = "Book the field P2 at 17:00pm."
-    result = ask_for_target_coordinates_for_segmented_image(segmented_image_path, task, coordinates)
+    result = ask_for_target_coordinates_for_segmented_image(segmented_image, task, coordinates)
     return result
 
 
@@ -1,4 +1,9 @@
+# Provider SDKs (litellm, openai, google.generativeai), requests, yaml and PIL are imported
+# where they are used, so that importing this module stays fast and does no network set-up.
+from __future__ import annotations
+
 import base64
+import functools
 import json
 import logging
 import os
@@ -7,7 +12,6 @@ import re
 import typing
 from dataclasses import dataclass
 from datetime import datetime
-from enum import Enum
 from pathlib import Path
 from typing import (
     Annotated,
@@ -20,21 +24,24 @@ from typing import (
     get_type_hints,
 )
 
-import google.generativeai as genai
-from litellm import completion
-import requests
-import vertexai
-import yaml
-from openai.types.chat import ChatCompletion
-from PIL import Image
-from playwright.sync_api import Page
 from termcolor import colored
-from vertexai.generative_models import GenerativeModel, Part
+
+from src.json_repair import extract_json, parse_json
+from src.prompt_templates import MAX_PROMPT_TOKENS, check_prompt
+from src.run_log import log_call, setup_run_logger
+from src.tools import compile_tool, provider_schema
+from src.tracing import traced
+
+if typing.TYPE_CHECKING:
+    from openai.types.chat import ChatCompletion
+    from playwright.sync_api import Page
 
 
 def get_next_screenshot_number(screenshot_dir: Path) -> str:
-    """Gets the next screenshot number, given 00.jpg, 01.jpg, 02.jpg, ..."""
-    screenshots = [Path(file).stem for file in os.listdir(screenshot_dir)]
+    """Gets the next screenshot number, given 00.jpg, 01.jpg, 02.jpg, ...
+
+    Subdirectories (e.g. the per-task directories of the daemon) are ignored."""
+    screenshots = [path.stem for path in Path(screenshot_dir).iterdir() if path.is_file()]
     if not screenshots:
         return "00"
     try:
@@ -47,18 +54,22 @@ def get_next_screenshot_number(screenshot_dir: Path) -> str:
     return f"{next_number:02d}"
 
 
+@traced("screenshot")
 def make_screenshot(page: Page, screenshot_dir: Path) -> Path:
     """Makes a screenshot of the current page and stores it in SCREENSHOT_DIRECTORY."""
     img_path = Path(
         screenshot_dir,
         get_next_screenshot_number(screenshot_dir=screenshot_dir) + ".jpeg",
     )
-    page.screenshot(path=img_path, type="jpeg")
+    # scale="css" keeps the image at viewport size, independent of the device scale factor
+    page.screenshot(path=img_path, type="jpeg", scale="css")
     print(colored(f"\n<< screenshot saved to {img_path} >>\n", color="light_grey"))
     return img_path
 
 
 def compress_image(image_path: str | Path) -> None:
+    from PIL import Image
+
     with Image.open(image_path) as img:
         max_size = (
             900,
@@ -73,21 +84,6 @@ def encode_image(image_path):
         return base64.b64encode(image_file.read()).decode("utf-8")
 
 
-def create_user_message(prompt: str | None, image_paths: list[Path] | None) -> dict:
-    content = []
-    if prompt:
-        content += [{"type": "text", "text": prompt}]
-    if image_paths:
-        content += [
-            {
-                "type": "image_url",
-                "image_url": {"url": f"data:image/jpeg;base64,{encode_image(img_path)}"},
-            }
-            for img_path in image_paths
-        ]
-    return {"role": "user", "content": content}
-
-
 def create_payload(user_message: dict, max_tokens: int = 300) -> dict:
     return {
         "model": "gpt-4o",
@@ -100,6 +96,8 @@ def get_openai_response(
     api_key: str,
     payload: dict,
 ) -> dict:
+    import requests
+
     headers = {"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"}
     response = requests.post(
         "https://api.openai.com/v1/chat/completions", headers=headers, json=payload
@@ -109,10 +107,10 @@ def get_openai_response(
 
 def get_openai_response_text(openai_response: dict | ChatCompletion) -> str:
     try:
-        if isinstance(openai_response, ChatCompletion):
-            return openai_response.choices[0].message.content
-        else:
+        if isinstance(openai_response, dict):
             return openai_response["choices"][0]["message"]["content"]
+        else:
+            return openai_response.choices[0].message.content
     except:
         raise ValueError("Could not extract response text from OpenAI response", openai_response)
 
@@ -165,19 +163,8 @@ def parse_actor_response(text: str) -> tuple[str, str]:
 
 
 def setup_logger():
-    if not os.path.exists("logs"):
-        os.makedirs("logs")
-    logger = logging.getLogger(__name__)
-    logger.setLevel(logging.INFO)
-    log_filename = datetime.now().strftime("logs/application_%Y%m%d_%H%M%S.log")
-    file_handler = logging.FileHandler(log_filename)
-    file_handler.setLevel(logging.INFO)
-    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    return logger
+    """The structured run logger (see src/run_log.py); the same logger on every call."""
+    return setup_run_logger(log_dir="logs")
 
 
 def get_scroll_info(page) -> dict[str, int]:
@@ -205,7 +192,7 @@ def get_scroll_info(page) -> dict[str, int]:
 ToolArgument = dict["name":str, "type":str]
 
 
-@dataclass
+@dataclass(eq=False)  # compared by identity, so tool lists can key the prompt cache
 class Tool:
     name: str
     args: list[ToolArgument]
@@ -224,15 +211,35 @@ class Tool:
 # )
 
 
+def report_prompt_tokens(prompt: str, name: str, model: str = "gpt-4o") -> int:
+    """Counts the tokens of a prompt before it is sent. Raises PromptTooLong above the budget."""
+    n_tokens = check_prompt(prompt, max_tokens=MAX_PROMPT_TOKENS, model=model, name=name)
+    print(colored(f"\n<< {name}: {n_tokens} tokens >>\n", color="light_grey"))
+    return n_tokens
+
+
+@traced("observer")
 def get_gpt_observer_response(prompt: str, image_path: Path) -> str:
-    message = create_user_message(prompt=prompt, image_paths=[image_path])
+    report_prompt_tokens(prompt, name="observer prompt")
+    message = create_user_message(prompt=prompt, images_base64=[encode_image(image_path)])
     payload = create_payload(user_message=message)
     response = get_openai_response(os.getenv("OPENAI_API_KEY"), payload)
     response_text = get_openai_response_text(response)
     return response_text
 
 
+@functools.lru_cache(maxsize=None)
+def get_gemini_client():
+    """google.generativeai, imported and configured with GOOGLE_API_KEY on first use."""
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+    return genai
+
+
+@traced("observer")
 def get_gemini_observer_response(prompt: str, image_path: Path) -> str:
+    genai = get_gemini_client()
     image_file = genai.upload_file(path=image_path)
     model = genai.GenerativeModel(model_name="models/gemini-1.5-flash")
     response = model.generate_content([prompt, image_file], request_options={"timeout": 120})
@@ -243,19 +250,36 @@ def get_gemini_observer_response(prompt: str, image_path: Path) -> str:
         raise ValueError(f"{msg}\n {response.candidates.safety_ratings}")
 
 
-def get_gpt_actor_response(prompt: str, image_path: Path) -> str:
-    user_message = create_user_message(prompt=prompt, image_paths=[image_path])
+@traced("actor")
+def get_gpt_actor_response(prompt: str, image_path: Path | None) -> str:
+    """Asks the actor for the next action. Without an image, the actor runs text-only."""
+    report_prompt_tokens(prompt, name="actor prompt")
+    images_base64 = [encode_image(image_path)] if image_path is not None else None
+    user_message = create_user_message(prompt=prompt, images_base64=images_base64)
     payload = create_payload(user_message=user_message)
     response = get_openai_response(os.getenv("OPENAI_API_KEY"), payload)
     response_text = get_openai_response_text(response)
     return response_text
 
 
-def log_response(logger, agent_type: str, prompt: str, response_text: str) -> None:
-    logger.info(
-        f"\n====== {agent_type} ======\n == PROMPT ==\n{prompt}\n== RESPONSE ==\n{response_text}\n"
+def log_response(
+    logger,
+    agent_type: str,
+    prompt: str,
+    response_text: str,
+    model: str | None = None,
+    duration_s: float | None = None,
+    image_path: Path | None = None,
+) -> None:
+    log_call(
+        logger,
+        stage=agent_type,
+        prompt=prompt,
+        response=response_text,
+        model=model,
+        duration_s=duration_s,
+        images=[image_path] if image_path is not None else None,
     )
-    logger.info("-" * 80)
     print(
         f"\n====== {agent_type} ======\n == PROMPT ==\n{prompt}\n== RESPONSE ==\n{response_text}\n"
     )
@@ -264,6 +288,8 @@ def log_response(logger, agent_type: str, prompt: str, response_text: str) -> No
 
 def get_prompts(path: str | Path) -> dict:
     """Opens and loads 'prompts.yaml' file"""
+    import yaml
+
     with open(path, "r") as f:
         data = yaml.safe_load(f)
         return DotDict(data)
@@ -278,152 +304,16 @@ class DotDict(dict):
 
     def __getattr__(self, attr):
         value = self.get(attr)
-        if isinstance(value, dict):
-            return DotDict(value)
+        if isinstance(value, dict) and not isinstance(value, DotDict):
+            # wrap once and keep the wrapper, instead of allocating a new one on every access
+            value = self[attr] = DotDict(value)
         return value
 
 
-class OpenAIDataTypes(Enum):
-    """OpenAI uses https://json-schema.org/understanding-json-schema/reference/type"""
-    str = "string"
-    int = "integer"
-    float = "number"
-    bool = "boolean"
-    list = "array"
-    NoneType = "null"
-    object = "object"
-
-    def get_mapping():
-        return {dtype.name: dtype.value for dtype in OpenAIDataTypes}
-    
-
 def convert_function_to_openai_tool(func):
-    required = []
-
-    properties = {} 
-    type_hints = get_type_hints(func, include_extras=True)
-    for arg_name, type_hint in type_hints.items():
-
-        parameter = {}
-        description = None
-
-        # ignore return type if the function has any 
-        if arg_name == "return":
-            continue
-        
-        # Case: Annotated[..., ...]
-        if type_hint.__name__ == "Annotated":
-            description = type_hint.__metadata__[0]
-
-            # Case: Annotated[..., "IGNORE"]
-            if "IGNORE" in description:
-                continue
-            
-            # Case: Annotated[Optional[str], ...]
-            if type_hint.__origin__.__name__ == "Optional":
-                type_str = type_hint.__origin__.__args__[0].__name__
-
-                # Case: Annotated[Optional[Literal['a', 'b']]]
-                if type_str == "Literal":
-                    values = type_hint.__origin__.__args__[0].__args__
-                    # check if all values have the same type
-                    if not all([isinstance(value, type(values[0])) for value in values]):
-                        raise TypeError(f"Not all values of the Literal are of the same type, but must be: {values}")
-                    type_str = type(values[0]).__name__
-                    parameter["enum"] = list(values)
-
-            # Case: Annotated[Literal["a", "b"], ...]
-            elif type_hint.__origin__.__name__ == "Literal":
-                values = type_hint.__origin__.__args__[0].__args__
-                # check if all values have the same type
-                if not all([isinstance(value, type(values[0])) for value in values]):
-                    raise TypeError(f"Not all values of the Literal are of the same type, but must be: {values}")
-                type_str = type(values[0]).__name__
-                parameter["enum"] = list(values)
-                required.append(arg_name)
-
-            # Case: Annotated[str, ...]
-            else:
-                type_str = type_hint.__origin__.__name__
-                required.append(arg_name)
-
-        # Case: Literal["a", "b"]
-        elif type_hint.__name__ == "Literal":
-            values = type_hint.__args__
-            # check if all values have the same type
-            if not all([isinstance(value, type(values[0])) for value in values]):
-                raise TypeError(f"Not all values of the Literal are of the same type, but must be: {values}")
-            type_str = type(values[0]).__name__
-            parameter["enum"] = list(values)
-            required.append(arg_name) 
-
-        # Case: Optional[...]
-        elif type_hint.__name__ == "Optional":
-
-            # Case: Optional[Literal[...]]
-            if type_hint.__args__[0].__name__ == "Literal":
-                values = type_hint.__args__[0].__args__
-                # check if all values have the same type
-                if not all([isinstance(value, type(values[0])) for value in values]):
-                    raise TypeError(f"Not all values of the Literal are of the same type, but must be: {values}")
-                type_str = type(values[0]).__name__
-                parameter["enum"] = list(values)
-
-            # Case: Optional[str]
-            else:
-                type_str = type_hint.__args__[0].__name__
-        
-        # Case: str
-        else:
-            type_str = type_hint.__name__
-            required.append(arg_name)
-
-        if description:
-            # Case: Annotation[..., "IGNORE"]
-            if "IGNORE" in description:
-                continue
-            # Case: Annotation[..., ....]
-            parameter["description"] = description
-
-        try:
-            parameter["type"] = OpenAIDataTypes.get_mapping()[type_str]
-        except KeyError:
-            raise TypeError(f"Data type '{type_str}' of parameter '{arg_name}' is not a supported OpenAI data type!") 
-
-        properties[arg_name] = parameter
-    
-    tool_json = {
-        "name": func.__name__,
-        "description": func.__doc__,
-        "parameters": {
-            "type": "object",
-            "properties": {param_name: param_properties
-                           for param_name, param_properties in properties.items()},
-            "required": required, 
-        },
-    }
-    return tool_json
-
-
-import json
-import re
-
+    """The OpenAI function schema of a tool, compiled once per function (see src/tools.py)."""
+    return provider_schema(compile_tool(func), "openai")["function"]
 
-def extract_json(response) -> dict | None:
-    """Extracts the first valid JSON-like substring from a LLM response."""
-    # Find all JSON-like substrings
-    json_pattern = r'\{(?:[^{}]|(?R))*\}'
-    json_candidates = re.findall(json_pattern, response, re.DOTALL)
-    
-    # Try to parse each candidate
-    for candidate in json_candidates:
-        try:
-            return json.loads(candidate)
-        except json.JSONDecodeError:
-            continue
-    
-    # If no valid JSON found
-    return None
 
 def create_user_message(prompt: str | None, images_base64: list[str] | None = None) -> dict:
     content = []
@@ -446,7 +336,14 @@ def fix_json_regex(json_str: str) -> str:
     """Fixes JSON-like strings that are missing quotes around keys."""
     return re.sub(r'([a-zA-Z_][a-zA-Z0-9_]*):', r'"\1":', json_str)
 
-def extract_and_fix_json_llm_call(json_str: str) -> str:
+def extract_and_fix_json_llm_call(json_str: str) -> dict:
+    # most syntax issues are repaired locally; asking the model is the last resort
+    response_json = extract_json(json_str)
+    if response_json is not None:
+        return response_json
+
+    from litellm import completion
+
     prompt = f"""Here is a text that contains a JSON-like string:\n\n{json_str}\n\n Check if the JSON has any syntax issues and if so, fix them and return only the fixed JSON string."""
     response = completion(
         model="gpt-4o",
@@ -456,5 +353,5 @@ def extract_and_fix_json_llm_call(json_str: str) -> str:
         response_format={"type": "json_object"} # forces the LLM to return a JSON object
     )
     response_text = response.choices[0].message.content
-    response_json = json.loads(response_text)
+    response_json = parse_json(response_text)
     return response_json
\ No newline at end of file
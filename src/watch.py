@@ -0,0 +1,154 @@
+# Watches the booking grid for cancellations.
+#
+# Instead of a full agent run per poll, a warm page is reloaded on an interval
+# and the grid is re-extracted from the DOM (src/booking_grid.py). Snapshots are
+# stored compactly as one bitmask per court, so comparing two polls is a few
+# integer XORs, and an event is only emitted when slots change state. When
+# nothing changes, the polling interval backs off up to `max_interval`.
+#
+# Usage:
+#   python -m src.watch [--url https://safo.ebusy.de/lite-module/407] [--interval 30]
+import argparse
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterator
+
+from playwright.sync_api import Error as PlaywrightError
+from playwright.sync_api import Page, sync_playwright
+from termcolor import colored
+
+from src.booking_grid import BookingGrid, SlotStatus, extract_booking_grid_from_dom
+from src.browser import launch_browser
+from src.resource_policy import EBUSY_PROFILE, apply_resource_policy
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class GridSnapshot:
+    courts: tuple[str, ...]
+    slots: tuple[str, ...]
+    free_bits: tuple[int, ...]  # per court: bit i is set if slots[i] is free
+
+    @classmethod
+    def from_grid(cls, grid: BookingGrid) -> "GridSnapshot":
+        courts = tuple(grid.keys())
+        slots = tuple(sorted({slot for court_slots in grid.values() for slot in court_slots}))
+        free_bits = tuple(
+            sum(1 << i for i, slot in enumerate(slots) if grid[court].get(slot) == "free")
+            for court in courts
+        )
+        return cls(courts=courts, slots=slots, free_bits=free_bits)
+
+    def status(self, court: str, slot: str) -> SlotStatus | None:
+        if court not in self.courts or slot not in self.slots:
+            return None
+        bits = self.free_bits[self.courts.index(court)]
+        return "free" if bits >> self.slots.index(slot) & 1 else "booked"
+
+
+@dataclass(frozen=True)
+class SlotChange:
+    court: str
+    slot: str
+    old_status: SlotStatus | None
+    new_status: SlotStatus | None
+
+    def __str__(self):
+        return f"{self.court} {self.slot}: {self.old_status} -> {self.new_status}"
+
+
+def diff_snapshots(old: GridSnapshot, new: GridSnapshot) -> list[SlotChange]:
+    """Lists the slots whose status differs between two snapshots."""
+    if old == new:
+        return []
+    if old.courts == new.courts and old.slots == new.slots:
+        changes = []
+        for court, old_bits, new_bits in zip(new.courts, old.free_bits, new.free_bits):
+            changed = old_bits ^ new_bits
+            while changed:
+                i = changed.bit_length() - 1
+                changed ^= 1 << i
+                new_status = "free" if new_bits >> i & 1 else "booked"
+                old_status = "booked" if new_status == "free" else "free"
+                changes.append(SlotChange(court, new.slots[i], old_status, new_status))
+        return sorted(changes, key=lambda change: (change.court, change.slot))
+
+    # the grid itself changed (e.g. another day or a court was added); compare slot by slot
+    courts = sorted(set(old.courts) | set(new.courts))
+    slots = sorted(set(old.slots) | set(new.slots))
+    return [
+        SlotChange(court, slot, old.status(court, slot), new.status(court, slot))
+        for court in courts
+        for slot in slots
+        if old.status(court, slot) != new.status(court, slot)
+    ]
+
+
+def watch_availability(
+    page: Page,
+    interval: float = 30.0,
+    max_interval: float = 300.0,
+    backoff: float = 1.5,
+    reload: bool = True,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Iterator[list[SlotChange]]:
+    """Polls the booking grid of `page` and yields the changed slots whenever something changes.
+
+    The first snapshot is only used as reference. While the grid stays the same, the polling
+    interval grows by `backoff` up to `max_interval`; after a change it drops back to `interval`.
+    A poll that fails (navigation timeout, network error, no readable grid) is logged and backs
+    off the same way; the watch keeps going."""
+    previous = None
+    current_interval = interval
+    while True:
+        try:
+            grid = extract_booking_grid_from_dom(page)
+        except PlaywrightError as error:
+            logger.warning(f"could not read the booking grid: {error}")
+            grid = None
+        if grid is None:
+            current_interval = min(current_interval * backoff, max_interval)
+        else:
+            snapshot = GridSnapshot.from_grid(grid)
+            if previous is not None:
+                changes = diff_snapshots(previous, snapshot)
+                if changes:
+                    current_interval = interval
+                    yield changes
+                else:
+                    current_interval = min(current_interval * backoff, max_interval)
+            previous = snapshot
+        sleep(current_interval)
+        if reload:
+            try:
+                page.reload(wait_until="domcontentloaded")
+            except PlaywrightError as error:
+                logger.warning(f"could not reload the page: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="https://safo.ebusy.de/lite-module/407")
+    parser.add_argument("--interval", type=float, default=30.0)
+    parser.add_argument("--max-interval", type=float, default=300.0)
+    args = parser.parse_args()
+
+    with sync_playwright() as p:
+        browser = launch_browser(p, headless=True)
+        apply_resource_policy(browser, EBUSY_PROFILE)
+        page = browser.new_page()
+        page.goto(args.url)
+        print(colored(f"\n<< watching {args.url} >>\n", color="light_grey"))
+        for changes in watch_availability(
+            page, interval=args.interval, max_interval=args.max_interval
+        ):
+            for change in changes:
+                color = "green" if change.new_status == "free" else "red"
+                print(colored(f"{datetime.now():%H:%M:%S} {change}", color=color))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# Coarse-to-fine targeting: find the element to click in a few small images
+# instead of one large annotated screenshot.
+#
+# The first pass shows the model a downscaled screenshot with a coarse grid of
+# numbered cells and asks for the cell that contains the target. Every further
+# pass shows only that cell (plus a margin), cropped from the full-resolution
+# screenshot and upscaled. Once a region contains few enough segmented
+# elements, their boxes and numbers are drawn into the crop and the model
+# picks one. A Region is always in page (screenshot) coordinates, so the
+# answer of every pass maps straight back to where to click.
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from src.annotator import LABEL_FONT_SIZE, draw_numbered_boxes, to_png
+
+GRID_COLOR = (0, 90, 255)
+GRID_FONT_SIZE = 28
+
+
+@dataclass(frozen=True)
+class Region:
+    x: float
+    y: float
+    width: float
+    height: float
+
+    @classmethod
+    def of_image(cls, image: np.ndarray | Image.Image) -> "Region":
+        width, height = (
+            image.size if isinstance(image, Image.Image) else (image.shape[1], image.shape[0])
+        )
+        return cls(0, 0, width, height)
+
+    @property
+    def center(self) -> tuple[int, int]:
+        return int(round(self.x + self.width / 2)), int(round(self.y + self.height / 2))
+
+    def cell(self, number: int, rows: int, cols: int) -> "Region":
+        """The `number`-th grid cell, counted from 1 row by row."""
+        if not 1 <= number <= rows * cols:
+            raise ValueError(f"There is no grid cell {number}. Available cells: 1-{rows * cols}")
+        row, col = divmod(number - 1, cols)
+        width, height = self.width / cols, self.height / rows
+        return Region(self.x + col * width, self.y + row * height, width, height)
+
+    def expand(self, margin: float, bounds: "Region") -> "Region":
+        """Grows the region by `margin` of its size on every side, clipped to `bounds`."""
+        x1 = max(self.x - margin * self.width, bounds.x)
+        y1 = max(self.y - margin * self.height, bounds.y)
+        x2 = min(self.x + (1 + margin) * self.width, bounds.x + bounds.width)
+        y2 = min(self.y + (1 + margin) * self.height, bounds.y + bounds.height)
+        return Region(x1, y1, x2 - x1, y2 - y1)
+
+    def contains(self, x: float, y: float) -> bool:
+        return self.x <= x <= self.x + self.width and self.y <= y <= self.y + self.height
+
+
+@dataclass(frozen=True)
+class RenderedRegion:
+    region: Region
+    image: Image.Image
+    scale: float  # rendered pixels per page pixel
+
+    def to_image(self, x: float, y: float) -> tuple[float, float]:
+        return (x - self.region.x) * self.scale, (y - self.region.y) * self.scale
+
+    def to_page(self, x: float, y: float) -> tuple[int, int]:
+        return int(round(self.region.x + x / self.scale)), int(
+            round(self.region.y + y / self.scale)
+        )
+
+
+def render_region(image: np.ndarray | Image.Image, region: Region, max_side: int) -> RenderedRegion:
+    """Crops `region` from the screenshot and scales its longer side to `max_side` pixels."""
+    source = Image.fromarray(image) if isinstance(image, np.ndarray) else image.convert("RGB")
+    crop = source.crop(
+        (
+            int(region.x),
+            int(region.y),
+            int(round(region.x + region.width)),
+            int(round(region.y + region.height)),
+        )
+    )
+    scale = max_side / max(region.width, region.height)
+    size = (max(int(round(region.width * scale)), 1), max(int(round(region.height * scale)), 1))
+    resample = Image.Resampling.LANCZOS if scale < 1 else Image.Resampling.BICUBIC
+    return RenderedRegion(region=region, image=crop.resize(size, resample), scale=scale)
+
+
+def draw_grid(rendered: RenderedRegion, rows: int, cols: int) -> bytes:
+    """Draws a grid of numbered cells over the rendered region and returns PNG bytes."""
+    canvas = rendered.image.copy()
+    draw = ImageDraw.Draw(canvas)
+    font = ImageFont.load_default(size=GRID_FONT_SIZE)
+    width, height = canvas.size
+    for col in range(1, cols):
+        draw.line((col * width / cols, 0, col * width / cols, height), fill=GRID_COLOR, width=2)
+    for row in range(1, rows):
+        draw.line((0, row * height / rows, width, row * height / rows), fill=GRID_COLOR, width=2)
+    for number in range(1, rows * cols + 1):
+        row, col = divmod(number - 1, cols)
+        center = ((col + 0.5) * width / cols, (row + 0.5) * height / rows)
+        draw.text(
+            center,
+            str(number),
+            fill=GRID_COLOR,
+            font=font,
+            anchor="mm",
+            stroke_width=3,
+            stroke_fill=(255, 255, 255),
+        )
+    return to_png(canvas)
+
+
+def labels_in_region(coordinates: dict[int, dict[str, int]], region: Region) -> list[int]:
+    """Numbers of the labels whose anchor lies inside `region`."""
+    return [
+        number
+        for number, anchor in coordinates.items()
+        if region.contains(anchor["x"], anchor["y"])
+    ]
+
+
+def draw_labels(
+    rendered: RenderedRegion,
+    masks: list[dict],
+    coordinates: dict[int, dict[str, int]],
+    numbers: list[int],
+) -> bytes:
+    """Draws the boxes and numbers of the labels `numbers` into the rendered region and returns PNG
+    bytes.
+
+    `masks` and `coordinates` are numbered as in `calculate_number_positions` (by decreasing area
+    from 1).
+    """
+    sorted_masks = sorted(masks, key=(lambda x: x["area"]), reverse=True)
+    boxes = {}
+    for number in numbers:
+        x, y, w, h = sorted_masks[number - 1]["bbox"]
+        left, top = rendered.to_image(x, y)
+        boxes[number] = (left, top, w * rendered.scale, h * rendered.scale)
+    canvas = rendered.image.copy()
+    draw_numbered_boxes(
+        canvas,
+        boxes=boxes,
+        anchors={
+            number: rendered.to_image(coordinates[number]["x"], coordinates[number]["y"])
+            for number in numbers
+        },
+        font_size=max(LABEL_FONT_SIZE, int(LABEL_FONT_SIZE * min(rendered.scale, 2))),
+    )
+    return to_png(canvas)
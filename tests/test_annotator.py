@@ -0,0 +1,27 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from src.annotator import LABEL_COLOR, draw_rectangles_and_numbers
+
+
+def test_draws_at_native_resolution_without_touching_the_input():
+    screenshot = np.full((800, 760, 3), 200, dtype=np.uint8)
+    masks = [
+        {"bbox": [10, 10, 100, 50], "area": 5000},
+        {"bbox": [300, 400, 40, 20], "area": 800},
+    ]
+    coordinates = {1: {"x": 40, "y": 30}, 2: {"x": 320, "y": 410}}
+
+    png = draw_rectangles_and_numbers(screenshot, masks, coordinates)
+
+    annotated = np.asarray(Image.open(io.BytesIO(png)).convert("RGB"))
+    assert annotated.shape == screenshot.shape
+    assert (screenshot == 200).all()
+    # box outlines of both masks
+    assert tuple(annotated[10, 60]) == LABEL_COLOR
+    assert tuple(annotated[420, 300]) == LABEL_COLOR
+    # the number of the first mask is drawn around its position
+    number_area = annotated[22:38, 34:46].astype(int)
+    assert ((number_area[..., 0] > 200) & (number_area[..., 1] < 100)).any()
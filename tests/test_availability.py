@@ -0,0 +1,83 @@
+import json
+from pathlib import Path
+
+from src.availability import AvailabilityIndex, FreeRun, format_free_runs, format_time
+
+actual_bookings_800x800 = json.loads(Path("tests/data/booking_800x800.json").read_text())
+index = AvailabilityIndex.from_grid(actual_bookings_800x800)
+
+
+def test_free_intervals_are_merged():
+    grid = {
+        "Platz 1": {
+            "17:00-17:30": "free",
+            "17:30-18:00": "free",
+            "18:00-18:30": "booked",
+            "18:30-19:00": "free",
+        }
+    }
+    assert AvailabilityIndex.from_grid(grid).free_intervals == {
+        "Platz 1": [(1020, 1080), (1110, 1140)]
+    }
+
+
+def test_find_free_runs():
+    # "Which courts are free for 1 hour between 17:00 and 19:00?"
+    assert index.find_free_runs(60, "17:00", "19:00") == []
+    assert index.find_free_runs(30, "17:00", "19:00") == [FreeRun("Platz 2", 1050, 1080)]
+    assert [str(run) for run in index.find_free_runs(30, "21:00", "22:00")] == [
+        "Platz 1: 21:30-22:00",
+        "Platz 2: 21:30-22:00",
+        "Platz 3: 21:30-22:00",
+    ]
+
+
+def test_runs_are_clipped_to_window():
+    grid = {
+        "Platz 1": {f"{h}:00-{h}:30": "free" for h in range(16, 22)}
+        | {f"{h}:30-{h + 1}:00": "free" for h in range(16, 22)}
+    }
+    assert AvailabilityIndex.from_grid(grid).find_free_runs(60, "17:00", "19:00") == [
+        FreeRun("Platz 1", 1020, 1140)
+    ]
+
+
+def test_is_free():
+    assert index.is_free("Platz 2", "17:30", "18:00")
+    assert not index.is_free("Platz 2", "17:30", "18:30")
+    assert not index.is_free("Platz 9", "17:30", "18:00")
+
+
+def test_format_free_runs():
+    runs = index.find_free_runs(30, "17:00", "19:00")
+    assert (
+        format_free_runs(runs, index.courts)
+        == "Platz 1:\nNone\n\nPlatz 2:\n- 17:30-18:00\n\nPlatz 3:\nNone"
+    )
+
+
+def test_query_skips_intervals_before_the_window():
+    # a day of alternating free and booked half hours: 24 free intervals on one court
+    grid = {
+        "Platz 1": {
+            format_time(start)
+            + "-"
+            + format_time(start + 30): "free" if start % 60 == 0 else "booked"
+            for start in range(0, 24 * 60, 30)
+        }
+    }
+    day = AvailabilityIndex.from_grid(grid)
+    assert len(day.free_intervals["Platz 1"]) == 24
+
+    class RecordingList(list):
+        def __getitem__(self, key):
+            if isinstance(key, slice):
+                visited.append(key.start)
+            return super().__getitem__(key)
+
+    visited = []
+    day.free_intervals["Platz 1"] = RecordingList(day.free_intervals["Platz 1"])
+    assert day.find_free_runs(30, "21:15", "23:00") == [FreeRun("Platz 1", 1320, 1350)]
+    # the scan starts at the interval 21:00-21:30, the last one starting before the window,
+    # not at 00:00
+    assert visited == [21]
@@ -0,0 +1,135 @@
+import json
+import time
+from pathlib import Path
+
+import jsonschema
+import pytest
+
+from src.booking_grid import (
+    BOOKING_GRID_SCHEMA,
+    FREE_SLOTS_SCHEMA,
+    booking_grid_from_answer,
+    classify_cell,
+    extract_booking_grid_from_dom,
+    free_slots,
+    free_slots_from_answer,
+    parse_booking_grid,
+)
+
+replica_path = Path("tests/data/booking_800x800.html")
+actual_bookings_800x800 = json.loads(Path("tests/data/booking_800x800.json").read_text())
+
+expected_output = {
+    "Platz 1": ["21:30-22:00"],
+    "Platz 2": ["17:30-18:00", "21:30-22:00"],
+    "Platz 3": ["21:30-22:00"],
+}
+
+
+def booked(text="Belegt"):
+    return {"text": text, "className": "booked", "title": ""}
+
+
+def free(text="BUCHEN"):
+    return {"text": text, "className": "free", "title": ""}
+
+
+def test_classify_cell():
+    assert classify_cell(free()) == "free"
+    assert classify_cell({"text": "", "className": "slot bookable", "title": ""}) == "free"
+    assert classify_cell(booked()) == "booked"
+    assert classify_cell(booked("Medenspiel")) == "booked"
+    assert classify_cell(None) == "booked"
+
+
+def test_parse_booking_grid_with_start_times_only():
+    raw = {
+        "courts": ["P1", "P2"],
+        "rows": [
+            {"time": "17:00", "cells": [booked(), free()]},
+            {"time": "17:30", "cells": [free(), booked()]},
+        ],
+    }
+    assert parse_booking_grid(raw) == {
+        "Platz 1": {"17:00-17:30": "booked", "17:30-18:00": "free"},
+        "Platz 2": {"17:00-17:30": "free", "17:30-18:00": "booked"},
+    }
+
+
+def test_parse_booking_grid_with_time_ranges():
+    raw = {
+        "courts": ["Platz 3"],
+        "rows": [{"time": "8:30 - 9:00", "cells": [free()]}],
+    }
+    assert parse_booking_grid(raw) == {"Platz 3": {"08:30-09:00": "free"}}
+
+
+def test_parse_booking_grid_without_table():
+    assert parse_booking_grid(None) is None
+    assert parse_booking_grid({"courts": [], "rows": []}) is None
+
+
+@pytest.fixture(scope="module")
+def replica_page():
+    sync_api = pytest.importorskip("playwright.sync_api")
+    with sync_api.sync_playwright() as p:
+        try:
+            browser = p.chromium.launch(headless=True)
+        except sync_api.Error as error:
+            pytest.skip(f"Chromium is not available: {error}")
+        page = browser.new_page(viewport={"width": 800, "height": 800})
+        page.goto(replica_path.resolve().as_uri())
+        yield page
+        browser.close()
+
+
+def test_extract_booking_grid_from_replica(replica_page):
+    start = time.perf_counter()
+    grid = extract_booking_grid_from_dom(replica_page)
+    print(f"DOM extraction took {(time.perf_counter() - start) * 1000:.1f} ms")
+    assert grid == actual_bookings_800x800
+    assert free_slots(grid) == expected_output
+
+
+def test_structured_output_answers():
+    answer = {
+        "courts": [
+            {"court": "P1", "free_slots": ["21:30-22:00"]},
+            {"court": "Platz 2", "free_slots": ["21:30-22:00", "17:30-18:00"]},
+            {"court": "Platz 3", "free_slots": ["21:30-22:00"]},
+        ]
+    }
+    jsonschema.validate(answer, FREE_SLOTS_SCHEMA)
+    assert free_slots_from_answer(answer) == expected_output
+
+    grid_answer = {
+        "courts": [
+            {
+                "court": court,
+                "slots": [{"time": slot, "status": status} for slot, status in slots.items()],
+            }
+            for court, slots in actual_bookings_800x800.items()
+        ]
+    }
+    jsonschema.validate(grid_answer, BOOKING_GRID_SCHEMA)
+    assert booking_grid_from_answer(grid_answer) == actual_bookings_800x800
+
+    for invalid in [
+        {"Platz 1": ["21:30-22:00"]},
+        {"courts": [{"court": "P1", "free_slots": ["21:30"]}]},
+        {"courts": [{"court": "P1"}]},
+    ]:
+        with pytest.raises(jsonschema.ValidationError):
+            jsonschema.validate(invalid, FREE_SLOTS_SCHEMA)
+
+
+def test_unreadable_vision_answer_means_no_grid(monkeypatch, caplog):
+    from src import booking_grid
+
+    def mismatching_answer(*args):
+        raise ValueError("The answer of gpt-4o does not match the booking_grid schema")
+
+    monkeypatch.setattr(booking_grid, "extract_booking_grid_from_dom", lambda page: None)
+    monkeypatch.setattr(booking_grid, "_complete_with_schema", mismatching_answer)
+    assert booking_grid.extract_booking_grid(page=None, screenshot_base64="AAAA") is None
+    assert "does not match the booking_grid schema" in caplog.text
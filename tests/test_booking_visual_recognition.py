@@ -1,6 +1,7 @@
 import json
 from litellm import completion
 import pytest
+from src.booking_grid import extract_free_slots_from_screenshot
 from src.utils import create_assistant_message, create_user_message, encode_image, extract_json, extract_and_fix_json_llm_call, fix_json_regex, get_gemini_observer_response
 
 screenshot_paths = {
@@ -132,6 +133,12 @@ def test_gpt_4o():
     response_json = extract_and_fix_json_llm_call(json_str=response_text)
     assert response_json == expected_output
 
+@pytest.mark.skip()
+def test_gpt_4o_structured_output():
+    # one round trip with a JSON-schema response format instead of describe, list, reformat and fix
+    response_json = extract_free_slots_from_screenshot(screenshot_base64["800x800"], model="gpt-4o")
+    assert response_json == expected_output
+
 @pytest.mark.skip()
 def test_claude_3_5_sonnet():
     response = completion(
@@ -0,0 +1,119 @@
+import asyncio
+import json
+from datetime import date
+from pathlib import Path
+
+import pytest
+from cachetools import TTLCache
+
+from src import crawl
+from src.crawl import crawl_availability, merge_days, next_days
+
+actual_bookings_800x800 = json.loads(Path("tests/data/booking_800x800.json").read_text())
+replica_url_template = (
+    Path("tests/data/booking_800x800.html").resolve().as_uri() + "?currentDate={date:%m/%d/%Y}"
+)
+
+
+def test_merge_days():
+    monday, tuesday = date(2024, 6, 17), date(2024, 6, 18)
+    merged = merge_days(
+        {
+            tuesday: {"Platz 1": {"17:00-17:30": "booked"}},
+            monday: {"Platz 1": {"17:00-17:30": "free"}},
+        }
+    )
+    assert merged == {
+        "Platz 1": {"2024-06-17": {"17:00-17:30": "free"}, "2024-06-18": {"17:00-17:30": "booked"}}
+    }
+    assert list(merged["Platz 1"].keys()) == ["2024-06-17", "2024-06-18"]
+
+
+def test_cached_days_are_not_loaded_again():
+    days = next_days(3, start=date(2024, 6, 17))
+    cache = TTLCache(maxsize=8, ttl=60)
+    for day in days:
+        cache[replica_url_template.format(date=day)] = actual_bookings_800x800
+    # everything is cached, so no browser is launched at all
+    merged = crawl_availability(days, url_template=replica_url_template, cache=cache)
+    assert set(merged["Platz 2"].keys()) == {"2024-06-17", "2024-06-18", "2024-06-19"}
+
+
+def test_crawl_replica():
+    pytest.importorskip("playwright.async_api")
+    from playwright.async_api import Error
+
+    days = next_days(4, start=date(2024, 6, 17))
+    try:
+        merged = crawl_availability(
+            days,
+            url_template=replica_url_template,
+            max_contexts=2,
+            policy=None,
+            cache=TTLCache(8, 60),
+        )
+    except Error as error:
+        pytest.skip(f"Chromium is not available: {error}")
+    assert merged["Platz 2"]["2024-06-20"] == actual_bookings_800x800["Platz 2"]
+    assert len(merged["Platz 1"]) == 4
+
+
+class FakePage:
+    async def goto(self, url, wait_until):
+        if "06/18" in url:
+            raise TimeoutError("Timeout 30000ms exceeded")
+        self.url = url
+
+    async def evaluate(self, script):
+        return {"Platz 1": {"17:00-17:30": "free"}, "url": self.url}
+
+    async def close(self):
+        pass
+
+
+class FakeContext:
+    closed = False
+
+    async def new_page(self):
+        return FakePage()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+
+    async def new_context(self, viewport):
+        self.contexts.append(FakeContext())
+        return self.contexts[-1]
+
+
+def test_failed_day_does_not_fail_the_crawl(monkeypatch):
+    monkeypatch.setattr(crawl, "parse_booking_grid", lambda raw: raw)
+    days = next_days(3, start=date(2024, 6, 17))
+    cache = TTLCache(maxsize=8, ttl=60)
+    browser = FakeBrowser()
+    grids = asyncio.run(crawl._crawl(browser, days, crawl.DATE_URL_TEMPLATE, 2, None, cache))
+    assert sorted(grids) == [date(2024, 6, 17), date(2024, 6, 19)]
+    assert len(cache) == 2
+    assert len(browser.contexts) == 2 and all(context.closed for context in browser.contexts)
+
+
+def test_entries_expiring_during_the_crawl(monkeypatch):
+    class ExpiringCache(TTLCache):
+        """Answers membership tests, but its entries are gone by the time they are read."""
+
+        def __contains__(self, key):
+            return True
+
+        def __getitem__(self, key):
+            raise KeyError(key)
+
+    monkeypatch.setattr(crawl, "parse_booking_grid", lambda raw: raw)
+    days = [date(2024, 6, 17), date(2024, 6, 19)]
+    grids = asyncio.run(
+        crawl._crawl(FakeBrowser(), days, crawl.DATE_URL_TEMPLATE, 2, None, ExpiringCache(8, 60))
+    )
+    assert sorted(grids) == days  # loaded again, and returned from the load instead of the cache
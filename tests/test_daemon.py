@@ -0,0 +1,155 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+
+import pytest
+
+from src.daemon import AgentDaemon, QueueFull, Unavailable, serve
+
+
+class FakePage:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.pages = []
+
+    def new_page(self):
+        self.pages.append(FakePage())
+        return self.pages[-1]
+
+
+@contextmanager
+def fake_browser(worker):
+    yield FakeBrowser()
+
+
+def echo_runner(page, task, emit):
+    for step in range(1, task.max_steps + 1):
+        emit({"type": "step", "step": step})
+    if task.description == "fail":
+        raise RuntimeError("page crashed")
+    return task.description.upper()
+
+
+@pytest.fixture
+def api():
+    daemon = AgentDaemon(runner=echo_runner, browser_factory=fake_browser, workers=2)
+    daemon.start()
+    server = serve(daemon, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", daemon
+    server.shutdown()
+    server.server_close()
+    daemon.stop(timeout=5)
+
+
+def post(url, data):
+    request = urllib.request.Request(url, data=json.dumps(data).encode(), method="POST")
+    return urllib.request.urlopen(request, timeout=5)
+
+
+def test_stream_task_events_over_http(api):
+    base, daemon = api
+    with post(f"{base}/tasks?stream=1", {"task": "free courts?", "max_steps": 2}) as response:
+        assert response.status == 202 and response.headers["Content-Type"] == "application/x-ndjson"
+        events = [json.loads(line) for line in response]
+    assert [event["type"] for event in events] == ["status", "status", "step", "step", "status"]
+    assert [event["seq"] for event in events] == list(range(5))
+    assert events[-1] == {**events[-1], "status": "done", "answer": "FREE COURTS?"}
+
+    task_id = events[0]["task_id"]
+    with urllib.request.urlopen(f"{base}/tasks/{task_id}", timeout=5) as response:
+        assert json.load(response)["answer"] == "FREE COURTS?"
+    with urllib.request.urlopen(f"{base}/tasks/{task_id}/events", timeout=5) as response:
+        assert [json.loads(line) for line in response] == events
+
+    with post(f"{base}/tasks", {"task": "fail", "max_steps": 1}) as response:
+        task = daemon.get(json.load(response)["id"])
+    assert list(task.stream_events(timeout=5))[-1]["error"] == "RuntimeError: page crashed"
+    assert task.status == "failed"
+
+    with pytest.raises(urllib.error.HTTPError) as error:
+        post(f"{base}/tasks", {"max_steps": 1})
+    assert error.value.code == 400
+
+
+def test_queue_limit_and_warm_browsers():
+    release = threading.Event()
+    opened = []
+
+    @contextmanager
+    def browser_factory(worker):
+        opened.append(worker)
+        yield FakeBrowser()
+
+    def blocking_runner(page, task, emit):
+        release.wait(5)
+        return task.description
+
+    daemon = AgentDaemon(
+        runner=blocking_runner, browser_factory=browser_factory, workers=1, max_queued=1
+    )
+    daemon.start()
+    first = daemon.submit("first")
+    next(event for event in first.stream_events(timeout=5) if event.get("status") == "running")
+    second = daemon.submit("second")
+    with pytest.raises(QueueFull):
+        daemon.submit("third")
+
+    release.set()
+    assert list(second.stream_events(timeout=5))[-1]["answer"] == "second"
+    assert [task.status for task in daemon.tasks()] == ["done", "done"]
+    daemon.stop(timeout=5)
+    assert opened == [0]  # one browser for both tasks
+
+
+def test_crashed_browser_is_restarted(monkeypatch):
+    monkeypatch.setattr("src.daemon.BROWSER_RESTART_DELAY", 0)
+    opened = []
+
+    class CrashedBrowser:
+        def new_page(self):
+            raise RuntimeError("Target page, context or browser has been closed")
+
+    @contextmanager
+    def browser_factory(worker):
+        opened.append(worker)
+        yield CrashedBrowser() if len(opened) == 1 else FakeBrowser()
+
+    daemon = AgentDaemon(runner=echo_runner, browser_factory=browser_factory, workers=1)
+    daemon.start()
+    first = daemon.submit("first", max_steps=1)
+    assert list(first.stream_events(timeout=5))[-1]["error"].startswith(
+        "BrowserFailed: could not open a page"
+    )
+    second = daemon.submit("second", max_steps=1)
+    assert list(second.stream_events(timeout=5))[-1]["answer"] == "SECOND"
+    daemon.stop(timeout=5)
+    assert opened == [0, 0]
+
+
+def test_tasks_fail_when_no_browser_starts(monkeypatch):
+    monkeypatch.setattr("src.daemon.BROWSER_RESTART_DELAY", 0)
+
+    @contextmanager
+    def browser_factory(worker):
+        raise RuntimeError("Executable doesn't exist")
+        yield
+
+    daemon = AgentDaemon(runner=echo_runner, browser_factory=browser_factory, workers=2)
+    task = daemon.submit("free courts?")
+    daemon.start()
+    assert list(task.stream_events(timeout=5))[-1]["error"].startswith(
+        "no worker has a working browser"
+    )
+    with pytest.raises(Unavailable):
+        daemon.submit("free courts?")
+    daemon.stop(timeout=5)
@@ -0,0 +1,79 @@
+import json
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from src import ebusy_http
+from src.ebusy_http import EbusyClient, ResponseShapeChanged, get_booking_grid, parse_booking_html
+
+actual_bookings_800x800 = json.loads(Path("tests/data/booking_800x800.json").read_text())
+
+
+class StandInHandler(SimpleHTTPRequestHandler):
+    """Serves the saved booking page from tests/data and sets a session cookie like ebusy does."""
+
+    def end_headers(self):
+        if "Cookie" not in self.headers:
+            self.send_header("Set-Cookie", "JSESSIONID=stand-in; Path=/")
+        super().end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(StandInHandler, directory="tests/data"))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_parse_saved_page():
+    assert (
+        parse_booking_html(Path("tests/data/booking_800x800.html").read_text())
+        == actual_bookings_800x800
+    )
+
+
+def test_parsers_agree(monkeypatch):
+    pytest.importorskip("lxml")
+    monkeypatch.setattr(ebusy_http, "HTML_PARSER", "html.parser")
+    assert (
+        parse_booking_html(Path("tests/data/booking_800x800.html").read_text())
+        == actual_bookings_800x800
+    )
+
+
+def test_fetch_from_stand_in_server(server_url, tmp_path):
+    client = EbusyClient(cookie_path=tmp_path / "cookies.json")
+    assert (
+        client.fetch_booking_grid(f"{server_url}/booking_800x800.html") == actual_bookings_800x800
+    )
+    # the session cookie is kept for the next request and for the next process
+    assert client.session.cookies.get("JSESSIONID") == "stand-in"
+    assert (
+        EbusyClient(cookie_path=tmp_path / "cookies.json").session.cookies.get("JSESSIONID")
+        == "stand-in"
+    )
+    # ...and only readable by the owner
+    assert (tmp_path / "cookies.json").stat().st_mode & 0o777 == 0o600
+
+
+def test_shape_change_falls_back_to_browser(server_url, tmp_path):
+    client = EbusyClient(cookie_path=None)
+    with pytest.raises(ResponseShapeChanged):
+        client.fetch_booking_grid(f"{server_url}/booking_800x800.json")
+
+    fallback_urls = []
+    grid = get_booking_grid(
+        f"{server_url}/booking_800x800.json",
+        client=client,
+        browser_fallback=lambda url: fallback_urls.append(url) or actual_bookings_800x800,
+    )
+    assert grid == actual_bookings_800x800
+    assert fallback_urls == [f"{server_url}/booking_800x800.json"]
@@ -0,0 +1,64 @@
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+import pytest
+
+from src.annotator import draw_rectangles_and_numbers
+from src.image_pool import ImagePool, PoolSaturated, segment_frame
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with ImagePool(max_workers=2, max_pending=2) as pool:
+        yield pool
+
+
+@pytest.fixture(scope="module")
+def screenshot():
+    return cv2.cvtColor(cv2.imread("tests/data/mixed.jpeg"), cv2.COLOR_BGR2RGB)
+
+
+def test_results_match_inline_processing(pool, screenshot):
+    masks, coordinates = segment_frame(screenshot, "opencv")
+    assert pool.segment(screenshot, "opencv").result(timeout=60) == (masks, coordinates)
+    annotated = pool.annotate(screenshot, masks, coordinates).result(timeout=60)
+    assert annotated == draw_rectangles_and_numbers(screenshot, masks, coordinates)
+
+
+def slow_shape(image: np.ndarray, seconds: float) -> tuple[int, ...]:
+    time.sleep(seconds)
+    return image.shape
+
+
+def test_backpressure(pool, screenshot):
+    futures = [pool.submit(slow_shape, screenshot, 1.0) for _ in range(pool.max_pending)]
+    with pytest.raises(PoolSaturated):
+        pool.submit(slow_shape, screenshot, 0, block=False)
+    with pytest.raises(PoolSaturated):
+        pool.submit(slow_shape, screenshot, 0, timeout=0.01)
+
+    # a blocking submit waits until a frame is done
+    assert pool.submit(slow_shape, screenshot, 0).result(timeout=60) == screenshot.shape
+    assert any(future.done() for future in futures)
+
+
+def test_failed_submit_frees_the_frame(monkeypatch, screenshot):
+    created = []
+
+    class RecordingSharedMemory(shared_memory.SharedMemory):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            created.append(self.name)
+
+    monkeypatch.setattr(shared_memory, "SharedMemory", RecordingSharedMemory)
+    with ImagePool(max_workers=1, max_pending=1) as pool:
+        monkeypatch.setattr(pool._executor, "submit", lambda *args: 1 / 0)
+        with pytest.raises(ZeroDivisionError):
+            pool.submit(slow_shape, screenshot, 0)
+        # the block is unlinked and the slot is free again
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=created[0])
+        monkeypatch.undo()
+        assert pool.submit(slow_shape, screenshot, 0).result(timeout=60) == screenshot.shape
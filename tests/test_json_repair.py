@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from src.json_repair import extract_json, iter_json_candidates, parse_json, repair_json
+
+GRID = {"Platz 1": ["21:30-22:00"], "Platz 2": ["17:30-18:00", "21:30-22:00"], "Platz 3": []}
+
+
+def test_candidates_in_prose_and_code_fences():
+    text = 'Sure! {"a": {"b": "}"}} and then ```json\n{"c": [1, 2]}\n``` and {"d": 1'
+    assert list(iter_json_candidates(text)) == ['{"a": {"b": "}"}}', '{"c": [1, 2]}', '{"d": 1']
+
+
+def test_extract_json_from_a_model_response():
+    response = f"Here are the free slots:\n```json\n{json.dumps(GRID, indent=2)}\n```\nLet me know!"
+    assert extract_json(response) == GRID
+    assert extract_json("No JSON here.") is None
+    # a nested object is not returned on its own
+    assert extract_json('{"a": {"b": 1}}') == {"a": {"b": 1}}
+
+
+@pytest.mark.parametrize(
+    "broken",
+    [
+        # unquoted keys, single quotes
+        "{Platz 1: ['21:30-22:00'], Platz 2: ['17:30-18:00', '21:30-22:00'], Platz 3: []}",
+        # trailing commas
+        '{"Platz 1": ["21:30-22:00",], "Platz 2": ["17:30-18:00", "21:30-22:00"], "Platz 3": [],}',
+        # smart quotes
+        "{“Platz 1”: [“21:30-22:00”], “Platz 2”: [“17:30-18:00”, “21:30-22:00”], “Platz 3”: []}",
+        # missing commas
+        '{"Platz 1": ["21:30-22:00"] "Platz 2": ["17:30-18:00" "21:30-22:00"], "Platz 3": []}',
+        # comments
+        '{\n  // free slots\n  "Platz 1": ["21:30-22:00"],'
+        ' "Platz 2": ["17:30-18:00", "21:30-22:00"], "Platz 3": []}',
+    ],
+)
+def test_repairs_common_defects(broken):
+    with pytest.raises(json.JSONDecodeError):
+        json.loads(broken)
+    assert json.loads(repair_json(broken)) == GRID
+    assert extract_json(f"The result is {broken}.") == GRID
+
+
+def test_repairs_values_and_truncation():
+    assert parse_json("{'ok': True, 'error': None, 'status': free}") == {
+        "ok": True,
+        "error": None,
+        "status": "free",
+    }
+    assert parse_json('{"text": "line 1\nline 2"}') == {"text": "line 1\nline 2"}
+    assert parse_json('{"Platz 1": ["21:30-22:00"], "Platz 2": ["17:30-18') == {
+        "Platz 1": ["21:30-22:00"],
+        "Platz 2": ["17:30-18"],
+    }
+    assert parse_json('{"a": 1, "b": ') == {"a": 1, "b": None}
+    assert parse_json('{"a": 1, "b"') == {"a": 1, "b": None}
+    assert parse_json('{"a": [1, 2,') == {"a": [1, 2]}
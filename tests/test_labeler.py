@@ -0,0 +1,51 @@
+from pathlib import Path
+
+import pytest
+
+from src.labeler import Label, click_label, label_page, validate_label
+from src.text_observer import get_text_observation
+
+replica_path = Path("tests/data/booking_800x800.html")
+
+labels = {
+    "a": Label(id="a", selector='[data-agent-id="a"]', role="link", name="Startseite"),
+    "b": Label(id="b", selector='[data-agent-id="b"]', role="button", name="Datum wählen"),
+}
+
+
+def test_validate_label():
+    assert validate_label("b", labels).name == "Datum wählen"
+    assert validate_label("B ", labels).name == "Datum wählen"  # hints are drawn in upper case
+    with pytest.raises(ValueError, match="Available IDs: a, b"):
+        validate_label("zz", labels)
+
+
+@pytest.fixture(scope="module")
+def replica_page():
+    sync_api = pytest.importorskip("playwright.sync_api")
+    with sync_api.sync_playwright() as p:
+        try:
+            browser = p.chromium.launch(headless=True)
+        except sync_api.Error as error:
+            pytest.skip(f"Chromium is not available: {error}")
+        page = browser.new_page(viewport={"width": 800, "height": 800})
+        page.goto(replica_path.resolve().as_uri())
+        yield page
+        browser.close()
+
+
+def test_label_page_headless(replica_page):
+    page_labels = label_page(replica_page)
+    names = [label.name for label in page_labels.values()]
+    assert names[:4] == ["Startseite", "Camps", "Freiplätze", "Login"]
+    assert "Datum wählen" in names
+    assert names.count("BUCHEN") == 4
+
+    # the text observer reuses the IDs that were drawn, and the hint letters are not part of
+    # the text
+    observation = get_text_observation(replica_page)
+    assert observation.labels.keys() == page_labels.keys()
+    assert "Startseite" in observation.text
+
+    date_picker = next(label for label in page_labels.values() if label.name == "Datum wählen")
+    assert click_label(replica_page, date_picker.id.upper(), page_labels) == date_picker
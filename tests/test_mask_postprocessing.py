@@ -0,0 +1,45 @@
+import numpy as np
+
+from src.mask_postprocessing import boxes_from_masks, pairwise_iou, place_labels, suppress_masks
+
+IMAGE_SHAPE = (800, 760, 3)
+
+
+def mask(x, y, w, h, **extra) -> dict:
+    return {"bbox": [x, y, w, h], "area": w * h, **extra}
+
+
+def test_pairwise_iou():
+    boxes = boxes_from_masks([mask(0, 0, 10, 10), mask(5, 0, 10, 10), mask(100, 100, 10, 10)])
+    iou = pairwise_iou(boxes)
+    assert np.allclose(np.diag(iou), 1)
+    assert np.isclose(iou[0, 1], 50 / 150)
+    assert iou[0, 2] == 0
+
+
+def test_suppress_duplicates_nested_tiny_and_sections():
+    button = mask(100, 100, 200, 50)
+    masks = [
+        button,
+        mask(102, 101, 198, 49),  # the same button with a slightly different outline
+        mask(150, 115, 60, 20),  # the text on the button
+        mask(400, 100, 200, 50),  # another button
+        mask(10, 10, 5, 5),  # a speck
+        mask(0, 0, 760, 400),  # a section of the page
+    ]
+    assert suppress_masks(masks, IMAGE_SHAPE) == [button, masks[3]]
+
+
+def test_duplicates_keep_the_best_sam_mask():
+    worse, better = mask(100, 100, 200, 50, predicted_iou=0.85), mask(
+        101, 100, 198, 50, predicted_iou=0.95
+    )
+    assert suppress_masks([worse, better], IMAGE_SHAPE) == [better]
+
+
+def test_labels_are_deterministic_and_do_not_overlap():
+    masks = [mask(100, 100, 200, 50), mask(100, 100, 200, 50), mask(400, 100, 20, 15)]
+    positions = place_labels(masks)
+    assert positions == place_labels(masks)
+    # corner of the first box, next corner for the identical second box, centre of the small box
+    assert positions == {1: {"x": 108, "y": 109}, 2: {"x": 292, "y": 109}, 3: {"x": 410, "y": 108}}
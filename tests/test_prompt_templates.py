@@ -0,0 +1,91 @@
+import pytest
+
+from src.prompt_templates import (
+    PromptTemplate,
+    PromptTooLong,
+    check_prompt,
+    count_tokens,
+    load_templates,
+    messages_text,
+)
+
+
+def test_render_and_partial():
+    template = PromptTemplate(
+        "Task: {task}\nActions: {actions}\n{{literal}} {website}", name="actor"
+    )
+    assert template.fields == {"task", "actions", "website"}
+    assert (
+        template.render(task="book", actions="CLICK", website="{}")
+        == "Task: book\nActions: CLICK\n{literal} {}"
+    )
+
+    static = template.partial(actions="CLICK, SCROLL {x}")
+    assert static.fields == {"task", "website"}
+    assert static.render(task="t", website="w") == template.render(
+        task="t", actions="CLICK, SCROLL {x}", website="w"
+    )
+
+    with pytest.raises(KeyError, match="website"):
+        static.render(task="t")
+    with pytest.raises(ValueError):
+        PromptTemplate("{count:>3}")
+
+
+def test_load_templates(tmp_path):
+    templates = load_templates("prompts.yaml")
+    assert load_templates("prompts.yaml") is templates
+    assert templates["actor.system_prompt"].fields == {"task"}
+    assert (
+        templates["actor.system_prompt"]
+        .render(task="Book P2")
+        .endswith("The task provided by the user is: Book P2")
+    )
+
+    path = tmp_path / "prompts.yaml"
+    path.write_text("observer:\n  prompt: Describe {what}.\n")
+    assert load_templates(path)["observer.prompt"].render(what="the page") == "Describe the page."
+
+
+def test_check_prompt():
+    prompt = "Which courts are free between 17:00 and 19:00? " * 20
+    n_tokens = count_tokens(prompt)
+    assert 0 < n_tokens < len(prompt)
+    assert check_prompt(prompt, max_tokens=n_tokens) == n_tokens
+    with pytest.raises(PromptTooLong):
+        check_prompt(prompt, max_tokens=n_tokens - 1, name="actor prompt")
+
+
+def test_messages_text_skips_images():
+    messages = [
+        {"role": "system", "content": "You check tennis courts."},
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": "Which courts are free?"},
+                {
+                    "type": "image_url",
+                    "image_url": {"url": "data:image/jpeg;base64," + "A" * 10_000},
+                },
+            ],
+        },
+        {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": "1",
+                    "type": "function",
+                    "function": {"name": "click", "arguments": '{"ui_element_id": "ab"}'},
+                },
+            ],
+        },
+        {"role": "tool", "tool_call_id": "1", "name": "click", "content": "Clicked on 'ab'."},
+    ]
+    text = messages_text(messages)
+    assert text == (
+        "You check tennis courts.\nWhich courts are free?\n"
+        'click\n{"ui_element_id": "ab"}\nClicked on \'ab\'.'
+    )
+    with pytest.raises(PromptTooLong):
+        check_prompt(text, max_tokens=5)
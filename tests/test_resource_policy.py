@@ -0,0 +1,44 @@
+from src.resource_policy import EBUSY_PROFILE, ResourcePolicy
+
+
+def test_block_by_type():
+    assert (
+        EBUSY_PROFILE.get_block_reason("https://safo.ebusy.de/fonts/a.woff2", "font") == "type font"
+    )
+    assert (
+        EBUSY_PROFILE.get_block_reason("https://safo.ebusy.de/lite-module/407", "document") is None
+    )
+    assert EBUSY_PROFILE.get_block_reason("https://safo.ebusy.de/js/app.js", "script") is None
+
+
+def test_block_by_domain():
+    assert (
+        EBUSY_PROFILE.get_block_reason("https://www.googletagmanager.com/gtm.js", "script")
+        == "denied domain"
+    )
+    # only whole domain labels match, not arbitrary suffixes
+    assert EBUSY_PROFILE.get_block_reason("https://notfacebook.com/x.js", "script") is None
+
+
+def test_allowlist():
+    policy = ResourcePolicy(allowed_domains=["ebusy.de"])
+    assert policy.get_block_reason("https://safo.ebusy.de/", "document") is None
+    assert (
+        policy.get_block_reason("https://cdn.example.com/lib.js", "script") == "domain not allowed"
+    )
+    assert policy.get_block_reason("data:image/png;base64,AAAA", "image") is None
+
+
+def test_first_party_images():
+    assert EBUSY_PROFILE.get_block_reason("https://safo.ebusy.de/img/logo.png", "image") is None
+    assert (
+        EBUSY_PROFILE.get_block_reason("https://cdn.example.com/banner.jpg", "image")
+        == "type image"
+    )
+    # image_domains only lifts the type block, never the domain lists
+    policy = ResourcePolicy(
+        blocked_resource_types={"image"},
+        image_domains=["ads.example.com"],
+        denied_domains=["ads.example.com"],
+    )
+    assert policy.get_block_reason("https://ads.example.com/banner.gif", "image") == "denied domain"
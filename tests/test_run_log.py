@@ -0,0 +1,71 @@
+import gzip
+import json
+
+from src.run_log import log_call, prompt_hash, setup_run_logger, start_step, stop_run_logger
+
+
+def read_records(path):
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_structured_records(tmp_path):
+    logger = setup_run_logger(log_dir=tmp_path, name="test-run")
+    assert setup_run_logger(log_dir=tmp_path, name="test-run") is logger
+    assert len(logger.handlers) == 1
+
+    start_step(logger, 1)
+    prompt = "Which courts are free?"
+    image = "data:image/jpeg;base64," + "A" * 5000
+    log_call(
+        logger,
+        stage="GPT OBSERVER",
+        prompt=prompt,
+        response=f"Free: P1 {image}",
+        model="gpt-4o",
+        duration_s=1.23456,
+        images=[tmp_path / "1.jpeg"],
+    )
+    start_step(logger, 2)
+    log_call(logger, stage="GPT OBSERVER", prompt=prompt, response="Free: P2")
+    stop_run_logger("test-run")
+    assert logger.handlers == []
+
+    (log_file,) = tmp_path.glob("run_*.jsonl")
+    records = read_records(log_file)
+    assert [record.get("message") for record in records] == [
+        "step 1 started",
+        None,
+        "step 2 started",
+        None,
+    ]
+    first, second = records[1], records[3]
+    assert first["step"] == 1 and second["step"] == 2
+    assert (
+        first["stage"] == "GPT OBSERVER"
+        and first["model"] == "gpt-4o"
+        and first["duration_s"] == 1.235
+    )
+    assert first["images"] == [(tmp_path / "1.jpeg").as_posix()]
+    assert first["prompt"] == prompt and first["prompt_hash"] == second[
+        "prompt_hash"
+    ] == prompt_hash(prompt)
+    assert "prompt" not in second  # the prompt text is written once per run
+    assert "base64,AAAA" not in log_file.read_text() and first["response"].startswith(
+        "Free: P1 <inline image"
+    )
+    assert len({record["run_id"] for record in records}) == 1
+
+
+def test_rotation_compresses(tmp_path):
+    logger = setup_run_logger(
+        log_dir=tmp_path, name="test-rotation", max_bytes=2000, backup_count=3
+    )
+    for step in range(20):
+        log_call(logger, stage="GPT ACTOR", prompt=f"prompt {step}", response="x" * 200)
+    stop_run_logger("test-rotation")
+
+    rotated = sorted(tmp_path.glob("run_*.jsonl.*.gz"))
+    assert 1 <= len(rotated) <= 3
+    assert all(read_records(path) for path in rotated)
@@ -0,0 +1,35 @@
+import threading
+import time
+
+from src.sam_model import SamModelManager
+
+
+def test_model_is_loaded_once_across_threads():
+    calls = []
+
+    def loader(model_type, checkpoint, device):
+        calls.append(model_type)
+        time.sleep(0.05)  # loading takes a while, so concurrent callers overlap
+        return object()
+
+    manager = SamModelManager(loader=loader)
+    assert not manager.is_loaded
+    assert manager.memory_stats()["loaded"] is False
+
+    models = []
+    threads = [
+        threading.Thread(target=lambda: models.append(manager.get_model())) for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["vit_h"]
+    assert len({id(model) for model in models}) == 1
+    assert manager.load_seconds is not None
+
+    manager.unload()
+    assert not manager.is_loaded
+    manager.get_model()
+    assert len(calls) == 2
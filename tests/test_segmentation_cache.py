@@ -0,0 +1,52 @@
+import numpy as np
+
+from src.segmentation_cache import SegmentationCache, difference_hash, hamming_distance
+
+
+def make_screenshot(seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    # blocky image, so that downscaling for the dHash keeps its structure
+    blocks = rng.integers(0, 256, size=(8, 8, 3), dtype=np.uint8)
+    return np.kron(blocks, np.ones((16, 16, 1), dtype=np.uint8))
+
+
+def make_masks(n: int, shape=(128, 128)) -> list[dict]:
+    return [
+        {"segmentation": np.zeros(shape, dtype=bool), "bbox": [0, 0, 10, 10], "area": 100}
+        for _ in range(n)
+    ]
+
+
+def test_exact_and_near_duplicate_hits(tmp_path):
+    cache = SegmentationCache(cache_dir=tmp_path)
+    screenshot = make_screenshot(0)
+    assert cache.get(screenshot) is None
+
+    cache.put(screenshot, make_masks(2), {1: {"x": 5, "y": 5}, 2: {"x": 8, "y": 8}})
+    assert cache.get(screenshot.copy()).positions[1] == {"x": 5, "y": 5}
+
+    # a few changed pixels (e.g. a blinking cursor) still reuse the segmentation
+    near_duplicate = screenshot.copy()
+    near_duplicate[60:62, 60:62] = 255 - near_duplicate[60:62, 60:62]
+    assert hamming_distance(difference_hash(screenshot), difference_hash(near_duplicate)) <= 4
+    assert cache.get(near_duplicate) is not None
+
+    assert cache.get(make_screenshot(1)) is None
+    assert (cache.hits, cache.near_hits, cache.misses) == (1, 1, 2)
+
+
+def test_lru_eviction_by_bytes_and_disk_tier(tmp_path):
+    entry_bytes = (
+        SegmentationCache(cache_dir=None).put(make_screenshot(0), make_masks(1), {}).nbytes
+    )
+    cache = SegmentationCache(max_bytes=2 * entry_bytes, cache_dir=tmp_path, max_hash_distance=0)
+    screenshots = [make_screenshot(seed) for seed in range(3)]
+    for screenshot in screenshots:
+        cache.put(screenshot, make_masks(1), {})
+    assert len(cache) == 2
+    assert cache.nbytes <= cache.max_bytes
+
+    # the evicted screenshot is loaded back from disk, also by a new process
+    assert cache.get(screenshots[0]) is not None
+    assert cache.disk_hits == 1
+    assert SegmentationCache(cache_dir=tmp_path).get(screenshots[1]) is not None
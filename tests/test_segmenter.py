@@ -0,0 +1,34 @@
+import cv2
+import pytest
+
+from src.segmenter import OpenCVSegmenter, get_segmenter
+
+# points on tests/data/mixed.jpeg: "BUCHEN" cells, a "Belegt" button and the "next day" arrow
+TARGETS = [(259, 471), (547, 759), (835, 1623), (547, 655), (1012, 240)]
+
+
+def smallest_box_containing(masks: list[dict], x: int, y: int) -> dict | None:
+    containing = [
+        mask
+        for mask in masks
+        if mask["bbox"][0] <= x <= mask["bbox"][0] + mask["bbox"][2]
+        and mask["bbox"][1] <= y <= mask["bbox"][1] + mask["bbox"][3]
+    ]
+    return min(containing, key=lambda mask: mask["area"], default=None)
+
+
+def test_opencv_segmenter_finds_booking_cells():
+    image = cv2.cvtColor(cv2.imread("tests/data/mixed.jpeg"), cv2.COLOR_BGR2RGB)
+    masks = OpenCVSegmenter().segment(image)
+
+    image_area = image.shape[0] * image.shape[1]
+    for x, y in TARGETS:
+        box = smallest_box_containing(masks, x, y)
+        assert box is not None, (x, y)
+        # an element, not a whole section of the page
+        assert box["area"] < 0.02 * image_area, (x, y, box)
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="Available backends: opencv, sam"):
+        get_segmenter("yolo")
@@ -0,0 +1,46 @@
+import threading
+
+import numpy as np
+
+from src.speculative import SpeculativeSegmentation
+
+
+def make_speculative(started: list, release: threading.Event) -> SpeculativeSegmentation:
+    def load_image(path):
+        return np.zeros((4, 4, 3), dtype=np.uint8)
+
+    def segment(image):
+        started.append(threading.current_thread().name)
+        release.wait(timeout=5)
+        return [{"bbox": [0, 0, 2, 2], "area": 4}], {1: {"x": 1, "y": 1}}
+
+    return SpeculativeSegmentation(load_image=load_image, segment=segment)
+
+
+def test_result_comes_from_the_background_job():
+    started, release = [], threading.Event()
+    speculative = make_speculative(started, release)
+    future = speculative.submit("a.png")
+    release.set()
+    _, masks, positions = speculative.result("a.png", timeout=5)
+    assert future.done()
+    assert positions == {1: {"x": 1, "y": 1}}
+    assert started[0].startswith("speculative-segmenter")
+    assert (speculative.hits, speculative.misses) == (1, 0)
+    speculative.shutdown()
+
+
+def test_older_screenshots_are_cancelled_and_unknown_ones_computed_now():
+    started, release = [], threading.Event()
+    speculative = make_speculative(started, release)
+    speculative.submit("a.png")  # occupies the single worker
+    speculative.submit("b.png")  # waits in the queue ...
+    speculative.submit("c.png")  # ... and is cancelled once the page has moved on
+    assert speculative.cancelled == 1
+
+    release.set()
+    speculative.result("c.png", timeout=5)
+    speculative.result("d.png")
+    assert (speculative.hits, speculative.misses) == (1, 1)
+    assert started.count("MainThread") == 1
+    speculative.shutdown()
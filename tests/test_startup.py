@@ -0,0 +1,30 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+HEAVY = [
+    "litellm",
+    "openai",
+    "anthropic",
+    "google.generativeai",
+    "vertexai",
+    "yaml",
+    "cv2",
+    "matplotlib",
+    "torch",
+]
+
+
+@pytest.mark.parametrize(
+    "module", ["src.segmenter", "src.prompt_templates", "src.ui_integration", "src.tools"]
+)
+def test_import_loads_no_provider_sdk_or_vision_library(module):
+    code = (
+        f"import sys, json, {module}; print(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert json.loads(result.stdout.splitlines()[-1]) == []
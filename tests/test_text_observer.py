@@ -0,0 +1,47 @@
+from src.labeler import Label
+from src.text_observer import TextObservation
+
+
+def make_observation(names: list[str], n_canvases: int = 0) -> TextObservation:
+    elements = [
+        Label(
+            id=chr(ord("a") + i),
+            selector=f'[data-agent-id="{chr(ord("a") + i)}"]',
+            role="button",
+            name=name,
+        )
+        for i, name in enumerate(names)
+    ]
+    return TextObservation(
+        title="Platzbuchung",
+        url="https://safo.ebusy.de/",
+        text="Freiplätze",
+        elements=elements,
+        n_canvases=n_canvases,
+    )
+
+
+def test_is_sufficient():
+    assert make_observation(["Freiplätze", "Datum wählen", "Login"]).is_sufficient()
+    assert not make_observation([]).is_sufficient()  # nothing to interact with
+    # many icon buttons without a label: the actor needs the screenshot
+    assert not make_observation(["Freiplätze", "", "", "Login"]).is_sufficient()
+    # the threshold is a ratio: 3 of 10 unnamed is still fine, 4 of 10 is not
+    assert make_observation(["x"] * 7 + [""] * 3).is_sufficient()
+    assert not make_observation(["x"] * 6 + [""] * 4).is_sufficient()
+    assert make_observation(["x"] * 6 + [""] * 4).is_sufficient(max_unnamed_ratio=0.5)
+    # content rendered into canvas/svg is invisible in the text view
+    assert not make_observation(["Freiplätze"], n_canvases=2).is_sufficient()
+
+
+def test_str():
+    observation = make_observation(["Freiplätze", "Login"])
+    observation.elements[1].href = "https://safo.ebusy.de/login"
+    assert str(observation) == (
+        "Description of the webpage:\n"
+        "Title: Platzbuchung (https://safo.ebusy.de/)\n"
+        "Visible text: Freiplätze\n\n"
+        "Description of clickable UI elements:\n"
+        '* "a" button "Freiplätze"\n'
+        '* "b" button "Login" -> https://safo.ebusy.de/login'
+    )
@@ -0,0 +1,84 @@
+from pathlib import Path
+from typing import Annotated, Literal, Optional
+
+import pytest
+
+from src.tools import ToolRegistry, compile_tool
+
+
+def scroll(
+    page: Annotated[object, "IGNORE"],
+    scroll_direction: Literal["up", "down"],
+) -> str:
+    """
+Use this function to scroll up or down a webpage. \
+For example, scroll(scroll_direction='down') scrolls down."""
+    return f"{page} scrolled {scroll_direction}"
+
+
+def click(
+    page: Annotated[object, "IGNORE"],
+    ui_element_id: Annotated[Optional[str], "The letters of a yellow box."],
+    screenshot_path: Annotated[Path, "IGNORE"],
+    is_annotated: Annotated[bool, "Whether the element has a yellow box."],
+    times: int = 1,
+) -> str:
+    """Use this function to click on an UI element."""
+    return f"{page} clicked {ui_element_id} {times}x ({is_annotated}, {screenshot_path.name})"
+
+
+def test_compile_tool():
+    tool = compile_tool(click)
+    assert compile_tool(click) is tool
+    assert tool.runtime_args == ("page", "screenshot_path")
+    assert tool.optional_args == ("ui_element_id",)
+    assert tool.description == "Use this function to click on an UI element."
+    assert tool.parameters == {
+        "type": "object",
+        "properties": {
+            "ui_element_id": {"type": "string", "description": "The letters of a yellow box."},
+            "is_annotated": {
+                "type": "boolean",
+                "description": "Whether the element has a yellow box.",
+            },
+            "times": {"type": "integer"},
+        },
+        "required": ["is_annotated"],
+    }
+    assert compile_tool(scroll).parameters["properties"]["scroll_direction"] == {
+        "type": "string",
+        "enum": ["up", "down"],
+    }
+    assert compile_tool(scroll).description.startswith(
+        "Use this function to scroll up or down a webpage. For example"
+    )
+
+
+def test_provider_schemas():
+    registry = ToolRegistry([scroll, click])
+    openai = registry.schemas("openai")
+    assert registry.schemas("openai") is openai
+    assert [schema["function"]["name"] for schema in openai] == ["scroll", "click"]
+    assert registry.schemas("anthropic")[0]["input_schema"] == compile_tool(scroll).parameters
+    assert registry.schemas("gemini")[1]["parameters"] == compile_tool(click).parameters
+    with pytest.raises(ValueError):
+        registry.schemas("mistral")
+
+
+def test_call():
+    registry = ToolRegistry([scroll, click])
+    context = dict(page="page", screenshot_path=Path("screenshots/1.png"), labels={})
+    assert (
+        registry.call("scroll", '{"scroll_direction": "down"}', **context) == "page scrolled down"
+    )
+    assert (
+        registry.call("click", {"is_annotated": False}, **context)
+        == "page clicked None 1x (False, 1.png)"
+    )
+    assert registry.call(
+        "click", "{ui_element_id: 'ab', is_annotated: true, times: 2}", **context
+    ) == ("page clicked ab 2x (True, 1.png)")
+    with pytest.raises(ValueError, match="Unknown tool name"):
+        registry.call("type_text", {}, **context)
+    with pytest.raises(ValueError, match="runtime arguments"):
+        registry.call("click", {"is_annotated": False}, page="page")
@@ -0,0 +1,59 @@
+import json
+import sys
+import time
+
+import pytest
+
+from src import tracing
+from src.tracing import Tracer, format_summary, load_spans, percentile, summarize
+
+
+def test_spans_export_as_chrome_trace(tmp_path):
+    tracer = Tracer()
+    with tracer.span("find_target", step=2):
+        with tracer.span("segmentation"):
+            time.sleep(0.01)
+    path = tracer.export(tmp_path / "trace.json")
+
+    events = json.loads(path.read_text())["traceEvents"]
+    assert [event["name"] for event in events] == ["segmentation", "find_target"]
+    inner, outer = events
+    assert all(event["ph"] == "X" for event in events)
+    assert inner["dur"] >= 10_000 and outer["dur"] >= inner["dur"]
+    assert outer["ts"] <= inner["ts"] and outer["args"] == {"step": 2}
+
+
+def test_disabled_tracer_records_nothing():
+    assert not tracing.TRACER.enabled
+
+    @tracing.traced("screenshot")
+    def make_screenshot():
+        return "1.jpeg"
+
+    assert make_screenshot() == "1.jpeg"
+    assert tracing.TRACER.events == []
+
+
+def test_summary_across_runs(tmp_path, monkeypatch, capsys):
+    for run, durations in enumerate([[100, 200], [300, 400, 1000]]):
+        events = [
+            {"name": "actor", "ph": "X", "ts": 0, "dur": ms * 1000, "pid": run, "tid": 1}
+            for ms in durations
+        ]
+        events.append(
+            {"name": "page_settle", "ph": "X", "ts": 0, "dur": 3_000_000, "pid": run, "tid": 1}
+        )
+        (tmp_path / f"trace_{run}.json").write_text(json.dumps({"traceEvents": events}))
+
+    durations = load_spans([tmp_path])
+    assert sorted(durations["actor"]) == [100, 200, 300, 400, 1000]
+    rows = {row["stage"]: row for row in summarize(durations)}
+    assert rows["actor"]["count"] == 5 and rows["actor"]["p50"] == 300
+    assert rows["actor"]["p95"] == percentile([100, 200, 300, 400, 1000], 95) == pytest.approx(880)
+    assert rows["page_settle"]["p99"] == 3000
+
+    monkeypatch.setattr(sys, "argv", ["tracing", str(tmp_path)])
+    tracing.main()
+    output = capsys.readouterr().out
+    assert output == format_summary(summarize(durations)) + "\n"
+    assert output.splitlines()[1].startswith("page_settle")
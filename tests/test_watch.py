@@ -0,0 +1,108 @@
+import copy
+import json
+from itertools import islice
+from pathlib import Path
+
+from playwright.sync_api import Error as PlaywrightError
+
+from src.watch import GridSnapshot, SlotChange, diff_snapshots, watch_availability
+
+actual_bookings_800x800 = json.loads(Path("tests/data/booking_800x800.json").read_text())
+
+
+def test_snapshot_roundtrip():
+    snapshot = GridSnapshot.from_grid(actual_bookings_800x800)
+    assert snapshot.courts == ("Platz 1", "Platz 2", "Platz 3")
+    assert snapshot.status("Platz 2", "17:30-18:00") == "free"
+    assert snapshot.status("Platz 2", "18:00-18:30") == "booked"
+    assert snapshot == GridSnapshot.from_grid(copy.deepcopy(actual_bookings_800x800))
+
+
+def test_diff_snapshots():
+    grid = copy.deepcopy(actual_bookings_800x800)
+    grid["Platz 1"]["18:00-18:30"] = "free"  # a cancellation
+    grid["Platz 2"]["17:30-18:00"] = "booked"
+    old, new = GridSnapshot.from_grid(actual_bookings_800x800), GridSnapshot.from_grid(grid)
+    assert diff_snapshots(old, old) == []
+    assert diff_snapshots(old, new) == [
+        SlotChange("Platz 1", "18:00-18:30", "booked", "free"),
+        SlotChange("Platz 2", "17:30-18:00", "free", "booked"),
+    ]
+
+
+def test_diff_snapshots_with_different_slots():
+    old = GridSnapshot.from_grid({"Platz 1": {"17:00-17:30": "free"}})
+    new = GridSnapshot.from_grid({"Platz 1": {"17:00-17:30": "free", "17:30-18:00": "free"}})
+    assert diff_snapshots(old, new) == [SlotChange("Platz 1", "17:30-18:00", None, "free")]
+
+
+class FakePage:
+    """Returns the raw booking table cells of the given grids, one per poll."""
+
+    def __init__(self, grids):
+        self.grids = iter(grids)
+
+    def evaluate(self, js):
+        grid = next(self.grids)
+        if isinstance(grid, Exception):
+            raise grid
+        if grid is None:
+            return None
+        slots = list(next(iter(grid.values())).keys())
+        return {
+            "courts": list(grid.keys()),
+            "rows": [
+                {
+                    "time": slot,
+                    "cells": [
+                        {
+                            "text": "BUCHEN" if grid[court][slot] == "free" else "Belegt",
+                            "className": "",
+                            "title": "",
+                        }
+                        for court in grid
+                    ],
+                }
+                for slot in slots
+            ],
+        }
+
+    def reload(self, wait_until):
+        if self.fail_reload:
+            self.fail_reload = False
+            raise PlaywrightError("net::ERR_INTERNET_DISCONNECTED")
+
+    fail_reload = False
+
+
+def test_watch_backs_off_until_something_changes():
+    changed = copy.deepcopy(actual_bookings_800x800)
+    changed["Platz 3"]["17:00-17:30"] = "free"
+    page = FakePage([actual_bookings_800x800] * 4 + [changed])
+    sleeps = []
+    events = list(
+        islice(
+            watch_availability(page, interval=10, max_interval=30, backoff=2, sleep=sleeps.append),
+            1,
+        )
+    )
+    assert events == [[SlotChange("Platz 3", "17:00-17:30", "booked", "free")]]
+    assert sleeps == [10, 20, 30, 30]
+
+
+def test_watch_survives_failed_polls():
+    changed = copy.deepcopy(actual_bookings_800x800)
+    changed["Platz 3"]["17:00-17:30"] = "free"
+    timeout = PlaywrightError("Timeout 30000ms exceeded")
+    page = FakePage([actual_bookings_800x800, timeout, None, changed])
+    page.fail_reload = True
+    sleeps = []
+    events = list(
+        islice(
+            watch_availability(page, interval=10, max_interval=30, backoff=2, sleep=sleeps.append),
+            1,
+        )
+    )
+    assert events == [[SlotChange("Platz 3", "17:00-17:30", "booked", "free")]]
+    # a timeout and a page without a grid back off like unchanged polls
+    assert sleeps == [10, 20, 30]
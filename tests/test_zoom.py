@@ -0,0 +1,80 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.zoom import Region, draw_grid, draw_labels, labels_in_region, render_region
+
+SCREENSHOT = np.full((800, 760, 3), 255, dtype=np.uint8)
+
+
+def test_grid_cells_and_margin():
+    page = Region.of_image(SCREENSHOT)
+    assert page == Region(0, 0, 760, 800)
+    assert page.cell(1, 3, 3) == Region(0, 0, 760 / 3, 800 / 3)
+    assert page.cell(6, 3, 3) == Region(2 * 760 / 3, 800 / 3, 760 / 3, 800 / 3)
+    with pytest.raises(ValueError):
+        page.cell(10, 3, 3)
+
+    # the margin never leaves the screenshot
+    corner = page.cell(9, 3, 3).expand(0.5, page)
+    assert corner.x + corner.width == 760 and corner.y + corner.height == 800
+
+
+def test_rendered_coordinates_map_back_to_the_page():
+    region = Region(200, 300, 100, 50)
+    rendered = render_region(SCREENSHOT, region, max_side=800)
+    assert rendered.image.size == (800, 400)
+    assert rendered.scale == 8
+    assert rendered.to_page(*rendered.to_image(250, 310)) == (250, 310)
+    assert rendered.to_page(400, 200) == region.center
+
+    coarse = render_region(SCREENSHOT, Region.of_image(SCREENSHOT), max_side=512)
+    assert max(coarse.image.size) == 512
+    assert Image.open(io.BytesIO(draw_grid(coarse, 3, 3))).size == coarse.image.size
+
+
+def test_only_labels_in_the_region_are_drawn():
+    masks = [{"bbox": [210, 305, 40, 20], "area": 800}, {"bbox": [600, 700, 20, 20], "area": 400}]
+    coordinates = {1: {"x": 230, "y": 315}, 2: {"x": 610, "y": 710}}
+    region = Region(200, 300, 100, 50)
+    numbers = labels_in_region(coordinates, region)
+    assert numbers == [1]
+
+    rendered = render_region(SCREENSHOT, region, max_side=800)
+    annotated = np.asarray(
+        Image.open(io.BytesIO(draw_labels(rendered, masks, coordinates, numbers))).convert("RGB")
+    )
+    # the box of label 1 is drawn at 8x: its left edge at x=(210-200)*8
+    assert tuple(annotated[100, 80]) == (255, 0, 0)
+
+
+@pytest.mark.parametrize(
+    "cells, label, expected",
+    [
+        ([5, 0], None, None),  # not sure after the first zoom
+        ([5, 5], 0, None),  # none of the labels fits
+        ([5, 5], 7, None),  # a number that was not offered
+        ([5, 5], 1, {"x": 380, "y": 400}),
+    ],
+)
+def test_zoom_never_clicks_blindly(monkeypatch, cells, label, expected):
+    from src import ui_integration
+
+    # two labels in the centre and more just above it, so only the second zoom narrows them down
+    coordinates = {
+        1: {"x": 380, "y": 400},
+        2: {"x": 390, "y": 410},
+        **{n: {"x": 300 + 5 * n, "y": 300} for n in range(3, 30)},
+    }
+    answers = iter(cells)
+    monkeypatch.setattr(
+        ui_integration, "ask_for_grid_cell", lambda rendered, task, zoomed_in: next(answers)
+    )
+    monkeypatch.setattr(ui_integration, "ask_for_label", lambda *args: label)
+    monkeypatch.setattr(ui_integration, "ZOOM_MAX_LABELS", 3)
+    assert (
+        ui_integration.zoom_to_target(SCREENSHOT, "book court 1", masks=[], coordinates=coordinates)
+        == expected
+    )